@@ -7,6 +7,7 @@ from langchain_openai import AzureChatOpenAI, ChatOpenAI
 from langchain_core.messages import AIMessage
 
 import asyncio
+import json
 import os
 from dotenv import load_dotenv
 
@@ -70,6 +71,74 @@ async def fetch_resource_content():
 
     return "done"
 
+# -----------------------------------------------------------------------
+# Asynchronous function to fetch only the passages relevant to a query,
+# using the search tool of the MCP server
+# -----------------------------------------------------------------------
+async def fetch_relevant_passages(query, k=5):
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+
+            print("\nsearching code of conduct for: ", query)
+            result = await session.call_tool("search_code_of_conduct",
+                                             {"query": query, "k": k})
+
+            # Each content item holds one section, or a list of them
+            passages = []
+            for content in result.content:
+                item = json.loads(content.text)
+                passages.extend(item if isinstance(item, list) else [item])
+            return passages
+
+# -----------------------------------------------------------------------
+# Keep the top ranked passages that fit in the prompt token budget
+# -----------------------------------------------------------------------
+prompt_token_budget = int(os.getenv("COC_PROMPT_TOKEN_BUDGET", "300"))
+
+def get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception:
+        return None
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        # Rough estimate when the tokenizer is not available
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+def truncate_tokens(text, max_tokens):
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+# Passages that do not fit in the rest of the budget are skipped, for
+# smaller ones further down the ranking. The top passage is truncated
+# when it is larger than the whole budget, so the context is not empty.
+def select_passages(passages, token_budget=prompt_token_budget):
+    selected, used = [], 0
+    for passage in passages:
+        text = passage["text"]
+        tokens = count_tokens(text)
+        if used + tokens > token_budget:
+            if selected:
+                continue
+            text = truncate_tokens(text, token_budget)
+            tokens = count_tokens(text)
+        selected.append(text)
+        used += tokens
+    return "\n".join(selected)
+
+def build_prompt(context, user_query):
+    return f"""Answer the query based on the following context provided.\n
+                Context: {context} \n
+                query: {user_query}
+                """
+
 # -----------------------------------------------------------------------
 # Run the MCP Client, fetch resource and generate response
 # -----------------------------------------------------------------------
@@ -77,19 +146,33 @@ async def fetch_resource_content():
 if __name__ == "__main__":
     print("\n-------------------------------------------------------")
     print("Running the code-of-client application")
-    # Get content from the MCP resource
-    retrieved_content = asyncio.run(fetch_resource_content())
-    print("\nContent retrieved: ", retrieved_content)
 
     # Simulated User query
     user_query = "What are the data privacy policies of the company?"
     print("\nUser query: ", user_query)
 
+    # Get only the relevant passages, within the token budget
+    passages = asyncio.run(fetch_relevant_passages(user_query))
+    retrieved_content = select_passages(passages)
+    print("\nContent retrieved: ", retrieved_content)
+
     # Use the retrieved content to answer the user query
-    prompt = f"""Answer the query based on the following context provided.\n
-                Context: {retrieved_content} \n
-                query: {user_query}
-                """
+    prompt = build_prompt(retrieved_content, user_query)
+
+    # Compare with the prompt built from the full document. This loads
+    # and parses the whole PDF in a second server, so it is only done
+    # when COC_COMPARE_FULL is set.
+    prompt_tokens = count_tokens(prompt)
+    if os.getenv("COC_COMPARE_FULL", "false").lower() == "true":
+        full_content = asyncio.run(fetch_resource_content())
+        full_prompt_tokens = count_tokens(build_prompt(full_content,
+                                                       user_query))
+        print(f"\nPrompt tokens: {prompt_tokens} "
+              f"(full document: {full_prompt_tokens}, "
+              f"saved: {full_prompt_tokens - prompt_tokens})")
+    else:
+        print(f"\nPrompt tokens: {prompt_tokens}")
+
     # Invoke the model with the prompt
     model_response = model.invoke(prompt)
     print("\nAnswer: ", model_response.content)
@@ -0,0 +1,108 @@
+#-----------------------------------------------------------------------
+# Sections and keyword search index for the code of conduct.
+# The text is split into sections (one per numbered item, or fixed
+# size passages when there is no numbering), and the sections are
+# ranked with BM25, so a client only needs the passages relevant to
+# its query instead of the whole document.
+#-----------------------------------------------------------------------
+
+import math
+import re
+from collections import Counter
+
+SECTION_HEADING = re.compile(r"^\s*\d+\.\s", re.MULTILINE)
+TOKEN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how",
+    "in", "is", "it", "of", "on", "or", "the", "to", "what", "with",
+}
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+#Split a text into passages of at most max_chars, on line boundaries
+def split_passages(text, max_chars):
+    passages, current = [], ""
+    for line in text.splitlines(keepends=True):
+        if current and len(current) + len(line) > max_chars:
+            passages.append(current)
+            current = ""
+        current += line
+    if current.strip():
+        passages.append(current)
+    return passages
+
+
+#Split the pages of the document into sections
+def split_sections(pages, max_chars=1200):
+    sections = []
+    for page_number, page_text in enumerate(pages, start=1):
+        starts = [m.start() for m in SECTION_HEADING.finditer(page_text)]
+        if not starts:
+            parts = split_passages(page_text, max_chars)
+        else:
+            # Text before the first heading (e.g. the title) is kept
+            # as its own section
+            bounds = [0] + starts + [len(page_text)]
+            parts = [page_text[b:e] for b, e in zip(bounds, bounds[1:])]
+
+        for part in parts:
+            for passage in split_passages(part, max_chars):
+                text = passage.strip()
+                if text:
+                    sections.append({
+                        "id": len(sections) + 1,
+                        "page": page_number,
+                        "title": text.splitlines()[0][:80],
+                        "text": text,
+                    })
+    return sections
+
+
+class SectionIndex:
+    """BM25 index over the sections, precomputed once per version of
+    the document."""
+
+    def __init__(self, sections, version=None, k1=1.5, b=0.75):
+        self.sections = sections
+        self.version = version
+        self.k1 = k1
+        self.b = b
+
+        self.term_counts = [Counter(tokenize(s["text"])) for s in sections]
+        self.lengths = [sum(c.values()) for c in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)
+                               if self.lengths else 0.0)
+
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(sections)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()}
+
+    def score(self, query_terms, position):
+        counts = self.term_counts[position]
+        length_norm = self.k1 * (1 - self.b + self.b * self.lengths[position]
+                                 / max(self.average_length, 1e-9))
+        score = 0.0
+        for term in query_terms:
+            frequency = counts.get(term, 0)
+            if frequency:
+                score += (self.idf[term] * frequency * (self.k1 + 1)
+                          / (frequency + length_norm))
+        return score
+
+    #Return the top k sections for the query, best first
+    def search(self, query, k=3):
+        query_terms = tokenize(query)
+        scored = [(self.score(query_terms, i), i)
+                  for i in range(len(self.sections))]
+        scored = [item for item in scored if item[0] > 0]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [{**self.sections[i], "score": round(score, 4)}
+                for score, i in scored[:k]]
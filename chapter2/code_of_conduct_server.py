@@ -7,7 +7,9 @@ import os
 from dotenv import load_dotenv
 # https://gofastmcp.com/
 from fastmcp import FastMCP
-import PyPDF2
+
+from pdf_text_cache import PdfTextCache
+from code_of_conduct_index import SectionIndex, split_sections
 
 #-----------------------------------------------------------------------
 #Setup the MCP Server
@@ -22,6 +24,13 @@ pdf_filename = "code_of_conduct.pdf"
 pdf_full_path = os.path.abspath(os.path.join(os.path.dirname(__file__), pdf_filename))
 pdf_uri = f"file:///{pdf_full_path.replace(os.sep, '/')}"
 
+#Cache of the extracted text, refreshed when the PDF changes.
+#Set CODE_OF_CONDUCT_TEXT_SIDECAR=true to also persist it to disk
+sidecar_path = None
+if os.getenv("CODE_OF_CONDUCT_TEXT_SIDECAR", "false").lower() == "true":
+    sidecar_path = pdf_full_path + ".text.json"
+coc_text_cache = PdfTextCache(pdf_full_path, sidecar_path)
+
 #Decorator to register the resource with the MCP server
 @hr_coc_mcp.resource(
     uri=pdf_uri,
@@ -33,13 +42,65 @@ pdf_uri = f"file:///{pdf_full_path.replace(os.sep, '/')}"
 def get_code_of_conduct() -> str:
     """Returns the text content of the code of conduct PDF file."""
 
-    #Open the file and read its contents
-    with open(pdf_full_path, "rb") as code_of_conduct:
-        reader = PyPDF2.PdfReader(code_of_conduct)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
+    #Return the cached contents, extracted again only when changed
+    return coc_text_cache.get_text()
+
+#-----------------------------------------------------------------------
+#Setup chunked access to the code of conduct. The document is split
+#into sections with a precomputed search index, rebuilt only when the
+#PDF content changes, so clients can fetch only relevant passages.
+#-----------------------------------------------------------------------
+SECTIONS_PAGE_SIZE = 10
+section_index = None
+
+def get_section_index():
+    global section_index
+    pages = coc_text_cache.get_pages()
+    version = coc_text_cache.file_hash
+    if section_index is None or section_index.version != version:
+        print("Building code of conduct section index")
+        section_index = SectionIndex(split_sections(pages), version)
+    return section_index
+
+#Paginated list of the sections, without their text
+@hr_coc_mcp.resource(
+    uri="coc://sections/index/{page}",
+    name="Code of Conduct sections",
+    description="Lists the sections of the code of conduct, "
+                f"{SECTIONS_PAGE_SIZE} per page, starting at page 1",
+    mime_type="application/json",
+)
+def list_code_of_conduct_sections(page: str) -> dict:
+    sections = get_section_index().sections
+    page_number = max(int(page), 1)
+    start = (page_number - 1) * SECTIONS_PAGE_SIZE
+    total_pages = max(1, -(-len(sections) // SECTIONS_PAGE_SIZE))
+    return {
+        "page": page_number,
+        "total_pages": total_pages,
+        "sections": [{"id": s["id"], "title": s["title"]}
+                     for s in sections[start:start + SECTIONS_PAGE_SIZE]],
+    }
+
+#Text of one section
+@hr_coc_mcp.resource(
+    uri="coc://sections/{section_id}",
+    name="Code of Conduct section",
+    description="Provides the text of one section of the code of conduct",
+    mime_type="text/plain",
+)
+def get_code_of_conduct_section(section_id: str) -> str:
+    for section in get_section_index().sections:
+        if section["id"] == int(section_id):
+            return section["text"]
+    raise ValueError(f"Unknown section {section_id}")
+
+#Tool to search the sections relevant to a query
+@hr_coc_mcp.tool()
+def search_code_of_conduct(query: str, k: int = 3) -> list[dict]:
+    """Search the code of conduct for the sections most relevant
+    to the query, ranked best first"""
+    return get_section_index().search(query, k)
 
 #Code to test the server standalone
 #print(get_code_of_conduct())
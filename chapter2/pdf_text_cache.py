@@ -0,0 +1,135 @@
+#-----------------------------------------------------------------------
+# Cache of the text extracted from a PDF file.
+# - Repeat reads are served from memory while the file size and
+#   modification time are unchanged.
+# - When they change, the file is hashed. If the content did change,
+#   only the pages whose content stream changed are extracted again.
+# - The extracted pages can be persisted to a sidecar JSON file, so a
+#   restarted server does not need to parse the PDF at all.
+#-----------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import threading
+
+import PyPDF2
+
+SIDECAR_FORMAT_VERSION = 1
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+#Hash of the content stream of a page, which changes when its text does
+def hash_page(page):
+    contents = page.get_contents()
+    data = contents.get_data() if contents is not None else b""
+    return hash_bytes(data)
+
+
+class PdfTextCache:
+
+    def __init__(self, pdf_path, sidecar_path=None):
+        self.pdf_path = pdf_path
+        self.sidecar_path = sidecar_path
+        self._lock = threading.Lock()
+
+        self._signature = None
+        self._file_hash = None
+        self._pages = []      # list of (page hash, page text)
+        self._text = None
+        self.stats = {"memory_hits": 0, "extractions": 0,
+                      "pages_extracted": 0, "pages_reused": 0}
+
+        if sidecar_path:
+            self._load_sidecar()
+
+    def _file_signature(self):
+        stat = os.stat(self.pdf_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_sidecar(self):
+        try:
+            with open(self.sidecar_path, encoding="utf-8") as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            return
+        if sidecar.get("version") != SIDECAR_FORMAT_VERSION:
+            return
+        self._file_hash = sidecar["file_sha256"]
+        self._pages = [(page["hash"], page["text"])
+                       for page in sidecar["pages"]]
+        self._text = "".join(text for _, text in self._pages)
+
+    def _save_sidecar(self):
+        sidecar = {
+            "version": SIDECAR_FORMAT_VERSION,
+            "file_sha256": self._file_hash,
+            "pages": [{"hash": page_hash, "text": text}
+                      for page_hash, text in self._pages],
+        }
+        tmp_path = self.sidecar_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sidecar, f)
+        os.replace(tmp_path, self.sidecar_path)
+
+    #Extract the pages whose content changed, reusing the others
+    def _extract(self):
+        known_pages = dict(self._pages)
+        pages = []
+        with open(self.pdf_path, "rb") as pdf_file:
+            reader = PyPDF2.PdfReader(pdf_file)
+            for page in reader.pages:
+                page_hash = hash_page(page)
+                text = known_pages.get(page_hash)
+                if text is None:
+                    text = page.extract_text() or ""
+                    self.stats["pages_extracted"] += 1
+                else:
+                    self.stats["pages_reused"] += 1
+                pages.append((page_hash, text))
+        self.stats["extractions"] += 1
+        return pages
+
+    def _refresh(self):
+        signature = self._file_signature()
+        if signature == self._signature and self._text is not None:
+            self.stats["memory_hits"] += 1
+            return
+
+        file_hash = hash_file(self.pdf_path)
+        if file_hash != self._file_hash or self._text is None:
+            print("Extracting text from ", self.pdf_path)
+            self._pages = self._extract()
+            self._text = "".join(text for _, text in self._pages)
+            self._file_hash = file_hash
+            if self.sidecar_path:
+                self._save_sidecar()
+        self._signature = signature
+
+    def get_pages(self):
+        with self._lock:
+            self._refresh()
+            return [text for _, text in self._pages]
+
+    def get_text(self):
+        with self._lock:
+            self._refresh()
+            return self._text
+
+    #Content hash of the PDF the cached text was extracted from
+    @property
+    def file_hash(self):
+        with self._lock:
+            self._refresh()
+            return self._file_hash
@@ -1,21 +1,27 @@
-from mcp import ClientSession, StdioServerParameters
+from mcp import StdioServerParameters
 from mcp.client.stdio import stdio_client
 
-from langchain_mcp_adapters.tools import load_mcp_tools
-from langchain_mcp_adapters.prompts import load_mcp_prompt
-from langgraph.prebuilt import create_react_agent
-from langchain_openai import AzureChatOpenAI
-
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+from mcp_session_pool import (MCPSessionPool,
+                              prompt_placeholders, render_prompt)
+from agent_events import stream_agent_events
+import tracing
+
 load_dotenv()
 
 #-----------------------------------------------------------------------
 # Setup the LLM for the HR Policy Agent
 # This uses the Azure OpenAI service with a specific deployment
 # Please replace the environment variables with your own values
+# The model is created on first use, so importing this module does not
+# import the OpenAI client or need the credentials. Assign model to run
+# the agent with another chat model.
 #-----------------------------------------------------------------------
 
 endpoint = os.getenv("ENDPOINT_URL")
@@ -23,56 +29,100 @@ deployment = os.getenv("DEPLOYMENT_NAME")
 subscription_key = os.getenv("AZURE_OPENAI_API_KEY")
 api_version=os.getenv("API_VERSION")
 
-model=AzureChatOpenAI(
-    azure_endpoint=endpoint,
-    api_key=subscription_key,
-    api_version=api_version,
-    deployment_name=deployment,
-)
+model = None
+
+def get_model():
+    global model
+    if model is None:
+        from langchain_openai import AzureChatOpenAI
+        model = AzureChatOpenAI(
+            azure_endpoint=endpoint,
+            api_key=subscription_key,
+            api_version=api_version,
+            deployment_name=deployment,
+        )
+    return model
 
 #-----------------------------------------------------------------------
-# Define the HR policy agent that will use the MCP server
-# to answer queries about HR policies.
+# Setup the pool of MCP sessions to the HR policy server.
+# Each session keeps the server subprocess running, along with the
+# tools, prompt template and agent built from it.
 #-----------------------------------------------------------------------
-async def run_hr_policy_agent(prompt: str) -> str:
 
-    # Make sure the right path to the server file is passed.
-    hr_mcp_server_path = os.path.abspath(
-                            os.path.join(os.path.dirname(__file__), 
-                                            "hr_policy_server.py"))
+# Make sure the right path to the server file is passed.
+hr_mcp_server_path = os.path.abspath(
+                        os.path.join(os.path.dirname(__file__),
+                                        "hr_policy_server.py"))
+
+# Create the server parameters for the MCP server. The server gets the
+# environment of this process, with its HR_POLICY_* and TRACE_* settings
+server_params = StdioServerParameters(
+    command="python",
+    args=[hr_mcp_server_path],
+    env=dict(os.environ),
+)
+
+async def setup_hr_policy_session(session):
+    # Imported on first use, as they are most of the import time of
+    # this module
+    from langchain_mcp_adapters.tools import load_mcp_tools
+    from langchain_mcp_adapters.prompts import load_mcp_prompt
+    from langgraph.prebuilt import create_react_agent
+
     print("HR MCP server path: ", hr_mcp_server_path)
+    print("\nloading tools & prompt")
+    hr_policy_tools = await load_mcp_tools(session)
+    hr_policy_prompt = await load_mcp_prompt(session,
+                        "get_llm_prompt",
+                        arguments=prompt_placeholders("query"))
 
-    # Create the server parameters for the MCP server
-    server_params = StdioServerParameters(
-        command="python",
-        args=[hr_mcp_server_path],
-    )
+    print("\nTools loaded :", hr_policy_tools[0].name)
+    print("\nPrompt loaded :", hr_policy_prompt)
 
-    # Create a client session to connect to the MCP server
-    async with stdio_client(server_params) as (read,write):
-        async with ClientSession(read,write) as session:
-            print("initializing session")
-            await session.initialize()
+    print("\nCreating agent")
+    agent=create_react_agent(get_model(),hr_policy_tools)
 
-            print("\nloading tools & prompt")
-            hr_policy_tools = await load_mcp_tools(session)
-            hr_policy_prompt = await load_mcp_prompt(session, 
-                                "get_llm_prompt", 
-                                arguments={"query": prompt})
+    return {"prompt": hr_policy_prompt, "agent": agent}
 
-            print("\nTools loaded :", hr_policy_tools[0].name)
-            print("\nPrompt loaded :", hr_policy_prompt)
+hr_policy_session_pool = MCPSessionPool(
+    "HR-Policies-MCP-Server",
+    connect=lambda: stdio_client(server_params),
+    setup=setup_hr_policy_session,
+    max_size=int(os.getenv("HR_POLICY_MCP_POOL_SIZE", "4")),
+)
 
-            print("\nCreating agent")
-            agent=create_react_agent(model,hr_policy_tools)
+#-----------------------------------------------------------------------
+# Define the HR policy agent that will use the MCP server
+# to answer queries about HR policies.
+#-----------------------------------------------------------------------
+async def run_hr_policy_agent(prompt: str) -> str:
 
-            print("\nAnswering prompt : ", prompt)
-            agent_response = await agent.ainvoke(
-                {"messages": hr_policy_prompt})
+    # Borrow a warm session, with its tools and agent already loaded
+    async with hr_policy_session_pool.session() as pooled:
+        hr_policy_prompt = render_prompt(pooled.state["prompt"],
+                                         {"query": prompt})
+
+        print("\nAnswering prompt : ", prompt)
+        agent_response = await pooled.state["agent"].ainvoke(
+            {"messages": hr_policy_prompt},
+            config=tracing.callback_config())
+
+        return agent_response["messages"][-1].content
+
+#-----------------------------------------------------------------------
+# Streaming variant of the HR policy agent. Yields token and step
+# events as the agent runs, followed by a final event with the answer.
+#-----------------------------------------------------------------------
+async def stream_hr_policy_agent(prompt: str):
 
-            return agent_response["messages"][-1].content
+    async with hr_policy_session_pool.session() as pooled:
+        hr_policy_prompt = render_prompt(pooled.state["prompt"],
+                                         {"query": prompt})
 
-    return "Error"
+        print("\nStreaming answer to prompt : ", prompt)
+        async for event in stream_agent_events(
+                pooled.state["agent"], {"messages": hr_policy_prompt}):
+            yield event
 
 if __name__ == "__main__":
     # Run the HR policy agent with a sample query
@@ -0,0 +1,145 @@
+#-----------------------------------------------------------------------
+# Benchmark of the embedding backends of hr_policy_embeddings, on the
+# chunks of the HR policy PDF and a set of HR questions.
+# Reports, for each backend and thread count:
+# - the time to load the model
+# - the encode throughput of the chunks, as in an index build
+# - the latency of a query embedding, computed and cached
+# - overlap@k: the share of the top k chunks of each question that the
+#   reference backend (the PyTorch model) also returns
+#
+#   python chapter3/hr_policy_embedding_benchmark.py
+#   python chapter3/hr_policy_embedding_benchmark.py --backends onnx-int8 --threads 1 2 4
+#-----------------------------------------------------------------------
+
+import argparse
+import os
+import time
+
+from hr_policy_embeddings import BACKENDS, create_embeddings
+from hr_policy_index import load_chunks
+from hr_policy_retrieval import DenseSearchBackend, as_query_matrix
+
+pdf_full_path = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "hr_policy_document.pdf"))
+
+QUESTIONS = [
+    "What is the policy on remote work?",
+    "How many vacation days do employees get per year?",
+    "Can unused leave be carried over to next year?",
+    "What is the maternity leave policy?",
+    "How much paternity leave is provided?",
+    "What are the standard working hours?",
+    "Is overtime paid?",
+    "How do I request time off?",
+    "What happens if I am sick for more than three days?",
+    "What health insurance benefits are offered?",
+    "Is there a retirement savings plan?",
+    "What is the dress code?",
+    "How are workplace harassment complaints handled?",
+    "Can I work from another country?",
+    "What public holidays does the company observe?",
+    "Is there bereavement leave?",
+    "How much notice is needed before taking leave?",
+    "Are flexible working hours allowed?",
+    "What is the policy on personal use of company equipment?",
+    "What disciplinary actions can follow misconduct?",
+]
+
+
+#Top k chunks of each question, by cosine similarity
+def top_k(document_vectors, query_vectors, k):
+    ids, _ = DenseSearchBackend(as_query_matrix(document_vectors)).search(
+        query_vectors, k)
+    return ids
+
+
+def overlap_at_k(ids, reference_ids):
+    hits = sum(len(set(row) & set(reference))
+               for row, reference in zip(ids, reference_ids))
+    return hits / reference_ids.size
+
+
+def run_backend(backend, threads, texts, k, repeat):
+    start = time.perf_counter()
+    embeddings = create_embeddings(backend, threads=threads,
+                                   cache_size=len(QUESTIONS))
+    load_time = time.perf_counter() - start
+
+    # First call, which initializes the model and its thread pools
+    embeddings.embed_documents(texts[:1])
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        document_vectors = embeddings.embed_documents(texts)
+    chunks_per_second = repeat * len(texts) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        query_vectors = [embeddings.embeddings.embed_query(question)
+                         for question in QUESTIONS]
+    query_ms = (time.perf_counter() - start) * 1000 / (repeat * len(QUESTIONS))
+
+    for question in QUESTIONS:
+        embeddings.embed_query(question)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            embeddings.embed_query(question)
+    cached_us = (time.perf_counter() - start) * 1e6 / (repeat * len(QUESTIONS))
+
+    return {
+        "load_time": load_time,
+        "chunks_per_second": chunks_per_second,
+        "query_ms": query_ms,
+        "cached_us": cached_us,
+        "ids": top_k(document_vectors, query_vectors, k),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+",
+                        default=["huggingface", "onnx", "onnx-int8"],
+                        choices=BACKENDS)
+    parser.add_argument("--reference", default="huggingface",
+                        choices=BACKENDS,
+                        help="Backend whose top k results are compared")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0],
+                        help="Threads of the model (0 for the default)")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="Smaller than the index default, for more "
+                             "chunks to encode and rank")
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = [d.page_content for d in
+             load_chunks(pdf_full_path, args.chunk_size, args.chunk_overlap)]
+    print(f"{len(texts)} chunks, {len(QUESTIONS)} questions\n")
+
+    try:
+        reference_ids = run_backend(args.reference, None, texts,
+                                    args.k, 1)["ids"]
+    except ImportError as e:
+        print(f"No reference backend {args.reference} ({e})\n")
+        reference_ids = None
+
+    print(f"{'backend':>12} {'threads':>7} {'load s':>7} {'chunks/s':>9} "
+          f"{'query ms':>9} {'cached us':>9} {f'overlap@{args.k}':>10}")
+    for backend in args.backends:
+        for threads in args.threads:
+            try:
+                result = run_backend(backend, threads or None, texts,
+                                     args.k, args.repeat)
+            except ImportError as e:
+                print(f"{backend:>12} {threads or '-':>7}   skipped ({e})")
+                continue
+            overlap = ("-" if reference_ids is None else
+                       f"{overlap_at_k(result['ids'], reference_ids):.3f}")
+            print(f"{backend:>12} {threads or '-':>7} "
+                  f"{result['load_time']:>7.2f} "
+                  f"{result['chunks_per_second']:>9.1f} "
+                  f"{result['query_ms']:>9.2f} {result['cached_us']:>9.1f} "
+                  f"{overlap:>10}")
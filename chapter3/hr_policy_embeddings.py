@@ -0,0 +1,199 @@
+#-----------------------------------------------------------------------
+# Embedding models for the HR policy index and the semantic cache of
+# the policy agent, selected by HR_POLICY_EMBEDDING_BACKEND:
+#   huggingface : sentence-transformers all-MiniLM-L6-v2 on PyTorch
+#                 (default)
+#   onnx        : the same model on ONNX Runtime
+#   onnx-int8   : the int8 quantized ONNX export of the model, for the
+#                 instruction set of the CPU (HR_POLICY_ONNX_FILE to
+#                 choose another file of the model repository)
+#   hashing     : hashed bag of words, with no model to download.
+#                 Deterministic and offline, for benchmarks and tests
+#                 of the serving path; retrieval quality is much lower.
+# The onnx backends need the optional optimum[onnxruntime] package.
+# HR_POLICY_EMBEDDING_THREADS bounds the threads used by a model, and
+# HR_POLICY_QUERY_CACHE_SIZE the LRU cache of query embeddings (0 to
+# disable it).
+# The model id of the backend is part of the index key, so an index
+# is never searched with vectors from another model.
+#
+# Compare the throughput and top-k results of the backends with
+#   python chapter3/hr_policy_embedding_benchmark.py
+#-----------------------------------------------------------------------
+
+import hashlib
+import os
+import platform
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+HASHING_DIMENSIONS = 384
+
+# Quantized exports of the model, by CPU instruction set
+ONNX_INT8_FILES = {
+    "avx512_vnni": "onnx/model_qint8_avx512_vnni.onnx",
+    "avx512": "onnx/model_qint8_avx512.onnx",
+    "avx2": "onnx/model_quint8_avx2.onnx",
+    "arm64": "onnx/model_qint8_arm64.onnx",
+}
+ONNX_FILE = "onnx/model.onnx"
+
+BACKENDS = ["huggingface", "onnx", "onnx-int8", "hashing"]
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Hashes the words and word pairs of a text into a fixed size
+    vector. Stable across processes, unlike hash(), so an index built
+    by one process can be searched by another."""
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        words = TOKEN_PATTERN.findall(text.lower())
+        for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"),
+                                     digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed_documents(self, texts):
+        return [self.embed(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed(text).tolist()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """LRU cache of the query embeddings of another model, for the
+    questions asked again and again. Documents are not cached."""
+
+    def __init__(self, embeddings, max_size=1024):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.entries = OrderedDict()    # query -> vector
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self._lock:
+            vector = self.entries.get(text)
+            if vector is not None:
+                self.entries.move_to_end(text)
+                self.stats["hits"] += 1
+                return list(vector)
+            self.stats["misses"] += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self.entries[text] = vector
+            self.entries.move_to_end(text)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return list(vector)
+
+
+def embedding_backend():
+    return os.getenv("HR_POLICY_EMBEDDING_BACKEND", "huggingface")
+
+
+def embedding_threads():
+    threads = os.getenv("HR_POLICY_EMBEDDING_THREADS")
+    return int(threads) if threads else None
+
+
+#Quantized model file for this CPU, from the flags of /proc/cpuinfo
+def onnx_int8_file():
+    if os.getenv("HR_POLICY_ONNX_FILE"):
+        return os.getenv("HR_POLICY_ONNX_FILE")
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return ONNX_INT8_FILES["arm64"]
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = set(f.read().split())
+    except OSError:
+        flags = set()
+    if "avx512_vnni" in flags:
+        return ONNX_INT8_FILES["avx512_vnni"]
+    if "avx512f" in flags:
+        return ONNX_INT8_FILES["avx512"]
+    return ONNX_INT8_FILES["avx2"]
+
+
+#Id of the model of a backend, used in the index key
+def embedding_model_id(backend=None):
+    backend = backend or embedding_backend()
+    if backend == "huggingface":
+        return EMBEDDING_MODEL_NAME
+    if backend == "onnx":
+        return f"{EMBEDDING_MODEL_NAME}:{ONNX_FILE}"
+    if backend == "onnx-int8":
+        return f"{EMBEDDING_MODEL_NAME}:{onnx_int8_file()}"
+    if backend == "hashing":
+        return f"hashing-{HASHING_DIMENSIONS}"
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+#sentence-transformers model on ONNX Runtime, on the CPU
+def create_onnx_embeddings(file_name, threads=None):
+    from langchain_huggingface import HuggingFaceEmbeddings
+    try:
+        import onnxruntime
+        import optimum.onnxruntime
+    except ImportError as e:
+        raise ImportError("The onnx embedding backends need the "
+                          "optimum[onnxruntime] package") from e
+
+    session_options = onnxruntime.SessionOptions()
+    if threads:
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={
+            "backend": "onnx",
+            "model_kwargs": {"file_name": file_name,
+                             "provider": "CPUExecutionProvider",
+                             "session_options": session_options},
+        })
+
+
+#Model of a backend, with the query cache unless cache_size is 0
+def create_embeddings(backend=None, threads=None, cache_size=None):
+    backend = backend or embedding_backend()
+    threads = threads or embedding_threads()
+    if cache_size is None:
+        cache_size = int(os.getenv("HR_POLICY_QUERY_CACHE_SIZE", "1024"))
+
+    if backend == "huggingface":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    elif backend == "onnx":
+        embeddings = create_onnx_embeddings(ONNX_FILE, threads)
+    elif backend == "onnx-int8":
+        embeddings = create_onnx_embeddings(onnx_int8_file(), threads)
+    elif backend == "hashing":
+        embeddings = HashingEmbeddings()
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if cache_size > 0:
+        return CachedQueryEmbeddings(embeddings, cache_size)
+    return embeddings
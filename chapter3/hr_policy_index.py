@@ -0,0 +1,183 @@
+#-----------------------------------------------------------------------
+# Persistent vector index for the HR policy MCP server.
+# The embeddings matrix and chunk metadata are stored on disk, keyed by
+# a hash of the PDF contents, the splitter settings and the model name.
+# When the key matches, the index is memory-mapped and the PDF is
+# neither re-loaded nor re-embedded.
+#-----------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+from langchain_core.documents import Document
+
+from hr_policy_embeddings import EMBEDDING_MODEL_NAME
+from hr_policy_retrieval import create_search_backend
+
+# Bump this when the on-disk layout changes, to force a rebuild
+INDEX_FORMAT_VERSION = 1
+
+# Same settings that PyPDFLoader.load_and_split() uses by default
+CHUNK_SIZE = 4000
+CHUNK_OVERLAP = 200
+
+# Directory of the stored indexes, HR_POLICY_INDEX_DIR when set
+INDEX_DIR = os.getenv("HR_POLICY_INDEX_DIR") or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), ".hr_policy_index"))
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+
+#Hash the file contents in blocks, so large PDFs are not read at once
+def hash_file(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+#Compute the key that identifies an index built from the given inputs
+def compute_index_key(pdf_path,
+                      model_name=EMBEDDING_MODEL_NAME,
+                      chunk_size=CHUNK_SIZE,
+                      chunk_overlap=CHUNK_OVERLAP):
+    settings = {
+        "format": INDEX_FORMAT_VERSION,
+        "pdf_sha256": hash_file(pdf_path),
+        "model": model_name,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+    }
+    encoded = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+#-----------------------------------------------------------------------
+# Read-only view over a stored index
+#-----------------------------------------------------------------------
+class PolicyIndex:
+    """Embeddings matrix (one L2-normalized row per chunk) and the
+    text and metadata of each chunk, searched with one of the
+    backends of hr_policy_retrieval."""
+
+    def __init__(self, key, embeddings_matrix, chunks,
+                 backend="dense", **backend_options):
+        self.key = key
+        self.embeddings_matrix = embeddings_matrix
+        self.chunks = chunks
+        self.backend = create_search_backend(backend, embeddings_matrix,
+                                             **backend_options)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    #Return the k chunks most similar to the query vector (cosine)
+    def search(self, query_vector, k=3):
+        return self.search_batch([query_vector], k)[0]
+
+    #Return the k most similar chunks for each query vector, scoring
+    #all the queries against the index in one matrix multiply
+    def search_batch(self, query_vectors, k=3):
+        ids, _ = self.backend.search(query_vectors, k)
+        return [[self.to_document(i) for i in row if i >= 0]
+                for row in ids]
+
+    def to_document(self, chunk_id):
+        chunk = self.chunks[int(chunk_id)]
+        return Document(page_content=chunk["page_content"],
+                        metadata=chunk["metadata"])
+
+
+#Load the PDF and split it into chunk documents
+def load_chunks(pdf_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size,
+                                              chunk_overlap=chunk_overlap)
+    return PyPDFLoader(pdf_path).load_and_split(splitter)
+
+
+#Load the PDF, split it and embed every chunk
+def build_index(pdf_path, embeddings, chunk_size, chunk_overlap):
+    print("Building HR policy index from ", pdf_path, file=sys.stderr)
+    documents = load_chunks(pdf_path, chunk_size, chunk_overlap)
+
+    vectors = np.asarray(
+        embeddings.embed_documents([d.page_content for d in documents]),
+        dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms > 0, norms, 1.0)
+
+    chunks = [{"page_content": d.page_content, "metadata": d.metadata}
+              for d in documents]
+    return vectors, chunks
+
+
+#Write the index to a temporary directory and move it into place, so
+#a concurrent reader never sees a partially written index
+def save_index(index_path, vectors, chunks):
+    parent = os.path.dirname(index_path)
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        np.save(os.path.join(tmp_path, EMBEDDINGS_FILE),
+                np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(os.path.join(tmp_path, CHUNKS_FILE), "w",
+                  encoding="utf-8") as f:
+            json.dump(chunks, f)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        #Another process may have stored the same index first
+        if not os.path.isdir(index_path):
+            raise
+
+
+#Remove indexes built from older versions of the inputs
+def prune_indexes(index_dir, keep_key):
+    for name in os.listdir(index_dir):
+        if name != keep_key and not name.startswith("."):
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+def load_index(index_path, key, backend="dense", **backend_options):
+    embeddings_matrix = np.load(os.path.join(index_path, EMBEDDINGS_FILE),
+                                mmap_mode="r")
+    with open(os.path.join(index_path, CHUNKS_FILE), encoding="utf-8") as f:
+        chunks = json.load(f)
+    return PolicyIndex(key, embeddings_matrix, chunks,
+                       backend, **backend_options)
+
+
+#-----------------------------------------------------------------------
+# Return the index for the PDF, building it only when no index with a
+# matching key exists. get_embeddings is only called on a rebuild.
+#-----------------------------------------------------------------------
+def load_or_build_index(pdf_path,
+                        get_embeddings,
+                        model_name=EMBEDDING_MODEL_NAME,
+                        chunk_size=CHUNK_SIZE,
+                        chunk_overlap=CHUNK_OVERLAP,
+                        index_dir=INDEX_DIR,
+                        backend="dense",
+                        **backend_options):
+    key = compute_index_key(pdf_path, model_name, chunk_size, chunk_overlap)
+    index_path = os.path.join(index_dir, key)
+
+    if os.path.isdir(index_path):
+        print("Loading HR policy index ", key, file=sys.stderr)
+    else:
+        vectors, chunks = build_index(pdf_path, get_embeddings(),
+                                      chunk_size, chunk_overlap)
+        save_index(index_path, vectors, chunks)
+        prune_indexes(index_dir, key)
+
+    return load_index(index_path, key, backend, **backend_options)
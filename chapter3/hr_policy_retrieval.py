@@ -0,0 +1,155 @@
+#-----------------------------------------------------------------------
+# Search backends for the HR policy vector index.
+# All backends work on a contiguous float32 matrix of L2-normalized
+# embeddings (one row per chunk), so the inner product is the cosine
+# similarity. Each backend returns, for a batch of query vectors, the
+# ids and scores of the top-k rows, best first.
+#
+#   dense : exact search, batched matmul + argpartition
+#   ivf   : approximate inverted-file search over k-means clusters
+#   hnsw  : approximate graph search, needs the optional faiss package
+#-----------------------------------------------------------------------
+
+import numpy as np
+
+
+def as_query_matrix(query_vectors):
+    queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries / np.where(norms > 0, norms, 1.0)
+
+
+#Top-k over the last axis of a score matrix, sorted best first
+def top_k(scores, k):
+    k = min(k, scores.shape[-1])
+    if k < scores.shape[-1]:
+        ids = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        ids = np.broadcast_to(np.arange(scores.shape[-1]), scores.shape)
+    top_scores = np.take_along_axis(scores, ids, axis=-1)
+    order = np.argsort(-top_scores, axis=-1)
+    return (np.take_along_axis(ids, order, axis=-1),
+            np.take_along_axis(top_scores, order, axis=-1))
+
+
+#-----------------------------------------------------------------------
+# Exact search
+#-----------------------------------------------------------------------
+class DenseSearchBackend:
+    name = "dense"
+
+    #query_block bounds the size of the score matrix for large batches
+    def __init__(self, matrix, query_block=64):
+        self.matrix = matrix
+        self.query_block = query_block
+
+    def search(self, query_vectors, k=3):
+        queries = as_query_matrix(query_vectors)
+        ids, scores = [], []
+        for start in range(0, len(queries), self.query_block):
+            block = queries[start:start + self.query_block]
+            block_ids, block_scores = top_k(block @ self.matrix.T, k)
+            ids.append(block_ids)
+            scores.append(block_scores)
+        return np.concatenate(ids), np.concatenate(scores)
+
+
+#-----------------------------------------------------------------------
+# Inverted file search. Rows are clustered with spherical k-means and
+# stored grouped by cluster; a query only scores the rows of its
+# n_probe nearest clusters.
+#-----------------------------------------------------------------------
+class IVFSearchBackend:
+    name = "ivf"
+
+    def __init__(self, matrix, n_lists=None, n_probe=8,
+                 train_size=65536, iterations=10, seed=0):
+        rows = len(matrix)
+        self.n_lists = n_lists or max(1, int(np.sqrt(rows)))
+        self.n_probe = min(n_probe, self.n_lists)
+
+        self.centroids = self.train(matrix, train_size, iterations, seed)
+        assignments = self.assign(matrix)
+
+        # Rows sorted by cluster, with the offsets of each cluster
+        self.order = np.argsort(assignments, kind="stable")
+        self.vectors = np.ascontiguousarray(matrix[self.order])
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def train(self, matrix, train_size, iterations, seed):
+        rng = np.random.default_rng(seed)
+        sample_ids = rng.choice(len(matrix), min(train_size, len(matrix)),
+                                replace=False)
+        sample = np.asarray(matrix[np.sort(sample_ids)], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), self.n_lists,
+                                      replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(self.n_lists):
+                members = sample[labels == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[cluster] = centroid / max(
+                        np.linalg.norm(centroid), 1e-12)
+        return centroids
+
+    def assign(self, matrix, block=65536):
+        return np.concatenate([
+            np.argmax(matrix[start:start + block] @ self.centroids.T, axis=1)
+            for start in range(0, len(matrix), block)])
+
+    def search(self, query_vectors, k=3):
+        queries = as_query_matrix(query_vectors)
+        probes, _ = top_k(queries @ self.centroids.T, self.n_probe)
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([
+                np.arange(self.offsets[c], self.offsets[c + 1])
+                for c in probes[i]])
+            if not len(candidates):
+                continue
+            row_ids, row_scores = top_k(self.vectors[candidates] @ query, k)
+            ids[i, :len(row_ids)] = self.order[candidates[row_ids]]
+            scores[i, :len(row_scores)] = row_scores
+        return ids, scores
+
+
+#-----------------------------------------------------------------------
+# HNSW graph search, using faiss when it is installed
+#-----------------------------------------------------------------------
+class HNSWSearchBackend:
+    name = "hnsw"
+
+    def __init__(self, matrix, m=32, ef_construction=80, ef_search=64):
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError(
+                "The hnsw search backend needs the faiss-cpu package") from e
+
+        self.index = faiss.IndexHNSWFlat(matrix.shape[1], m,
+                                         faiss.METRIC_INNER_PRODUCT)
+        self.index.hnsw.efConstruction = ef_construction
+        self.index.hnsw.efSearch = ef_search
+        self.index.add(np.ascontiguousarray(matrix, dtype=np.float32))
+
+    def search(self, query_vectors, k=3):
+        scores, ids = self.index.search(as_query_matrix(query_vectors), k)
+        return ids, scores
+
+
+SEARCH_BACKENDS = {
+    DenseSearchBackend.name: DenseSearchBackend,
+    IVFSearchBackend.name: IVFSearchBackend,
+    HNSWSearchBackend.name: HNSWSearchBackend,
+}
+
+
+def create_search_backend(name, matrix, **options):
+    if name not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown search backend {name}, "
+                         f"expected one of {list(SEARCH_BACKENDS)}")
+    return SEARCH_BACKENDS[name](matrix, **options)
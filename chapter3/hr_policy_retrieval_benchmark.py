@@ -0,0 +1,112 @@
+#-----------------------------------------------------------------------
+# Benchmark of the HR policy search backends against the original
+# InMemoryVectorStore, on synthetic clustered embeddings.
+# Reports recall@k (against exact search) and queries per second.
+#
+#   python chapter3/hr_policy_retrieval_benchmark.py
+#   python chapter3/hr_policy_retrieval_benchmark.py --sizes 1000 100000
+#-----------------------------------------------------------------------
+
+import argparse
+import time
+
+import numpy as np
+
+from hr_policy_retrieval import (DenseSearchBackend, as_query_matrix,
+                                 create_search_backend)
+
+
+#Clustered unit vectors, so approximate indexes have structure to use
+def make_corpus(rows, dim, clusters, rng, block=100000):
+    centers = as_query_matrix(rng.standard_normal((clusters, dim)))
+    matrix = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, block):
+        count = min(block, rows - start)
+        labels = rng.integers(0, clusters, count)
+        noise = rng.standard_normal((count, dim)).astype(np.float32) * 0.08
+        matrix[start:start + count] = as_query_matrix(centers[labels] + noise)
+    return matrix
+
+
+def make_queries(matrix, count, rng):
+    ids = rng.integers(0, len(matrix), count)
+    noise = rng.standard_normal((count, matrix.shape[1])) * 0.04
+    return as_query_matrix(matrix[ids] + noise.astype(np.float32))
+
+
+#The original store, holding one list of floats per chunk
+class InMemoryStoreBackend:
+    name = "inmemory"
+
+    def __init__(self, matrix):
+        from langchain_core.vectorstores import InMemoryVectorStore
+        self.store = InMemoryVectorStore(embedding=None)
+        for i, vector in enumerate(matrix):
+            self.store.store[str(i)] = {"id": str(i), "vector": vector.tolist(),
+                                        "text": "", "metadata": {}}
+
+    def search(self, query_vectors, k=3):
+        ids = [[int(doc.id) for doc in
+                self.store.similarity_search_by_vector(query.tolist(), k=k)]
+               for query in query_vectors]
+        return np.asarray(ids), None
+
+
+def recall_at_k(ids, exact_ids):
+    hits = sum(len(set(row) & set(exact)) for row, exact in zip(ids, exact_ids))
+    return hits / exact_ids.size
+
+
+def run_backend(backend_factory, queries, exact_ids, k, batch):
+    start = time.perf_counter()
+    backend = backend_factory()
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids = np.concatenate([backend.search(queries[i:i + batch], k)[0]
+                          for i in range(0, len(queries), batch)])
+    elapsed = time.perf_counter() - start
+    return recall_at_k(ids, exact_ids), len(queries) / elapsed, build_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=1,
+                        help="Queries per search call")
+    parser.add_argument("--backends", nargs="+",
+                        default=["inmemory", "dense", "ivf", "hnsw"])
+    parser.add_argument("--inmemory-max-size", type=int, default=100000,
+                        help="Skip the (slow) original store above this size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>9} {'backend':>9} {'recall@k':>9} "
+          f"{'QPS':>10} {'build s':>8}")
+
+    for size in args.sizes:
+        matrix = make_corpus(size, args.dim, max(16, size // 500), rng)
+        queries = make_queries(matrix, args.queries, rng)
+        exact_ids, _ = DenseSearchBackend(matrix).search(queries, args.k)
+
+        for name in args.backends:
+            if name == "inmemory":
+                if size > args.inmemory_max_size:
+                    print(f"{size:>9} {name:>9}   skipped (--inmemory-max-size)")
+                    continue
+                factory = lambda: InMemoryStoreBackend(matrix)
+            else:
+                factory = lambda: create_search_backend(name, matrix)
+
+            try:
+                recall, qps, build_time = run_backend(
+                    factory, queries, exact_ids, args.k, args.batch)
+            except ImportError as e:
+                print(f"{size:>9} {name:>9}   skipped ({e})")
+                continue
+            print(f"{size:>9} {name:>9} {recall:>9.3f} "
+                  f"{qps:>10.1f} {build_time:>8.2f}")
@@ -1,10 +1,14 @@
+import argparse
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_huggingface import HuggingFaceEmbeddings
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+import tracing
 
 # -----------------------------------------------------------------------
 # Setup the MCP Server
@@ -13,25 +17,68 @@ load_dotenv()
 hr_policies_mcp = FastMCP("HR-Policies-MCP-Server")
 
 # -----------------------------------------------------------------------
-# Setup the Vector Store for use in retrieving policies
-# This will use the hr_policy_document.pdf file as its source
+# Setup the Vector index for use in retrieving policies
+# This will use the hr_policy_document.pdf file as its source.
+# The index is persisted on disk and only rebuilt when the PDF,
+# the splitter settings or the embedding model change.
+# The index and the embedding model, with their imports (numpy, torch
+# for the huggingface backend), are loaded on first use or by the
+# warm-up thread started with the server, so the server answers the
+# MCP handshake without waiting for them.
 # -----------------------------------------------------------------------
 
 pdf_filename = "hr_policy_document.pdf"
 pdf_full_path = os.path.abspath(os.path.join(
     os.path.dirname(__file__), pdf_filename))
 
-# Load and split the PDF document
-loader = PyPDFLoader(pdf_full_path)
-policy_documents = loader.load_and_split()
 
-# Create embeddings
-policy_embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-# Create In memory vector store
-policy_vector_store = InMemoryVectorStore.from_documents(
-    policy_documents, policy_embeddings)
+# Reentrant, as building the index loads the embedding model
+_load_lock = threading.RLock()
+_policy_embeddings = None
+_policy_index = None
+
+
+# Create embeddings, with the backend of HR_POLICY_EMBEDDING_BACKEND.
+# The model is only loaded when it is needed, to embed a query or to
+# rebuild the index.
+def get_policy_embeddings():
+    global _policy_embeddings
+    with _load_lock:
+        if _policy_embeddings is None:
+            import hr_policy_embeddings
+            _policy_embeddings = hr_policy_embeddings.create_embeddings()
+        return _policy_embeddings
+
+
+# Load the persisted index, or build it on first run.
+# The search backend (dense, ivf or hnsw) can be selected for
+# large corpora, see hr_policy_retrieval.py
+def get_policy_index():
+    global _policy_index
+    with _load_lock:
+        if _policy_index is None:
+            import hr_policy_embeddings
+            import hr_policy_index
+            _policy_index = hr_policy_index.load_or_build_index(
+                pdf_full_path, get_policy_embeddings,
+                model_name=hr_policy_embeddings.embedding_model_id(),
+                backend=os.getenv("HR_POLICY_SEARCH_BACKEND", "dense"))
+        return _policy_index
+
+
+# Load the index and the model, and embed a first query, which is
+# slower than the next ones. Logs go to stderr, as stdout carries the
+# MCP messages.
+def warm_up():
+    start = time.perf_counter()
+    try:
+        get_policy_index()
+        get_policy_embeddings().embed_query("warm up")
+    except Exception as e:
+        print("HR policy warm-up failed: ", repr(e), file=sys.stderr)
+        return
+    print(f"HR policy index ready in {time.perf_counter() - start:.2f}s",
+          file=sys.stderr)
 
 # -----------------------------------------------------------------------
 # Setup the MCP tool to query for policies, given a user query string
@@ -39,15 +86,46 @@ policy_vector_store = InMemoryVectorStore.from_documents(
 
 
 @hr_policies_mcp.tool()
-def query_policies(query: str):
+def query_policies(query: str, ctx: Context = None):
     """Query the HR policies document for information about
     leave, timeoff, benefits, work hours, remote work and 
     workplace conduct policies"""
 
-    # Perform a similarity search in the vector store
-    results = policy_vector_store.similarity_search(query, k=3)
+    # Perform a similarity search in the vector index
+    with tracing.span("mcp.query_policies",
+                      parent=tracing.extract_mcp(ctx)):
+        with tracing.span("embed_query"):
+            query_vector = get_policy_embeddings().embed_query(query)
+        with tracing.span("index_search"):
+            results = get_policy_index().search(query_vector, k=3)
     return results
 
+
+@hr_policies_mcp.tool()
+def query_policies_batch(queries: list[str], k: int = 3,
+                         ctx: Context = None):
+    """Query the HR policies document with several related questions
+    at once, for example the sub-questions of a complex query about
+    leave, timeoff, benefits, work hours, remote work and workplace
+    conduct policies. Returns the matching sections for each query"""
+
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    if not queries:
+        return []
+
+    # Embed all the queries in one forward pass, and search them
+    # in one matrix multiply
+    with tracing.span("mcp.query_policies_batch",
+                      parent=tracing.extract_mcp(ctx),
+                      queries=len(queries)):
+        with tracing.span("embed_query"):
+            query_vectors = get_policy_embeddings().embed_documents(queries)
+        with tracing.span("index_search"):
+            results = get_policy_index().search_batch(query_vectors, k=k)
+    return [{"query": query, "results": documents}
+            for query, documents in zip(queries, results)]
+
 # -----------------------------------------------------------------------
 # Setup the MCP prompt to dynamically generate the prompt for the LLM
 # using the input query.
@@ -74,4 +152,20 @@ def get_llm_prompt(query: str) -> str:
 
 
 if __name__ == "__main__":
-    hr_policies_mcp.run(transport="stdio")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report the import time breakdown of the "
+                             "server, and the time to its MCP handshake")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        import startup_profile
+        startup_profile.profile_startup(
+            __file__, stdio_server=True, stdio_tool="query_policies",
+            stdio_arguments={"query": "What is the leave policy?"})
+    else:
+        # Set HR_POLICY_WARM_UP=false to load the index on the first
+        # tool call instead
+        if os.getenv("HR_POLICY_WARM_UP", "true").lower() == "true":
+            threading.Thread(target=warm_up, daemon=True).start()
+        hr_policies_mcp.run(transport="stdio")
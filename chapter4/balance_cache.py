@@ -0,0 +1,159 @@
+#-----------------------------------------------------------------------
+# Read-through cache of time off balances, keyed by employee name.
+# Entries are dropped when a request changes the balance, and the cache
+# is bounded by size (LRU) and, optionally, by entry age (TTL).
+#
+# Several server replicas can share a database. An InvalidationChannel
+# sends the invalidations of one replica to the others over UDP, so
+# their caches do not keep serving an old balance. UDP may drop a
+# message, so a TTL should bound how stale a missed entry can get.
+#-----------------------------------------------------------------------
+
+import json
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class BalanceCache:
+    """max_size : LRU bound on the number of cached balances
+    ttl         : maximum age of an entry in seconds, None for no limit
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()    # name -> (balance, stored at)
+        self._loading = {}              # name -> token of the ongoing load
+        self._lock = threading.Lock()
+        self.channel = None
+
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0,
+                      "invalidations": 0, "remote_invalidations": 0}
+
+    #Return the cached balance, or load it with load(name) and cache it
+    def get(self, name, load):
+        hit, value = self._lookup(name)
+        if hit:
+            return value
+        balance = load(name)
+        self._store(name, value, balance)
+        return balance
+
+    #Same as get, for an async load(name)
+    async def aget(self, name, load):
+        hit, value = self._lookup(name)
+        if hit:
+            return value
+        balance = await load(name)
+        self._store(name, value, balance)
+        return balance
+
+    #Return (True, balance) on a hit, or (False, token of the load)
+    def _lookup(self, name):
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None and (self.ttl is None or
+                                      time.monotonic() - entry[1] < self.ttl):
+                self.entries.move_to_end(name)
+                self.stats["hits"] += 1
+                return True, entry[0]
+            self.stats["misses"] += 1
+            token = object()
+            self._loading[name] = token
+            return False, token
+
+    def _store(self, name, token, balance):
+        with self._lock:
+            # The balance is only stored when no invalidation came in
+            # while it was loaded, as it could be older than the change
+            if self._loading.get(name) is token:
+                del self._loading[name]
+                if balance is not None:
+                    self.entries[name] = (balance, time.monotonic())
+                    self.entries.move_to_end(name)
+                    while len(self.entries) > self.max_size:
+                        self.entries.popitem(last=False)
+                        self.stats["evictions"] += 1
+
+    #Drop the balances of the given employees, or all of them when no
+    #names are given, and tell the other replicas
+    def invalidate(self, *names, remote=False):
+        with self._lock:
+            if names:
+                for name in names:
+                    self.entries.pop(name, None)
+                    self._loading.pop(name, None)
+            else:
+                self.entries.clear()
+                self._loading.clear()
+            self.stats["remote_invalidations" if remote
+                       else "invalidations"] += 1
+        if self.channel and not remote:
+            self.channel.publish(names)
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats,
+                    "size": len(self.entries),
+                    "max_size": self.max_size,
+                    "ttl": self.ttl,
+                    "hit_ratio": (self.stats["hits"] / lookups
+                                  if lookups else 0.0),
+                    "peers": self.channel.peers if self.channel else []}
+
+
+#Parse "host:port"
+def parse_address(address):
+    host, port = address.strip().rsplit(":", 1)
+    return host, int(port)
+
+
+class InvalidationChannel:
+    """Sends invalidations to the peer replicas over UDP, and applies the
+    ones received from them to the cache.
+    listen : "host:port" to receive invalidations on
+    peers  : list of "host:port" of the other replicas
+    """
+
+    def __init__(self, cache, listen, peers):
+        self.cache = cache
+        self.peers = [address.strip() for address in peers if address.strip()]
+        self.peer_addresses = [parse_address(address) for address in self.peers]
+        self.sender_id = uuid.uuid4().hex
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(parse_address(listen))
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+
+    def start(self):
+        self.cache.channel = self
+        self._thread.start()
+        return self
+
+    def publish(self, names):
+        message = json.dumps({"sender": self.sender_id,
+                              "names": list(names)}).encode("utf-8")
+        for address in self.peer_addresses:
+            try:
+                self.socket.sendto(message, address)
+            except OSError as e:
+                print("Could not send cache invalidation to ", address, e)
+
+    def _receive(self):
+        while True:
+            try:
+                data, _ = self.socket.recvfrom(65536)
+                message = json.loads(data)
+            except OSError:
+                return
+            except ValueError:
+                continue
+            if message.get("sender") != self.sender_id:
+                self.cache.invalidate(*message.get("names", []), remote=True)
+
+    def close(self):
+        self.socket.close()
@@ -1,75 +1,131 @@
-from mcp import ClientSession, StdioServerParameters
 from mcp.client.streamable_http import streamablehttp_client
 
-from langchain_mcp_adapters.tools import load_mcp_tools
-from langchain_mcp_adapters.prompts import load_mcp_prompt
-
-from langgraph.prebuilt import create_react_agent
-from langchain_openai import AzureChatOpenAI
-
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+from mcp_session_pool import (MCPSessionPool,
+                              prompt_placeholders, render_prompt)
+from agent_events import stream_agent_events
+import tracing
+
 load_dotenv()
 
 #-----------------------------------------------------------------------
 # Setup the LLM for the HR Timeoff Agent
 # This uses the Azure OpenAI service with a specific deployment
 # Please replace the environment variables with your own values
+# The model is created on first use, so importing this module does not
+# import the OpenAI client or need the credentials. Assign model to run
+# the agent with another chat model.
 #-----------------------------------------------------------------------
 
-
 endpoint = os.getenv("ENDPOINT_URL")
 deployment = os.getenv("DEPLOYMENT_NAME")
 subscription_key = os.getenv("AZURE_OPENAI_API_KEY")
 api_version=os.getenv("API_VERSION")
 
-model=AzureChatOpenAI(
-    azure_endpoint=endpoint,
-    api_key=subscription_key,
-    api_version=api_version,
-    deployment_name=deployment,
+model = None
+
+def get_model():
+    global model
+    if model is None:
+        from langchain_openai import AzureChatOpenAI
+        model = AzureChatOpenAI(
+            azure_endpoint=endpoint,
+            api_key=subscription_key,
+            api_version=api_version,
+            deployment_name=deployment,
+        )
+    return model
+#-----------------------------------------------------------------------
+# Setup the pool of MCP sessions to the timeoff server.
+# Each session keeps its connection open, along with the tools,
+# prompt template and agent built from it.
+#-----------------------------------------------------------------------
+
+# Make sure the right URL to the MCP Server is passed.
+# and MCP server is running and accessible
+mcp_server_url = os.getenv("TIMEOFF_MCP_URL", "http://localhost:8000/mcp")
+
+# Tools given to the agent, which acts for an employee. Other tools of
+# the server (e.g. the admin imports) are never bound to it.
+EMPLOYEE_TOOLS = ["get_timeoff_balance", "request_timeoff",
+                  "get_timeoff_history", "get_team_calendar"]
+
+async def setup_timeoff_session(session):
+    # Imported on first use, as they are most of the import time of
+    # this module
+    from langchain_mcp_adapters.tools import load_mcp_tools
+    from langchain_mcp_adapters.prompts import load_mcp_prompt
+    from langgraph.prebuilt import create_react_agent
+
+    timeoff_tools = [tool for tool in await load_mcp_tools(session)
+                     if tool.name in EMPLOYEE_TOOLS]
+    print("\nTools loaded :")
+    for tool in timeoff_tools:
+        print("Tool : ", tool.name, " - ", tool.description)
+
+    timeoff_prompt = await load_mcp_prompt(session,
+                        "get_llm_prompt",
+                        arguments=prompt_placeholders("user", "prompt"))
+    print("\nPrompt loaded :", timeoff_prompt)
+
+    print("\nCreating agent instance")
+    agent = create_react_agent(get_model(), timeoff_tools)
+
+    return {"prompt": timeoff_prompt, "agent": agent}
+
+timeoff_session_pool = MCPSessionPool(
+    "Timeoff-MCP-Server",
+    connect=lambda: streamablehttp_client(mcp_server_url),
+    setup=setup_timeoff_session,
+    max_size=int(os.getenv("TIMEOFF_MCP_POOL_SIZE", "4")),
 )
+
 #-----------------------------------------------------------------------
 # Define the HR timeoff agent that will use the MCP server
 # to manage timeoff requests.
 #-----------------------------------------------------------------------
 async def run_timeoff_agent(user: str, prompt: str,) -> str:
 
-    # Make sure the right URL to the MCP Server is passed.
-    # and MCP server is running and accessible
-    mcp_server_url="http://localhost:8000/mcp"
-
     try:
-        async with streamablehttp_client(mcp_server_url) as (read, write, _):
-            async with ClientSession(read, write) as session:
-                print("initializing session")
-                await session.initialize()
+        # Borrow a warm session, with its tools and agent already loaded
+        async with timeoff_session_pool.session() as pooled:
+            timeoff_prompt = render_prompt(pooled.state["prompt"],
+                                           {"user": user, "prompt": prompt})
 
-                timeoff_tools = await load_mcp_tools(session)
-                print("\nTools loaded :")
-                for tool in timeoff_tools:
-                    print("Tool : ", tool.name, " - ", tool.description)
+            print("\nAnswering prompt : ", prompt)
+            agent_response = await pooled.state["agent"].ainvoke(
+                {"messages": timeoff_prompt},
+                config=tracing.callback_config())
 
-                timeoff_prompt = await load_mcp_prompt(session,
-                                    "get_llm_prompt",
-                                    arguments={"user" : user, "prompt" : prompt})
-                print("\nPrompt loaded :", timeoff_prompt)
-
-                print("\nCreating agent instance")
-                agent = create_react_agent(model, timeoff_tools)
-
-                print("\nAnswering prompt : ", prompt)
-                agent_response = await agent.ainvoke(
-                    {"messages": timeoff_prompt})
-
-                return agent_response["messages"][-1].content
+            return agent_response["messages"][-1].content
     except Exception as e:
         print(f"Error: {e}")
         return "Error"
 
-    
+#-----------------------------------------------------------------------
+# Streaming variant of the HR timeoff agent. Yields token and step
+# events as the agent runs, followed by a final event with the answer.
+#-----------------------------------------------------------------------
+async def stream_timeoff_agent(user: str, prompt: str):
+
+    try:
+        async with timeoff_session_pool.session() as pooled:
+            timeoff_prompt = render_prompt(pooled.state["prompt"],
+                                           {"user": user, "prompt": prompt})
+
+            print("\nStreaming answer to prompt : ", prompt)
+            async for event in stream_agent_events(
+                    pooled.state["agent"], {"messages": timeoff_prompt}):
+                yield event
+    except Exception as e:
+        print(f"Error: {e}")
+        yield {"type": "final", "text": "Error"}
 
 if __name__ == "__main__":
     #
@@ -0,0 +1,368 @@
+#-----------------------------------------------------------------------
+# Benchmarks for the TimeOffDatastore, on a temporary database file.
+#
+#   python chapter4/timeoff_benchmark.py concurrency
+#       Reads per second with a growing number of worker threads, and
+#       a concurrent write run checking that no update is lost.
+#
+#   python chapter4/timeoff_benchmark.py stress
+#       Many threads requesting days off for a single employee, some of
+#       the requests being retries with the same idempotency key, and
+#       some reusing a key for other days. The balance must never be
+#       overdrawn nor a request filed twice. Committed and rolled back
+#       requests are reported apart.
+#
+#   python chapter4/timeoff_benchmark.py bulk
+#       Rows per second loading an employee roster and a history of
+#       requests from CSV files, against one insert and commit per row.
+#
+#   python chapter4/timeoff_benchmark.py plans
+#       Loads 1M history rows and checks with EXPLAIN QUERY PLAN that
+#       the history, calendar and overlap queries search an index
+#       instead of scanning the table, checks that a one day calendar
+#       reads a small share of the rows, and times the queries.
+#-----------------------------------------------------------------------
+
+import argparse
+import csv
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from timeoff_datastore import (INSERT_EMPLOYEE, SELECT_CALENDAR,
+                               SELECT_CALENDAR_BY_NAMES,
+                               SELECT_HISTORY_PAGE, SELECT_OVERLAP,
+                               TimeOffDatastore, calendar_first_start_day)
+
+
+def create_datastore(directory, employees, pool_size, synchronous="NORMAL"):
+    datastore = TimeOffDatastore(os.path.join(directory, "benchmark.db"),
+                                 pool_size=pool_size,
+                                 synchronous=synchronous,
+                                 verbose=False)
+    with datastore.transaction() as cursor:
+        cursor.executemany(INSERT_EMPLOYEE,
+                           [(f"employee-{i}", 10000, 0)
+                            for i in range(employees)])
+    return datastore
+
+
+#A different day for each request, as overlapping leave is rejected
+def request_day(request_number):
+    return (date(2000, 1, 1) + timedelta(days=request_number)).isoformat()
+
+
+#Run work(worker_id, iteration) from several threads, and return the
+#number of calls per second
+def run_workers(workers, iterations, work):
+    barrier = threading.Barrier(workers + 1)
+
+    def worker(worker_id):
+        barrier.wait()
+        for iteration in range(iterations):
+            work(worker_id, iteration)
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return workers * iterations / (time.perf_counter() - start)
+
+
+def benchmark_concurrency(args):
+    with tempfile.TemporaryDirectory() as directory:
+        datastore = create_datastore(directory, args.employees,
+                                     max(args.workers), args.synchronous)
+
+        print(f"{'workers':>8} {'reads/s':>12}")
+        for workers in args.workers:
+            def read(worker_id, iteration):
+                name = f"employee-{(worker_id * 7919 + iteration) % args.employees}"
+                datastore.get_timeoff_balance(name)
+            rate = run_workers(workers, args.iterations, read)
+            print(f"{workers:>8} {rate:>12.0f}")
+
+        # Writes: every worker files 1-day requests for the same
+        # employees, and the total consumed days must add up
+        workers = max(args.workers)
+        writes = args.iterations // 10
+        def write(worker_id, iteration):
+            datastore.add_timeoff_request(
+                f"employee-{iteration % args.employees}",
+                request_day(worker_id * writes + iteration), 1)
+        rate = run_workers(workers, writes, write)
+
+        with datastore.pool.connection() as conn:
+            consumed = conn.execute(
+                "SELECT SUM(consumed_days) FROM employee "
+                "WHERE name LIKE 'employee-%'").fetchone()[0]
+        expected = workers * writes
+        print(f"\n{workers} writers: {rate:.0f} writes/s, consumed days "
+              f"{consumed} (expected {expected}) -> "
+              f"{'OK' if consumed == expected else 'LOST UPDATES'}")
+        datastore.close()
+
+
+def benchmark_stress(args):
+    with tempfile.TemporaryDirectory() as directory:
+        datastore = create_datastore(directory, 0, args.workers)
+        with datastore.transaction() as cursor:
+            cursor.execute(INSERT_EMPLOYEE, ("stress", args.allowed_days, 0))
+
+        results = {"filed": 0, "duplicates": 0, "rejected": 0,
+                   "conflicts": 0}
+        lock = threading.Lock()
+
+        def request(worker_id, iteration):
+            # Every few requests is a retry of the previous one, and
+            # others reuse the key of the previous one for another day
+            retry = args.retry_every and iteration % args.retry_every == 1
+            conflict = (args.conflict_every and not retry
+                        and iteration % args.conflict_every == 2)
+            number = (worker_id * args.requests
+                      + (iteration - 1 if retry else iteration))
+            key = number - 1 if conflict else number
+            try:
+                message = datastore.add_timeoff_request(
+                    "stress", request_day(number), 1,
+                    idempotency_key=str(key))
+                outcome = ("duplicates" if "already" in message
+                           else "filed")
+            except ValueError as e:
+                outcome = ("conflicts" if "Idempotency key" in str(e)
+                           else "rejected")
+            with lock:
+                results[outcome] += 1
+
+        rate = run_workers(args.workers, args.requests, request)
+        elapsed = args.workers * args.requests / rate
+
+        with datastore.pool.connection() as conn:
+            allowed, consumed = conn.execute(
+                "SELECT allowed_days, consumed_days FROM employee "
+                "WHERE name = 'stress'").fetchone()
+            history = conn.execute(
+                "SELECT COUNT(*), SUM(total_days) FROM timeoff_history"
+            ).fetchone()
+        datastore.close()
+
+    # Rejected requests roll back without writing, so they are not
+    # counted in the commit rate
+    rollbacks = results["rejected"] + results["conflicts"]
+    print(f"{args.workers} threads x {args.requests} requests: "
+          f"{rate:.0f} requests/s")
+    print(f"filed {results['filed']} "
+          f"({results['filed'] / elapsed:.0f} commits/s), "
+          f"duplicates {results['duplicates']}")
+    print(f"rejected {results['rejected']}, key conflicts "
+          f"{results['conflicts']} ({rollbacks / elapsed:.0f} rollbacks/s)")
+    print(f"consumed {consumed} of {allowed} days, "
+          f"{history[0]} history rows")
+    assert consumed <= allowed, "balance overdrawn"
+    assert consumed == results["filed"] == (history[1] or 0), \
+        "consumed days do not match the filed requests"
+    print("OK")
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+#Rows per second of load(datastore), on a new database each time.
+#prepare(datastore) runs first, and is not timed.
+def time_load(directory, name, load, prepare=None):
+    datastore = TimeOffDatastore(os.path.join(directory, f"{name}.db"),
+                                 verbose=False)
+    if prepare:
+        prepare(datastore)
+    start = time.perf_counter()
+    rows = load(datastore)
+    elapsed = time.perf_counter() - start
+    datastore.close()
+    return rows / elapsed
+
+
+def benchmark_bulk(args):
+    with tempfile.TemporaryDirectory() as directory:
+        employees_csv = os.path.join(directory, "employees.csv")
+        history_csv = os.path.join(directory, "history.csv")
+        write_csv(employees_csv, ["name", "allowed_days", "consumed_days"],
+                  ((f"employee-{i}", 25, 0) for i in range(args.employees)))
+        write_csv(history_csv, ["employee_name", "start_day", "total_days"],
+                  ((f"employee-{i % args.employees}",
+                    f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}", 1)
+                   for i in range(args.requests)))
+
+        print(f"{args.employees} employees, {args.requests} requests")
+        print(f"{'load':>28} {'rows/s':>12}")
+
+        # One statement and one commit per row, as seed_data used to
+        rows = min(args.row_by_row, args.employees)
+        def load_row_by_row(datastore):
+            for i in range(rows):
+                with datastore.transaction() as cursor:
+                    cursor.execute(INSERT_EMPLOYEE,
+                                   (f"employee-{i}", 25, 0))
+            return rows
+        rate = time_load(directory, "row_by_row", load_row_by_row)
+        print(f"{'employees row by row':>28} {rate:>12.0f}")
+
+        for batch_size in args.batch_sizes:
+            def load_employees(datastore):
+                return datastore.import_employees_csv(employees_csv,
+                                                      batch_size)
+            rate = time_load(directory, f"employees_{batch_size}",
+                             load_employees)
+            print(f"{f'employees csv batch={batch_size}':>28} {rate:>12.0f}")
+
+        for batch_size in args.batch_sizes:
+            def load_history(datastore):
+                loaded, skipped = datastore.import_timeoff_history_csv(
+                    history_csv, batch_size, apply_to_balance=True)
+                return loaded
+            rate = time_load(directory, f"history_{batch_size}",
+                             load_history,
+                             prepare=lambda datastore:
+                                 datastore.import_employees_csv(employees_csv))
+            print(f"{f'history csv batch={batch_size}':>28} {rate:>12.0f}")
+
+
+#Fails when the plan of a query does not search timeoff_history with
+#the given index, and the constraint when given (e.g. both bounds of a
+#range)
+def check_query_plan(conn, name, sql, params, index, constraint=""):
+    plan = [row[3] for row in
+            conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    print(f"{name}:")
+    for step in plan:
+        print(f"    {step}")
+    history_steps = [step for step in plan if "timeoff_history" in step
+                     or step.startswith(("SCAN h ", "SEARCH h "))]
+    assert history_steps and all(step.startswith("SEARCH") and index in step
+                                 and constraint in step
+                                 for step in history_steps), \
+        f"{name} does not search timeoff_history using {index} {constraint}"
+
+
+#Average milliseconds per call of query()
+def time_query(query, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        query()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark_plans(args):
+    with tempfile.TemporaryDirectory() as directory:
+        datastore = create_datastore(directory, args.employees, 4)
+        # One day off a week for each employee, on a different weekday
+        # from one employee to the next
+        days_per_employee = args.rows // args.employees
+        first_day = date(2000, 1, 3)
+        def requests():
+            for i in range(args.employees):
+                for j in range(days_per_employee):
+                    day = first_day + timedelta(days=j * 7 + i % 5)
+                    yield (f"employee-{i}", day.isoformat(), 1, None)
+
+        start = time.perf_counter()
+        loaded, _ = datastore.import_timeoff_history(requests(), 10000)
+        print(f"Loaded {loaded} history rows in "
+              f"{time.perf_counter() - start:.1f}s\n")
+
+        with datastore.pool.connection() as conn:
+            conn.execute("ANALYZE")
+            check_query_plan(conn, "history page", SELECT_HISTORY_PAGE,
+                             ("employee-42", "9999-12-31~", 0, 20),
+                             "idx_timeoff_history_employee_start")
+            check_query_plan(conn, "overlap check", SELECT_OVERLAP,
+                             (42, "2005-06-06", "2005-06-10"),
+                             "idx_timeoff_history_employee_end")
+            check_query_plan(conn, "team calendar", SELECT_CALENDAR,
+                             ("2005-06-06", "2005-06-10", "2005-06-06"),
+                             "idx_timeoff_history_start_end",
+                             "start_day>? AND start_day<?")
+            check_query_plan(conn, "team calendar by names",
+                             SELECT_CALENDAR_BY_NAMES,
+                             ('["employee-42"]', "2005-06-06",
+                              "2005-06-10", "2005-06-06"),
+                             "idx_timeoff_history_employee_start",
+                             "start_day>? AND start_day<?")
+
+            # The calendar reads the index entries of the rows starting
+            # from the first start day it is given to the end of the
+            # range
+            first_start_day = calendar_first_start_day(conn, "2005-06-06")
+            scanned = conn.execute(
+                "SELECT COUNT(*) FROM timeoff_history "
+                "WHERE start_day >= ? AND start_day <= ?",
+                (first_start_day, "2005-06-06")).fetchone()[0]
+            print(f"\none day calendar reads {scanned} of {loaded} rows")
+            assert scanned <= loaded // 100, \
+                "one day calendar reads more than 1% of the rows"
+
+        history_ms = time_query(
+            lambda: datastore.get_timeoff_history("employee-42"))
+        calendar = datastore.get_team_calendar("2005-06-06", "2005-06-06")
+        calendar_ms = time_query(
+            lambda: datastore.get_team_calendar("2005-06-06", "2005-06-06"))
+        names = [f"employee-{i}" for i in range(0, 50, 5)]
+        names_ms = time_query(
+            lambda: datastore.get_team_calendar("2005-06-06", "2005-06-06",
+                                                names))
+        print(f"\nhistory page: {history_ms:.3f} ms, one day calendar: "
+              f"{calendar_ms:.3f} ms ({len(calendar)} employees on leave), "
+              f"of {len(names)} employees: {names_ms:.3f} ms")
+        datastore.close()
+    print("OK")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    concurrency = subparsers.add_parser("concurrency")
+    concurrency.add_argument("--workers", type=int, nargs="+",
+                             default=[1, 2, 4, 8, 16])
+    concurrency.add_argument("--iterations", type=int, default=5000)
+    concurrency.add_argument("--employees", type=int, default=1000)
+    concurrency.add_argument("--synchronous", default="NORMAL")
+    concurrency.set_defaults(run=benchmark_concurrency)
+
+    stress = subparsers.add_parser("stress")
+    stress.add_argument("--workers", type=int, default=16)
+    stress.add_argument("--requests", type=int, default=500,
+                        help="Requests per thread")
+    stress.add_argument("--allowed-days", type=int, default=5000)
+    stress.add_argument("--retry-every", type=int, default=5,
+                        help="Resend every Nth request with the same key")
+    stress.add_argument("--conflict-every", type=int, default=7,
+                        help="Reuse the key of the previous request for "
+                             "another day every Nth request")
+    stress.set_defaults(run=benchmark_stress)
+
+    bulk = subparsers.add_parser("bulk")
+    bulk.add_argument("--employees", type=int, default=50000)
+    bulk.add_argument("--requests", type=int, default=200000)
+    bulk.add_argument("--batch-sizes", type=int, nargs="+",
+                      default=[100, 1000, 10000])
+    bulk.add_argument("--row-by-row", type=int, default=5000,
+                      help="Rows loaded one commit at a time")
+    bulk.set_defaults(run=benchmark_bulk)
+
+    plans = subparsers.add_parser("plans")
+    plans.add_argument("--rows", type=int, default=1000000)
+    plans.add_argument("--employees", type=int, default=2000)
+    plans.set_defaults(run=benchmark_plans)
+
+    args = parser.parse_args()
+    args.run(args)
@@ -1,69 +1,480 @@
+import asyncio
+import csv
+import functools
+import itertools
+import json
+import os
+import queue
+import random
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+import tracing
+
+#-----------------------------------------------------------------------
+# SQL statements. sqlite3 keeps a per-connection cache of prepared
+# statements keyed by the SQL text, so each statement is prepared once
+# per pooled connection and reused afterwards.
+#-----------------------------------------------------------------------
+SELECT_BALANCE = '''
+    SELECT allowed_days, consumed_days FROM employee WHERE name = ?
+'''
+
+SELECT_EMPLOYEE_ID = '''
+    SELECT id FROM employee WHERE name = ?
+'''
+
+# Idempotency keys are chosen by the clients, so they are only unique
+# per employee
+SELECT_TIMEOFF_BY_KEY = '''
+    SELECT start_day, total_days FROM timeoff_history
+    WHERE employee_id = ? AND idempotency_key = ?
+'''
+
+INSERT_EMPLOYEE = '''
+    INSERT OR IGNORE INTO employee (name, allowed_days, consumed_days)
+    VALUES (?, ?, ?)
+'''
+
+# Imported rosters update the allowance of existing employees, the
+# consumed days are only taken from the file for new employees
+UPSERT_EMPLOYEE = '''
+    INSERT INTO employee (name, allowed_days, consumed_days)
+    VALUES (?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET allowed_days = excluded.allowed_days
+'''
+
+INSERT_TIMEOFF = '''
+    INSERT INTO timeoff_history
+        (employee_id, start_day, end_day, total_days, idempotency_key)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Any leave of the employee that intersects the new request. Stored
+# leave may overlap itself (imported history, migrated rows), so every
+# row ending on or after the new start day is checked, found with
+# idx_timeoff_history_employee_end: the days are ISO dates, so they
+# sort as text in date order.
+SELECT_OVERLAP = '''
+    SELECT start_day, end_day FROM timeoff_history
+    WHERE employee_id = ? AND end_day >= ? AND start_day <= ?
+    ORDER BY end_day
+    LIMIT 1
+'''
+
+# History pages are read newest first, continuing after the
+# (start_day, id) of the last row of the previous page
+SELECT_HISTORY_PAGE = '''
+    SELECT h.id, h.start_day, h.end_day, h.total_days
+    FROM timeoff_history h JOIN employee e ON e.id = h.employee_id
+    WHERE e.name = ? AND (h.start_day, h.id) < (?, ?)
+    ORDER BY h.start_day DESC, h.id DESC
+    LIMIT ?
+'''
+
+# Days between the first and last day of the longest leave, read from
+# idx_timeoff_history_days without scanning the table
+SELECT_LONGEST_LEAVE = '''
+    SELECT MAX(julianday(end_day) - julianday(start_day))
+    FROM timeoff_history
+'''
+
+# Leave overlapping a date range starts at most the longest leave
+# before the range, so the calendar queries are given that first start
+# day, and search start_day on both sides. The CROSS JOIN keeps SQLite
+# from looping over all the employees first
+# (idx_timeoff_history_start_end).
+SELECT_CALENDAR = '''
+    SELECT e.name, h.start_day, h.end_day, h.total_days
+    FROM timeoff_history h CROSS JOIN employee e ON e.id = h.employee_id
+    WHERE h.start_day >= ? AND h.start_day <= ? AND h.end_day >= ?
+    ORDER BY h.start_day, e.name
+'''
+
+# Calendar of some employees, passed as a JSON list of names: their
+# leave is searched employee by employee
+# (idx_timeoff_history_employee_start)
+SELECT_CALENDAR_BY_NAMES = '''
+    SELECT e.name, h.start_day, h.end_day, h.total_days
+    FROM employee e CROSS JOIN timeoff_history h ON h.employee_id = e.id
+    WHERE e.name IN (SELECT value FROM json_each(?))
+        AND h.start_day >= ? AND h.start_day <= ? AND h.end_day >= ?
+    ORDER BY h.start_day, e.name
+'''
+
+# Rows for unknown employees select nothing, so they are skipped
+INSERT_TIMEOFF_BY_NAME = '''
+    INSERT INTO timeoff_history
+        (employee_id, start_day, end_day, total_days, idempotency_key)
+    SELECT id, ?, ?, ?, ? FROM employee WHERE name = ?
+'''
+
+ADD_CONSUMED_DAYS_BY_NAME = '''
+    UPDATE employee SET consumed_days = consumed_days + ? WHERE name = ?
+'''
+
+# The balance check is part of the UPDATE, so it cannot be overdrawn by
+# a concurrent request between a read and the write
+UPDATE_CONSUMED_DAYS = '''
+    UPDATE employee SET consumed_days = consumed_days + ?
+    WHERE id = ? AND consumed_days + ? <= allowed_days
+'''
+
+#Formats accepted for days, stored as ISO dates (YYYY-MM-DD)
+DAY_FORMATS = ["%Y/%m/%d", "%m/%d/%Y", "%d %B %Y", "%B %d, %Y",
+               "%d %b %Y", "%b %d, %Y", "%d-%B-%Y", "%d-%b-%Y",
+               "%B %d %Y", "%b %d %Y"]
+
+def parse_day(day):
+    day = day.strip()
+    try:
+        return date.fromisoformat(day)
+    except ValueError:
+        pass
+    for day_format in DAY_FORMATS:
+        try:
+            return datetime.strptime(day, day_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid day: {day}")
+
+def normalize_day(day):
+    return parse_day(day).isoformat()
+
+#First and last day (ISO dates) of a leave of total_days calendar days
+def day_range(start_day, total_days):
+    if total_days <= 0:
+        raise ValueError("The number of days must be positive")
+    start = parse_day(start_day)
+    return (start.isoformat(),
+            (start + timedelta(days=total_days - 1)).isoformat())
+
+#First day that leave overlapping start_day (ISO date) can start on
+def calendar_first_start_day(conn, start_day):
+    longest = conn.execute(SELECT_LONGEST_LEAVE).fetchone()[0] or 0
+    return (date.fromisoformat(start_day)
+            - timedelta(days=int(longest))).isoformat()
+
+#Split an iterable into lists of at most size items
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+#Stream the rows of a CSV file, given its path or an open text file
+def read_csv_rows(source):
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    else:
+        yield from csv.DictReader(source)
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+#-----------------------------------------------------------------------
+# Pool of SQLite connections, shared by threads (and by the executor
+# threads of async callers). Connections are created on demand, up to
+# the pool size; callers wait when all of them are in use.
+#-----------------------------------------------------------------------
+class ConnectionPool:
+
+    def __init__(self, connect, size):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                # A connection that cannot be opened gives its slot back
+                try:
+                    return self.connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            # Wake up now and then, to take a slot freed by a failed
+            # connect when no connection is returned
+            try:
+                return self._idle.get(timeout=1.0)
+            except queue.Empty:
+                pass
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
 
 #-----------------------------------------------------------------------
 # Class that provides initialization and CRUD operations for a time-off
 # database using SQLite
+#
+# db_path      : ":memory:" (default) or a database file. A file is
+#                opened in WAL mode, so readers run concurrently with
+#                the writer and data survives restarts.
+# pool_size    : maximum number of pooled connections. An in-memory
+#                database is private to its connection, so it always
+#                uses a single one.
+# synchronous  : SQLite synchronous setting (OFF, NORMAL, FULL, EXTRA). NORMAL
+#                is durable across application crashes in WAL mode and
+#                avoids an fsync per commit.
+# busy_timeout : milliseconds to wait for a lock held by another writer
+# max_retries  : times a write is retried, with exponential backoff,
+#                when the database stays locked past busy_timeout
+# verbose      : print the rows fetched, as the examples do
 #-----------------------------------------------------------------------
 class TimeOffDatastore:
     #Initialize the database connection, create tables and seed data
-    def __init__(self, db_path=":memory:"):
+    def __init__(self, db_path=":memory:", pool_size=8,
+                 synchronous="NORMAL", busy_timeout=5000, max_retries=5,
+                 verbose=True):
         print("Initializing TimeOffDatastore")
-        self.conn = sqlite3.connect(db_path)
+        self.db_path = db_path
+        self.verbose = verbose
+        # Checked, as it is written into the PRAGMA statement
+        self.synchronous = str(synchronous).upper()
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Invalid synchronous setting: {synchronous}")
+        self.busy_timeout = busy_timeout
+        self.max_retries = max_retries
+        self.in_memory = db_path == ":memory:"
+
+        self.pool = ConnectionPool(self.connect,
+                                   1 if self.in_memory else pool_size)
         print("Creating tables and seeding data")
         self.create_tables()
+        self.migrate()
         self.seed_data()
 
+    #Open a new pooled connection. Connections are in autocommit mode,
+    #transactions are started explicitly by transaction()
+    def connect(self):
+        conn = sqlite3.connect(self.db_path,
+                               check_same_thread=False,
+                               isolation_level=None,
+                               cached_statements=256)
+        if not self.in_memory:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    #Run the block in a transaction, committed when it completes and
+    #rolled back when it raises. immediate=True takes the write lock
+    #at BEGIN, for read-modify-write transactions.
+    @contextmanager
+    def transaction(self, immediate=False):
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn.cursor()
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        self.pool.close()
+
     # Create tables for employee and timeoff history
     def create_tables(self):
-        cursor = self.conn.cursor()
-
-        # employee table tracks time off balance also
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS employee (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                allowed_days INTEGER NOT NULL,
-                consumed_days INTEGER NOT NULL DEFAULT 0
-            )
-        ''')
-
-        # timeoff_history table tracks time off requests
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS timeoff_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                start_day TEXT NOT NULL,
-                total_days INTEGER NOT NULL,
-                FOREIGN KEY(employee_id) REFERENCES employee(id)
-            )
-        ''')
-        self.conn.commit()
+        with self.transaction() as cursor:
+
+            # employee table tracks time off balance also
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS employee (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    allowed_days INTEGER NOT NULL,
+                    consumed_days INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+
+            # timeoff_history table tracks time off requests
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS timeoff_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    employee_id INTEGER NOT NULL,
+                    start_day TEXT NOT NULL,
+                    end_day TEXT,
+                    total_days INTEGER NOT NULL,
+                    idempotency_key TEXT,
+                    FOREIGN KEY(employee_id) REFERENCES employee(id)
+                )
+            ''')
+
+    # Bring a database file created by an earlier version up to date
+    def migrate(self):
+        with self.transaction(immediate=True) as cursor:
+            columns = [row[1] for row in
+                       cursor.execute("PRAGMA table_info(timeoff_history)")]
+            if "idempotency_key" not in columns:
+                cursor.execute("ALTER TABLE timeoff_history "
+                               "ADD COLUMN idempotency_key TEXT")
+            if "end_day" not in columns:
+                cursor.execute("ALTER TABLE timeoff_history "
+                               "ADD COLUMN end_day TEXT")
+                self.migrate_days(cursor)
+
+            # NULL keys are not considered equal, so requests filed
+            # without a key are not affected. Keys were first unique
+            # across all employees.
+            cursor.execute("DROP INDEX IF EXISTS "
+                           "idx_timeoff_history_idempotency_key")
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS
+                    idx_timeoff_history_employee_key
+                ON timeoff_history (employee_id, idempotency_key)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS
+                    idx_timeoff_history_employee_start
+                ON timeoff_history (employee_id, start_day)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS
+                    idx_timeoff_history_employee_end
+                ON timeoff_history (employee_id, end_day)
+            ''')
+            # The calendar first searched end_day
+            cursor.execute("DROP INDEX IF EXISTS "
+                           "idx_timeoff_history_end_start")
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS
+                    idx_timeoff_history_start_end
+                ON timeoff_history (start_day, end_day)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS
+                    idx_timeoff_history_days
+                ON timeoff_history
+                    (julianday(end_day) - julianday(start_day))
+            ''')
+
+    # Rewrite the days of the requests filed before end_day was added,
+    # as ISO dates, and fill in their end days
+    def migrate_days(self, cursor):
+        updates = []
+        rows = cursor.execute("SELECT id, start_day, total_days "
+                              "FROM timeoff_history").fetchall()
+        for row_id, start_day, total_days in rows:
+            try:
+                updates.append(day_range(start_day, max(total_days, 1))
+                               + (row_id,))
+            except ValueError:
+                print("Skipping timeoff request with invalid day: ",
+                      start_day)
+        cursor.executemany("UPDATE timeoff_history "
+                           "SET start_day = ?, end_day = ? WHERE id = ?",
+                           updates)
 
     # Seed the database with initial data
     def seed_data(self):
-        cursor = self.conn.cursor()
         # Insert sample employees if not already present
         employees = [
             ("Alice", 20, 5),
             ("Bob", 15, 3),
             ("Charlie", 25, 10)
         ]
-        for name, allowed, consumed in employees:
-            cursor.execute('''
-                INSERT OR IGNORE INTO employee (name, allowed_days, consumed_days)
-                VALUES (?, ?, ?)
-            ''', (name, allowed, consumed))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.executemany(INSERT_EMPLOYEE, employees)
+
+    # Bulk load employees, given (name, allowed_days, consumed_days)
+    # tuples. All the rows are loaded in a single transaction, sent to
+    # SQLite batch_size rows at a time.
+    def import_employees(self, employees, batch_size=1000):
+        count = 0
+        with self.transaction(immediate=True) as cursor:
+            for batch in batched(employees, batch_size):
+                cursor.executemany(UPSERT_EMPLOYEE, batch)
+                count += len(batch)
+        return count
+
+    # Bulk load timeoff requests, given (employee_name, start_day,
+    # total_days, idempotency_key) tuples, in a single transaction.
+    # The requests are recorded as history, without checking for
+    # overlaps; with apply_to_balance they are also added to the
+    # consumed days of the employees.
+    # Returns the number of rows loaded and of rows skipped because
+    # the employee is unknown.
+    def import_timeoff_history(self, requests, batch_size=1000,
+                               apply_to_balance=False):
+        loaded = skipped = 0
+        with self.transaction(immediate=True) as cursor:
+            for batch in batched(requests, batch_size):
+                cursor.executemany(
+                    INSERT_TIMEOFF_BY_NAME,
+                    [day_range(start_day, total_days) + (total_days, key, name)
+                     for name, start_day, total_days, key in batch])
+                loaded += cursor.rowcount
+                skipped += len(batch) - cursor.rowcount
+
+                if apply_to_balance:
+                    totals = {}
+                    for name, _, total_days, _ in batch:
+                        totals[name] = totals.get(name, 0) + total_days
+                    cursor.executemany(
+                        ADD_CONSUMED_DAYS_BY_NAME,
+                        [(days, name) for name, days in totals.items()])
+        return loaded, skipped
+
+    # Bulk load employees from a CSV file (path or open file) with
+    # the columns name, allowed_days and optionally consumed_days
+    def import_employees_csv(self, source, batch_size=1000):
+        rows = ((row["name"], int(row["allowed_days"]),
+                 int(row.get("consumed_days") or 0))
+                for row in read_csv_rows(source))
+        return self.import_employees(rows, batch_size)
+
+    # Bulk load timeoff requests from a CSV file (path or open file)
+    # with the columns employee_name, start_day, total_days and
+    # optionally idempotency_key
+    def import_timeoff_history_csv(self, source, batch_size=1000,
+                                   apply_to_balance=False):
+        rows = ((row["employee_name"], row["start_day"],
+                 int(row["total_days"]), row.get("idempotency_key") or None)
+                for row in read_csv_rows(source))
+        return self.import_timeoff_history(rows, batch_size,
+                                           apply_to_balance)
 
     # Get timeoff balance for a specific employee
     def get_timeoff_balance(self, employee_name):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT allowed_days, consumed_days FROM employee WHERE name = ?
-        ''', (employee_name,))
-        row = cursor.fetchone()
-        print("Row fetched: ", row)
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_BALANCE, (employee_name,)).fetchone()
+        if self.verbose:
+            print("Row fetched: ", row)
         if row:
             allowed, consumed = row
             return allowed - consumed
@@ -71,41 +482,172 @@ class TimeOffDatastore:
             return None
 
     # Add a timeoff request for an employee
-    # This function checks if the employee has enough timeoff balance
-    # and updates the timeoff history and employee's consumed days
-    def add_timeoff_request(self, employee_name, start_day, total_days):
-        cursor = self.conn.cursor()
-
-        # Find employee ID and current consumed_days
-        cursor.execute('''
-            SELECT id, allowed_days, consumed_days FROM employee WHERE name = ?
-        ''', (employee_name,))
-        row = cursor.fetchone()
-        print("Row fetched: ", row)
-        if not row:
-            raise ValueError("Employee not found")
-        emp_id, allowed, consumed = row
-        if consumed + total_days > allowed:
-            raise ValueError("Not enough timeoff balance")
-
-        # Insert into timeoff_history
-        cursor.execute('''
-            INSERT INTO timeoff_history (employee_id, start_day, total_days)
-            VALUES (?, ?, ?)
-        ''', (emp_id, start_day, total_days))
-
-        # Update consumed_days
-        cursor.execute('''
-            UPDATE employee SET consumed_days = consumed_days + ?
-            WHERE id = ?
-        ''', (total_days, emp_id))
-        self.conn.commit()
+    # The balance check and the update are a single guarded UPDATE, run
+    # in a transaction that holds the write lock. Requests overlapping
+    # earlier leave are rejected. Requests sent again with the same
+    # idempotency key (e.g. retried by an agent) are only filed once; a
+    # key of the employee already used for other days is rejected.
+    def add_timeoff_request(self, employee_name, start_day, total_days,
+                            idempotency_key=None):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._add_timeoff_request(
+                    employee_name, start_day, total_days, idempotency_key)
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == self.max_retries:
+                    raise
+                # Back off before trying again, with jitter so that
+                # waiting writers do not retry in lockstep
+                delay = 0.01 * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+
+    def _add_timeoff_request(self, employee_name, start_day, total_days,
+                             idempotency_key):
+        with self.transaction(immediate=True) as cursor:
+
+            # Find employee ID
+            cursor.execute(SELECT_EMPLOYEE_ID, (employee_name,))
+            row = cursor.fetchone()
+            if self.verbose:
+                print("Row fetched: ", row)
+            if not row:
+                raise ValueError("Employee not found")
+            emp_id = row[0]
+
+            start_day, end_day = day_range(start_day, total_days)
+
+            if idempotency_key is not None:
+                cursor.execute(SELECT_TIMEOFF_BY_KEY,
+                               (emp_id, idempotency_key))
+                filed = cursor.fetchone()
+                if filed == (start_day, total_days):
+                    return "Timeoff request already filed"
+                if filed:
+                    raise ValueError("Idempotency key already used for the "
+                                     f"timeoff request from {filed[0]} for "
+                                     f"{filed[1]} days")
+
+            cursor.execute(SELECT_OVERLAP, (emp_id, start_day, end_day))
+            overlap = cursor.fetchone()
+            if overlap:
+                raise ValueError("Timeoff request overlaps the leave from "
+                                 f"{overlap[0]} to {overlap[1]}")
+
+            # Update consumed_days, only if the balance allows it
+            cursor.execute(UPDATE_CONSUMED_DAYS,
+                           (total_days, emp_id, total_days))
+            if cursor.rowcount == 0:
+                raise ValueError("Not enough timeoff balance")
+
+            # Insert into timeoff_history
+            cursor.execute(INSERT_TIMEOFF, (emp_id, start_day, end_day,
+                                            total_days, idempotency_key))
         return "Successfully added timeoff request"
 
+    # Get a page of the timeoff history of an employee, newest first.
+    # Pass the returned next_cursor to get the following page; it is
+    # None on the last page.
+    def get_timeoff_history(self, employee_name, limit=20, cursor=None):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        if cursor:
+            last_day, last_id = cursor.rsplit(":", 1)
+            last_id = int(last_id)
+        else:
+            # After any ISO date, so the first page starts at the newest
+            last_day, last_id = "9999-12-31~", 0
+        with self.pool.connection() as conn:
+            rows = conn.execute(SELECT_HISTORY_PAGE,
+                                (employee_name, last_day, last_id,
+                                 limit)).fetchall()
+        requests = [{"start_day": start_day, "end_day": end_day,
+                     "total_days": total_days}
+                    for _, start_day, end_day, total_days in rows]
+        next_cursor = (f"{rows[-1][1]}:{rows[-1][0]}"
+                       if len(rows) == limit else None)
+        return {"employee_name": employee_name, "requests": requests,
+                "next_cursor": next_cursor}
+
+    # Get the leave of all employees, or of the given ones, that
+    # overlaps the range from start_day to end_day (inclusive)
+    def get_team_calendar(self, start_day, end_day, employee_names=None):
+        start_day, end_day = normalize_day(start_day), normalize_day(end_day)
+        with self.pool.connection() as conn:
+            first_start_day = calendar_first_start_day(conn, start_day)
+            if employee_names:
+                rows = conn.execute(SELECT_CALENDAR_BY_NAMES,
+                                    (json.dumps(list(employee_names)),
+                                     first_start_day, end_day,
+                                     start_day)).fetchall()
+            else:
+                rows = conn.execute(SELECT_CALENDAR,
+                                    (first_start_day, end_day,
+                                     start_day)).fetchall()
+        return [{"employee_name": name, "start_day": first,
+                 "end_day": last, "total_days": total_days}
+                for name, first, last, total_days in rows]
+
+#-----------------------------------------------------------------------
+# Async front of a TimeOffDatastore, for asyncio servers. The blocking
+# sqlite3 calls run on a dedicated thread pool, so that they do not
+# block the event loop. With workers=0 they run inline, on the event
+# loop, as calls to the synchronous datastore would.
+#-----------------------------------------------------------------------
+class AsyncTimeOffDatastore:
+
+    def __init__(self, datastore, workers=8):
+        self.datastore = datastore
+        self.workers = workers
+        self.executor = (ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="timeoff-db")
+                         if workers > 0 else None)
+
+    #The span covers the wait for a free worker and the query
+    async def run(self, function, *args, **kwargs):
+        with tracing.span("db." + function.__name__):
+            if self.executor is None:
+                return function(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(function, *args, **kwargs))
+
+    async def get_timeoff_balance(self, employee_name):
+        return await self.run(self.datastore.get_timeoff_balance,
+                              employee_name)
+
+    async def add_timeoff_request(self, employee_name, start_day, total_days,
+                                  idempotency_key=None):
+        return await self.run(self.datastore.add_timeoff_request,
+                              employee_name, start_day, total_days,
+                              idempotency_key)
+
+    async def get_timeoff_history(self, employee_name, limit=20, cursor=None):
+        return await self.run(self.datastore.get_timeoff_history,
+                              employee_name, limit, cursor)
+
+    async def get_team_calendar(self, start_day, end_day,
+                                employee_names=None):
+        return await self.run(self.datastore.get_team_calendar,
+                              start_day, end_day, employee_names)
+
+    async def import_employees_csv(self, source, batch_size=1000):
+        return await self.run(self.datastore.import_employees_csv,
+                              source, batch_size)
+
+    async def import_timeoff_history_csv(self, source, batch_size=1000,
+                                         apply_to_balance=False):
+        return await self.run(self.datastore.import_timeoff_history_csv,
+                              source, batch_size, apply_to_balance)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.datastore.close()
+
 # Example usage:
 if __name__ == "__main__":
     ds = TimeOffDatastore()
     print("Alice's balance:", ds.get_timeoff_balance("Alice"))
     ds.add_timeoff_request("Alice", "2024-06-10", 2)
-    print("Alice's balance after request:", 
-            ds.get_timeoff_balance("Alice"))
\ No newline at end of file
+    print("Alice's balance after request:",
+            ds.get_timeoff_balance("Alice"))
@@ -1,8 +1,16 @@
+import argparse
+import io
 import os
+import sys
 from dotenv import load_dotenv
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 
-from timeoff_datastore import TimeOffDatastore
+from balance_cache import BalanceCache, InvalidationChannel
+from timeoff_datastore import AsyncTimeOffDatastore, TimeOffDatastore
+
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+import tracing
 
 #-----------------------------------------------------------------------
 #Setup the MCP Server
@@ -12,26 +20,155 @@ timeoff_mcp = FastMCP("Timeoff-MCP-Server")
 
 #-----------------------------------------------------------------------
 #Initialize the Timeoff Datastore
+#The data is kept in a SQLite file in WAL mode, shared by a pool of
+#connections so that concurrent tool calls do not serialize on reads.
+#The queries run on TIMEOFF_DB_WORKERS threads, off the event loop that
+#serves all the connected clients (0 runs them on the event loop).
+#-----------------------------------------------------------------------
+timeoff_db = AsyncTimeOffDatastore(
+    TimeOffDatastore(
+        db_path=os.getenv("TIMEOFF_DB_PATH",
+                          os.path.join(os.path.dirname(__file__),
+                                       "timeoff.db")),
+        pool_size=int(os.getenv("TIMEOFF_DB_POOL_SIZE", "8")),
+        synchronous=os.getenv("TIMEOFF_DB_SYNCHRONOUS", "NORMAL"),
+    ),
+    workers=int(os.getenv("TIMEOFF_DB_WORKERS", "8")),
+)
+import_batch_size = int(os.getenv("TIMEOFF_IMPORT_BATCH_SIZE", "1000"))
+
 #-----------------------------------------------------------------------
-timeoff_db = TimeOffDatastore()
+#Balance cache, emptied of an employee's balance by their requests.
+#With TIMEOFF_CACHE_PEERS (comma separated host:port of the other
+#replicas), invalidations are also sent to the other servers, and
+#received on TIMEOFF_CACHE_LISTEN.
+#-----------------------------------------------------------------------
+balance_cache = BalanceCache(
+    max_size=int(os.getenv("TIMEOFF_BALANCE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TIMEOFF_BALANCE_CACHE_TTL", "0")) or None,
+)
+cache_peers = os.getenv("TIMEOFF_CACHE_PEERS", "")
+if cache_peers:
+    InvalidationChannel(balance_cache,
+                        os.getenv("TIMEOFF_CACHE_LISTEN", "0.0.0.0:8100"),
+                        cache_peers.split(",")).start()
 
 #Tool to get time off balance for an employee
 @timeoff_mcp.tool()
-def get_timeoff_balance(employee_name: str) -> str:
+async def get_timeoff_balance(employee_name: str,
+                              ctx: Context = None) -> str:
     """Get the timeoff balance for the employee, given their name"""
 
     print("Getting timeoff balance for employee: ", employee_name)
-    return timeoff_db.get_timeoff_balance(employee_name)
+    with tracing.span("mcp.get_timeoff_balance",
+                      parent=tracing.extract_mcp(ctx)):
+        return await balance_cache.aget(employee_name,
+                                        timeoff_db.get_timeoff_balance)
 
 #Tool to add a time off request for an employee
 @timeoff_mcp.tool() 
-def request_timeoff(employee_name: str, start_day:str, days: int) -> str:
+async def request_timeoff(employee_name: str, start_day:str, days: int,
+                    idempotency_key: str | None = None,
+                    ctx: Context = None) -> str:
     """File a  timeoff request for the employee, 
-        given their name, start day and number of days"""
+        given their name, start day and number of days.
+        Pass start_day as an ISO date (YYYY-MM-DD).
+        When a request is retried, pass the same idempotency_key
+        so that it is not filed twice. Use a new key for each new
+        request of the employee"""
 
     print("Requesting timeoff for employee: ", employee_name)
-    return timeoff_db.add_timeoff_request(
-                employee_name, start_day, days)  
+    with tracing.span("mcp.request_timeoff",
+                      parent=tracing.extract_mcp(ctx)):
+        try:
+            return await timeoff_db.add_timeoff_request(
+                    employee_name, start_day, days, idempotency_key)  
+        finally:
+            balance_cache.invalidate(employee_name)
+
+#Tool to list past time off requests of an employee
+@timeoff_mcp.tool()
+async def get_timeoff_history(employee_name: str, limit: int = 20,
+                        cursor: str | None = None,
+                        ctx: Context = None) -> dict:
+    """Get the timeoff requests of the employee, newest first.
+        Results are paginated: pass the next_cursor of a result
+        to get the following page"""
+
+    print("Getting timeoff history for employee: ", employee_name)
+    with tracing.span("mcp.get_timeoff_history",
+                      parent=tracing.extract_mcp(ctx)):
+        return await timeoff_db.get_timeoff_history(employee_name, limit,
+                                                    cursor)
+
+#Tool to list who is on leave in a date range
+@timeoff_mcp.tool()
+async def get_team_calendar(start_day: str, end_day: str,
+                      employee_names: list[str] | None = None,
+                      ctx: Context = None) -> list[dict]:
+    """Get the time off of all employees, or of the given employees,
+        that overlaps the days from start_day to end_day"""
+
+    print("Getting team calendar from ", start_day, " to ", end_day)
+    with tracing.span("mcp.get_team_calendar",
+                      parent=tracing.extract_mcp(ctx)):
+        return await timeoff_db.get_team_calendar(start_day, end_day,
+                                                  employee_names)
+
+#-----------------------------------------------------------------------
+#Admin tools, to bulk import data. They change any employee's data, so
+#they are only served with TIMEOFF_ADMIN_TOOLS=true, by a server that
+#the employee facing agents do not connect to.
+#-----------------------------------------------------------------------
+admin_tools = os.getenv("TIMEOFF_ADMIN_TOOLS", "false").lower() == "true"
+
+#Tool to bulk import employees
+async def import_employees(csv_text: str, ctx: Context = None) -> str:
+    """Import employees from CSV text with the columns
+        name, allowed_days and optionally consumed_days.
+        Existing employees get their allowed days updated"""
+
+    print("Importing employees")
+    with tracing.span("mcp.import_employees",
+                      parent=tracing.extract_mcp(ctx)):
+        count = await timeoff_db.import_employees_csv(io.StringIO(csv_text),
+                                                      import_batch_size)
+    balance_cache.invalidate()
+    return f"Imported {count} employees"
+
+#Tool to bulk import past time off requests
+async def import_timeoff_history(csv_text: str,
+                           apply_to_balance: bool = False,
+                           ctx: Context = None) -> str:
+    """Import time off requests from CSV text with the columns
+        employee_name, start_day, total_days and optionally
+        idempotency_key. With apply_to_balance, the days are also
+        deducted from the employees' balances"""
+
+    print("Importing timeoff history")
+    with tracing.span("mcp.import_timeoff_history",
+                      parent=tracing.extract_mcp(ctx)):
+        loaded, skipped = await timeoff_db.import_timeoff_history_csv(
+            io.StringIO(csv_text), import_batch_size, apply_to_balance)
+    if apply_to_balance:
+        balance_cache.invalidate()
+    return (f"Imported {loaded} timeoff requests, "
+            f"skipped {skipped} for unknown employees")
+
+if admin_tools:
+    timeoff_mcp.add_tool(import_employees)
+    timeoff_mcp.add_tool(import_timeoff_history)
+
+#Hit and miss counts of the balance cache
+@timeoff_mcp.resource(
+    uri="timeoff://metrics/balance-cache",
+    name="Balance cache metrics",
+    description="Hits, misses, evictions and invalidations "
+                "of the time off balance cache",
+    mime_type="application/json",
+)
+def get_balance_cache_metrics() -> dict:
+    return balance_cache.metrics()
 
 #Get prompt for the LLM to use to answer the query
 @timeoff_mcp.prompt()
@@ -57,8 +194,18 @@ def get_llm_prompt(user: str, prompt: str) -> str:
 #print("New Time off balance for Alice: ", get_timeoff_balance("Alice"))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report the import time breakdown of the server")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        import startup_profile
+        startup_profile.profile_startup(__file__)
+        sys.exit(0)
+
     timeoff_mcp.run(transport="streamable-http",
-                    host="localhost",
-                    port=8000,
+                    host=os.getenv("TIMEOFF_MCP_HOST", "localhost"),
+                    port=int(os.getenv("TIMEOFF_MCP_PORT", "8000")),
                     path="/",
                     log_level="debug")
\ No newline at end of file
@@ -0,0 +1,153 @@
+#-----------------------------------------------------------------------
+# Load test of the time off MCP server over streamable-http.
+# Starts the server with each TIMEOFF_DB_WORKERS setting, on a database
+# file seeded with employees and history, and runs many concurrent MCP
+# clients against it. Reports p50/p99 latency of the tool calls.
+# TIMEOFF_DB_WORKERS=0 runs the queries on the event loop, as the
+# synchronous tools did.
+#
+#   python chapter4/timeoff_load_test.py
+#   python chapter4/timeoff_load_test.py --clients 64 --workers 0 4 16
+#-----------------------------------------------------------------------
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from fastmcp import Client
+from fastmcp.client.transports import StreamableHttpTransport
+
+from timeoff_datastore import TimeOffDatastore
+
+
+def seed_database(db_path, employees, history):
+    datastore = TimeOffDatastore(db_path, verbose=False)
+    datastore.import_employees((f"employee-{i}", 100000, 0)
+                               for i in range(employees))
+    first_day = date(2000, 1, 3)
+    datastore.import_timeoff_history(
+        ((f"employee-{i % employees}",
+          (first_day + timedelta(days=(i // employees) * 7 + i % 5)).isoformat(),
+          1, None)
+         for i in range(history)), batch_size=10000)
+    datastore.close()
+
+
+def start_server(db_path, workers, port, synchronous):
+    env = {**os.environ,
+           "TIMEOFF_DB_PATH": db_path,
+           "TIMEOFF_DB_WORKERS": str(workers),
+           "TIMEOFF_DB_SYNCHRONOUS": synchronous,
+           "TIMEOFF_MCP_PORT": str(port)}
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__),
+                                      "timeoff_db_server.py")],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("localhost", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("The timeoff MCP server did not start")
+
+
+#The calls of one client: mostly balance and history reads, with some
+#team calendars (the heaviest query) and new requests
+def client_calls(client_id, calls, employees, run):
+    for i in range(calls):
+        employee = f"employee-{(client_id * 31 + i) % employees}"
+        kind = i % 10
+        if kind < 4:
+            yield "get_timeoff_balance", {"employee_name": employee}
+        elif kind < 7:
+            yield "get_timeoff_history", {"employee_name": employee}
+        elif kind < 8:
+            day = (date(2001, 1, 1) + timedelta(days=i)).isoformat()
+            yield "get_team_calendar", {"start_day": day, "end_day": day}
+        else:
+            # A day after the seeded history, different for each call
+            day = date(2100, 1, 1) + timedelta(
+                days=(run * 100000 + client_id * calls + i) * 2)
+            yield "request_timeoff", {"employee_name": employee,
+                                      "start_day": day.isoformat(),
+                                      "days": 1}
+
+
+async def run_client(url, client_id, args, run, latencies):
+    async with Client(StreamableHttpTransport(url)) as client:
+        for tool, arguments in client_calls(client_id, args.calls,
+                                            args.employees, run):
+            start = time.perf_counter()
+            await client.call_tool(tool, arguments)
+            latencies.setdefault(tool, []).append(
+                (time.perf_counter() - start) * 1000)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_load(url, args, run):
+    latencies = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(url, i, args, run, latencies)
+                           for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--calls", type=int, default=50,
+                        help="Tool calls per client")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 8],
+                        help="TIMEOFF_DB_WORKERS settings to compare")
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=200000)
+    parser.add_argument("--synchronous", default="NORMAL",
+                        help="TIMEOFF_DB_SYNCHRONOUS of the server")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "timeoff.db")
+        print(f"Seeding {args.employees} employees and "
+              f"{args.history} history rows")
+        seed_database(db_path, args.employees, args.history)
+        url = f"http://localhost:{args.port}/mcp"
+
+        print(f"\n{args.clients} clients x {args.calls} calls")
+        print(f"{'workers':>8} {'tool':>20} {'p50 ms':>9} {'p99 ms':>9} "
+              f"{'calls/s':>9}")
+        for run, workers in enumerate(args.workers):
+            server = start_server(db_path, workers, args.port,
+                                  args.synchronous)
+            try:
+                latencies, elapsed = asyncio.run(run_load(url, args, run))
+            finally:
+                server.terminate()
+                server.wait()
+
+            all_latencies = [value for values in latencies.values()
+                             for value in values]
+            for tool, values in sorted(latencies.items()):
+                print(f"{workers:>8} {tool:>20} "
+                      f"{statistics.median(values):>9.1f} "
+                      f"{percentile(values, 0.99):>9.1f}")
+            print(f"{workers:>8} {'all':>20} "
+                  f"{statistics.median(all_latencies):>9.1f} "
+                  f"{percentile(all_latencies, 0.99):>9.1f} "
+                  f"{len(all_latencies) / elapsed:>9.0f}")
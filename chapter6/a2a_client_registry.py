@@ -0,0 +1,174 @@
+#-----------------------------------------------------------------------
+# Registry of A2A clients used by the router.
+# - Agent cards are cached per agent with a TTL. Once expired, the card
+#   is revalidated with its ETag (If-None-Match) when the server
+#   provides one, so an unchanged card costs a 304 instead of a body.
+# - Each remote agent gets one keep-alive httpx connection pool
+#   (HTTP/2 when enabled and the `h2` package is installed), reused by
+#   every message sent to that agent.
+#-----------------------------------------------------------------------
+
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+
+import httpx
+from a2a.client import A2AClient
+from a2a.types import AgentCard
+
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+import tracing
+
+AGENT_CARD_PATH = "/.well-known/agent.json"
+
+
+class CachedAgentCard:
+    def __init__(self, card, etag, ttl):
+        self.card = card
+        self.etag = etag
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+class A2AClientRegistry:
+
+    def __init__(self,
+                 card_ttl=300.0,
+                 http2=False,
+                 max_connections=20,
+                 max_keepalive_connections=10,
+                 keepalive_expiry=30.0,
+                 timeout=30.0,
+                 connect_timeout=5.0):
+
+        self.card_ttl = card_ttl
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+
+        # HTTP/2 needs the optional h2 package
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2:
+            print("h2 is not installed, using HTTP/1.1 connection pools")
+
+        self.cards = {}
+        self.http_clients = {}
+        self._loop = None
+        self.stats = {
+            "card_hits": 0,
+            "card_misses": 0,
+            "card_revalidated": 0,
+            "pool_hits": 0,
+            "pool_misses": 0,
+        }
+
+    #Build a registry from A2A_* environment variables
+    @classmethod
+    def from_env(cls):
+        return cls(
+            card_ttl=float(os.getenv("A2A_CARD_TTL", "300")),
+            http2=os.getenv("A2A_HTTP2", "false").lower() == "true",
+            max_connections=int(os.getenv("A2A_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(
+                os.getenv("A2A_MAX_KEEPALIVE_CONNECTIONS", "10")),
+            keepalive_expiry=float(os.getenv("A2A_KEEPALIVE_EXPIRY", "30")),
+            timeout=float(os.getenv("A2A_TIMEOUT", "30")),
+            connect_timeout=float(os.getenv("A2A_CONNECT_TIMEOUT", "5")),
+        )
+
+    #Connection pools belong to the event loop that created them. When
+    #used from a new loop (e.g. successive asyncio.run calls), the pools
+    #of the old loop are dropped, while cached agent cards are kept.
+    #Pools of a loop that is still open are closed on that loop; use
+    #run() to close them before a short-lived loop ends.
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._loop is not None and not self._loop.is_closed():
+                for http_client in self.http_clients.values():
+                    asyncio.run_coroutine_threadsafe(http_client.aclose(),
+                                                     self._loop)
+            self._loop = loop
+            self.http_clients = {}
+
+    #Return the connection pool for an agent, creating it on first use
+    def get_http_client(self, agent_card_url):
+        self._bind_loop()
+        key = agent_card_url.rstrip("/")
+        http_client = self.http_clients.get(key)
+        if http_client is None or http_client.is_closed:
+            self.stats["pool_misses"] += 1
+            http_client = httpx.AsyncClient(http2=self.http2,
+                                            limits=self.limits,
+                                            timeout=self.timeout)
+            self.http_clients[key] = http_client
+        else:
+            self.stats["pool_hits"] += 1
+        return http_client
+
+    #Return the agent card, fetching or revalidating it when expired
+    async def get_card(self, agent_card_url):
+        key = agent_card_url.rstrip("/")
+        cached = self.cards.get(key)
+        if cached is not None and not cached.expired:
+            self.stats["card_hits"] += 1
+            return cached.card
+
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+
+        print("Retrieving agent card at ", agent_card_url)
+        http_client = self.get_http_client(agent_card_url)
+        with tracing.span("a2a.agent_card", agent=key,
+                          revalidate=bool(headers)):
+            response = await http_client.get(key + AGENT_CARD_PATH,
+                                             headers=headers)
+
+        if response.status_code == 304 and cached is not None:
+            self.stats["card_revalidated"] += 1
+            card = cached.card
+        else:
+            response.raise_for_status()
+            self.stats["card_misses"] += 1
+            card = AgentCard.model_validate(response.json())
+
+        self.cards[key] = CachedAgentCard(card,
+                                          response.headers.get("ETag"),
+                                          self.card_ttl)
+        return card
+
+    #Return an A2A client for the agent, on its shared connection pool
+    async def get_client(self, agent_card_url):
+        card = await self.get_card(agent_card_url)
+        return A2AClient(self.get_http_client(agent_card_url),
+                         agent_card=card)
+
+    #Drop a cached card, e.g. after a request to the agent failed
+    def invalidate(self, agent_card_url):
+        self.cards.pop(agent_card_url.rstrip("/"), None)
+
+    async def aclose(self):
+        http_clients, self.http_clients = self.http_clients, {}
+        for http_client in http_clients.values():
+            await http_client.aclose()
+
+    #Run a coroutine in a new event loop, as the sync router graph does,
+    #and close the connection pools of that loop before it ends
+    def run(self, coroutine):
+
+        async def run_and_close():
+            try:
+                return await coroutine
+            finally:
+                await self.aclose()
+
+        return asyncio.run(run_and_close())
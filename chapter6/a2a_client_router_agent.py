@@ -1,6 +1,4 @@
-from a2a.client import A2AClient
 from typing import Any
-import httpx
 from uuid import uuid4
 from a2a.types import (
     SendMessageRequest,
@@ -8,16 +6,26 @@ from a2a.types import (
     SendStreamingMessageRequest,
 )
 
-from typing import TypedDict, Annotated
+from typing import TypedDict, Annotated, NotRequired
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
 from langchain_core.messages import AIMessage, SystemMessage, HumanMessage, AnyMessage
 import operator
 import asyncio
 import os
+import re
+import time
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
 import uuid
 import json
+import sys
+
+from a2a_client_registry import A2AClientRegistry
+from a2a_streaming import get_result_text, to_agent_event
+
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+import tracing
 
 load_dotenv()
 
@@ -26,12 +34,103 @@ deployment = os.getenv("DEPLOYMENT_NAME")
 subscription_key = os.getenv("AZURE_OPENAI_API_KEY")
 api_version = os.getenv("API_VERSION")
 
-model = AzureChatOpenAI(
-    azure_endpoint=endpoint,
-    api_key=subscription_key,
-    api_version=api_version,
-    deployment_name=deployment,
-)
+# The model is created on first use, so importing the router does not
+# import the OpenAI client or need the credentials
+model = None
+
+def get_model():
+    global model
+    if model is None:
+        from langchain_openai import AzureChatOpenAI
+        model = AzureChatOpenAI(
+            azure_endpoint=endpoint,
+            api_key=subscription_key,
+            api_version=api_version,
+            deployment_name=deployment,
+        )
+    return model
+
+# ---------------------------------------------------------------
+# Remote A2A agents, by route chosen by the router
+# ---------------------------------------------------------------
+POLICY_AGENT_URL = os.getenv("POLICY_AGENT_URL", "http://localhost:9001")
+TIMEOFF_AGENT_URL = os.getenv("TIMEOFF_AGENT_URL", "http://localhost:9002")
+
+AGENT_ROUTES = {"POLICY": POLICY_AGENT_URL,
+                "TIMEOFF": TIMEOFF_AGENT_URL}
+
+ROUTER_SYSTEM_PROMPT = """ 
+You are a Router, that analyzes the input query and chooses 3 options:
+POLICY: If the query is about HR policies, like leave, remote work, etc.
+TIMEOFF: If the query is about time off requests, both creating requests and checking balances
+UNSUPPORTED: Any other query that is not related to HR policies or time off requests.
+
+The output should only be just one word out of the possible 3 : POLICY, TIMEOFF, UNSUPPORTED.
+"""
+
+# Prompt of the fan-out mode, where a query can be sent to several
+# agents at once
+FAN_OUT_SYSTEM_PROMPT = """
+You are a Router, that splits the input query into the requests it contains,
+and chooses the agent for each request:
+POLICY: If the request is about HR policies, like leave, remote work, etc.
+TIMEOFF: If the request is about time off requests, both creating requests and checking balances
+
+The output should only be JSON, in this form:
+{"destinations": [{"agent": "POLICY", "prompt": "<request for this agent>"},
+                  {"agent": "TIMEOFF", "prompt": "<request for this agent>"}]}
+List only the agents that are needed, each with a self contained request.
+List each agent at most once: put all the requests for an agent in its prompt.
+If no part of the query is about HR policies or time off requests, output:
+{"destinations": []}
+"""
+
+# Titles of the answers of each agent, when a query was fanned out
+BRANCH_TITLES = {"POLICY": "HR policy", "TIMEOFF": "Time off"}
+
+
+# ---------------------------------------------------------------
+# Parse the destinations chosen in fan-out mode, as a list of
+# (route, prompt). A plain route name sends the whole prompt, and
+# the requests of an agent listed more than once are merged.
+# ---------------------------------------------------------------
+def parse_destinations(content: str, prompt: str) -> list[tuple[str, str]]:
+    content = content.strip()
+    if content in AGENT_ROUTES:
+        return [(content, prompt)]
+
+    # Accept JSON wrapped in a markdown code block
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    try:
+        destinations = json.loads(match.group(0))["destinations"]
+    except (AttributeError, ValueError, KeyError, TypeError):
+        print(f"Unable to parse the destinations : {content}")
+        return []
+    if not isinstance(destinations, list):
+        destinations = [destinations]
+
+    prompts = {}
+    for destination in destinations:
+        # Route names alone send the whole prompt
+        if isinstance(destination, str):
+            destination = {"agent": destination}
+        if not isinstance(destination, dict):
+            print(f"Skipping invalid destination : {destination}")
+            continue
+        route = str(destination.get("agent", "")).upper()
+        if route not in AGENT_ROUTES:
+            continue
+        route_prompt = str(destination.get("prompt") or prompt)
+        if route_prompt not in prompts.setdefault(route, []):
+            prompts[route].append(route_prompt)
+    return [(route, "\n".join(route_prompts))
+            for route, route_prompts in prompts.items()]
+
+# ---------------------------------------------------------------
+# Registry of A2A clients, caching agent cards and keeping one
+# connection pool per remote agent. Configured with A2A_* env vars
+# ---------------------------------------------------------------
+a2a_client_registry = A2AClientRegistry.from_env()
 
 # ---------------------------------------------------------------
 # Generic method to invoke a remote agent with A2A
@@ -40,40 +139,90 @@ model = AzureChatOpenAI(
 
 async def execute_a2a_agent(agent_card_url: str,
                             user: str,
-                            prompt: str) -> str:
+                            prompt: str,
+                            registry: A2AClientRegistry | None = None) -> str:
+
+    registry = registry or a2a_client_registry
+    with tracing.span("a2a.send", agent=agent_card_url):
+        try:
+            client = await registry.get_client(agent_card_url)
+            print("Agent URL received :", client.url)
+
+            print("prompting agent ", client.url)
+            request = SendMessageRequest(
+                id=str(uuid4()),
+                params=build_message_params(user, prompt)
+            )
+            response = await client.send_message(request)
+        except Exception:
+            # The agent may have moved or changed, fetch its card again
+            registry.invalidate(agent_card_url)
+            raise
+
+    # Extract text from the response object
+    response_json = response.model_dump(mode='json', exclude_none=True)
+    text = get_result_text(response_json.get("result"))
+    print("Response from agent = ", text)
+    return text
+
+
+# The trace context of trace_span, or of the current span, is sent in
+# the message metadata
+def build_message_params(user: str, prompt: str,
+                         trace_span=None) -> MessageSendParams:
+    input_dict = {"user": user, "prompt": prompt}
+
+    send_message_payload: dict[str, Any] = {
+        "message": {
+            "role": "user",
+            "parts": [
+                {"kind": "text", "text": json.dumps(input_dict)},
+            ],
+            "messageId": uuid4().hex,
+        },
+    }
+    metadata = tracing.inject(span=trace_span)
+    if metadata:
+        send_message_payload["message"]["metadata"] = metadata
+    return MessageSendParams(**send_message_payload)
 
-    print("Retrieving agent card at ", agent_card_url)
-    async with httpx.AsyncClient(timeout=30) as httpx_client:
 
-        client = await A2AClient.get_client_from_agent_card_url(
-            httpx_client, agent_card_url
-        )
-        print("Agent URL received :", client.url)
-
-        input_dict = {"user": user, "prompt": prompt}
-
-        send_message_payload: dict[str, Any] = {
-            "message": {
-                "role": "user",
-                "parts": [
-                    {"kind": "text", "text": json.dumps(input_dict)},
-                ],
-                "messageId": uuid4().hex,
-            },
-        }
-
-        print("prompting agent ", client.url)
-        request = SendMessageRequest(
+# ---------------------------------------------------------------
+# Streaming variant, using message/stream. Yields token and step
+# events as the remote agent runs, then a final event with the answer
+# ---------------------------------------------------------------
+async def stream_a2a_agent(agent_card_url: str,
+                           user: str,
+                           prompt: str,
+                           registry: A2AClientRegistry | None = None):
+
+    registry = registry or a2a_client_registry
+
+    # Not the current span, as a generator cannot hold it across yields
+    span = tracing.start_span("a2a.stream", agent=agent_card_url)
+    try:
+        client = await registry.get_client(agent_card_url)
+
+        print("streaming from agent ", client.url)
+        request = SendStreamingMessageRequest(
             id=str(uuid4()),
-            params=MessageSendParams(**send_message_payload)
+            params=build_message_params(user, prompt, trace_span=span)
         )
-        response = await client.send_message(request)
-
-        # Extract text from the response object
-        response_json = response.model_dump(mode='json', exclude_none=True)
-        text = response_json.get("result").get("parts")[0].get("text")
-        print("Response from agent = ", text)
-        return text
+        async for response in client.send_message_streaming(request):
+            response_json = response.model_dump(mode='json',
+                                                exclude_none=True)
+            if "error" in response_json:
+                raise RuntimeError(f"Agent error: {response_json['error']}")
+            event = to_agent_event(response_json.get("result", {}))
+            if event:
+                yield event
+    except Exception as e:
+        # The agent may have moved or changed, fetch its card again
+        registry.invalidate(agent_card_url)
+        span.end(error=e)
+        raise
+    finally:
+        span.end()
 
 
 # ---------------------------------------------------------------
@@ -82,22 +231,74 @@ async def execute_a2a_agent(agent_card_url: str,
 # ---------------------------------------------------------------
 class RouterAgentState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
+    # Optional per-conversation user, overriding the router's default
+    user: NotRequired[str]
+    # Answers of the agents a query was fanned out to
+    branches: NotRequired[list[dict]]
 
 
 class RouterHRAgent:
 
-    def __init__(self, model, system_prompt, user, debug=False):
+    def __init__(self, model, system_prompt, user, debug=False,
+                 pre_router=None, fan_out=False, branch_timeout=60.0):
 
         self.system_prompt = system_prompt
         self.model = model
         self.debug = debug
         self.user = user
 
+        # Optional local classifier tried before the LLM. Its route()
+        # returns a destination, or None to fall back to the LLM
+        self.pre_router = pre_router
+
+        # A2A clients shared by all conversations on this router
+        self.registry = a2a_client_registry
+
+        # In fan-out mode, the router can send parts of a query to
+        # several agents, which run concurrently, each for at most
+        # branch_timeout seconds. Use with FAN_OUT_SYSTEM_PROMPT.
+        self.fan_out = fan_out
+        self.branch_timeout = branch_timeout
+
+        # Synchronous graph, for use with invoke()
+        self.router_graph = self.build_graph(self.call_llm,
+                                             self.policy_agent_node,
+                                             self.timeoff_agent_node,
+                                             self.fan_out_node)
+
+        # Async graph, for use with ainvoke() / astream() on a running
+        # event loop. Concurrent conversations share the loop and the
+        # A2A connection pools.
+        self.async_router_graph = self.build_graph(self.acall_llm,
+                                                   self.apolicy_agent_node,
+                                                   self.atimeoff_agent_node,
+                                                   self.afan_out_node)
+
+    def build_graph(self, router_node, policy_node, timeoff_node,
+                    fan_out_node):
+
         router_graph = StateGraph(RouterAgentState)
-        router_graph.add_node("Router", self.call_llm)
-        router_graph.add_node("Policy_Agent", self.policy_agent_node)
-        router_graph.add_node("Timeoff_Agent", self.timeoff_agent_node)
+        router_graph.add_node("Router", router_node)
         router_graph.add_node("Unsupported_functions", self.unsupported_node)
+        router_graph.add_edge("Unsupported_functions", END)
+        router_graph.set_entry_point("Router")
+
+        if self.fan_out:
+            # Router -> Fan_Out (all chosen agents, concurrently) -> Join
+            router_graph.add_node("Fan_Out", fan_out_node)
+            router_graph.add_node("Join", self.join_node)
+            router_graph.add_conditional_edges(
+                "Router",
+                self.find_fan_out_route,
+                {"FAN_OUT": "Fan_Out",
+                 "UNSUPPORTED": "Unsupported_functions"}
+            )
+            router_graph.add_edge("Fan_Out", "Join")
+            router_graph.add_edge("Join", END)
+            return router_graph.compile()
+
+        router_graph.add_node("Policy_Agent", policy_node)
+        router_graph.add_node("Timeoff_Agent", timeoff_node)
 
         router_graph.add_conditional_edges(
             "Router",
@@ -110,13 +311,31 @@ class RouterHRAgent:
         # One way routing, not coming back to router
         router_graph.add_edge("Policy_Agent", END)
         router_graph.add_edge("Timeoff_Agent", END)
-        router_graph.add_edge("Unsupported_functions", END)
-
-        # Set where there graph starts
-        router_graph.set_entry_point("Router")
-        self.router_graph = router_graph.compile()
-
-    def call_llm(self, state: RouterAgentState):
+        return router_graph.compile()
+
+    # Stream the answer to a user message: yields token, step and
+    # final events from the async graph, as the chosen agent runs
+    async def astream_response(self, message, user=None, config=None):
+        user_message = {"messages": [HumanMessage(message)],
+                        "user": user or self.user}
+        async for event in self.async_router_graph.astream(
+                user_message, config=tracing.callback_config(config),
+                stream_mode="custom"):
+            yield event
+
+    # Answer a user message with the sync graph, as the router's user
+    def invoke(self, message, config=None):
+        user_message = {"messages": [HumanMessage(message)]}
+        result = self.router_graph.invoke(
+            user_message, config=tracing.callback_config(config))
+        return result["messages"][-1].content
+
+    # Close the connection pools used by the async graph
+    async def aclose(self):
+        print("A2A client registry stats : ", self.registry.stats)
+        await self.registry.aclose()
+
+    def get_llm_messages(self, state: RouterAgentState):
         messages = state["messages"]
 
         if self.debug:
@@ -125,9 +344,38 @@ class RouterHRAgent:
         # If system prompt exists, add to messages in the front
         if self.system_prompt:
             messages = [SystemMessage(content=self.system_prompt)] + messages
+        return messages
+
+    def call_llm(self, state: RouterAgentState):
+        # Try the fast path first. It picks a single agent, so it is
+        # not used in fan-out mode.
+        if self.pre_router and not self.fan_out:
+            with tracing.span("router.fast_path") as span:
+                destination = self.pre_router.route(
+                    state["messages"][-1].content)
+                span.set(route=destination)
+            if destination:
+                return {"messages": [AIMessage(content=destination)]}
 
         # invoke the model with the message history
-        result = self.model.invoke(messages)
+        result = self.model.invoke(self.get_llm_messages(state))
+
+        if self.debug:
+            print(f"Call LLM result {result}")
+        return {"messages": [result]}
+
+    async def acall_llm(self, state: RouterAgentState):
+        # Try the fast path first, off the event loop as it embeds
+        if self.pre_router and not self.fan_out:
+            with tracing.span("router.fast_path") as span:
+                destination = await asyncio.to_thread(
+                    self.pre_router.route, state["messages"][-1].content)
+                span.set(route=destination)
+            if destination:
+                return {"messages": [AIMessage(content=destination)]}
+
+        # invoke the model with the message history
+        result = await self.model.ainvoke(self.get_llm_messages(state))
 
         if self.debug:
             print(f"Call LLM result {result}")
@@ -139,8 +387,35 @@ class RouterHRAgent:
         prompt = messages[0].content
         print(f"Policy agent node received {prompt}")
 
-        response = asyncio.run(execute_a2a_agent("http://localhost:9001",
-                                                 self.user, prompt))
+        response = self.registry.run(execute_a2a_agent(
+            POLICY_AGENT_URL, self.user, prompt, self.registry))
+
+        if self.debug:
+            print(f"Policy agent node response : {response}")
+
+        return {"messages": [AIMessage(content=response)]}
+
+    # Stream the events of a remote agent to the graph's custom
+    # stream, and return its final answer
+    async def astream_agent(self, agent_card_url, user, prompt):
+        writer = get_stream_writer()
+        response = ""
+        async for event in stream_a2a_agent(agent_card_url, user,
+                                            prompt, self.registry):
+            writer(event)
+            if event["type"] == "final":
+                response = event["text"]
+        return response
+
+    async def apolicy_agent_node(self, state: RouterAgentState):
+        messages = state["messages"]
+        # Call the policy agent
+        prompt = messages[0].content
+        print(f"Policy agent node received {prompt}")
+
+        response = await self.astream_agent(POLICY_AGENT_URL,
+                                            state.get("user", self.user),
+                                            prompt)
 
         if self.debug:
             print(f"Policy agent node response : {response}")
@@ -154,13 +429,117 @@ class RouterHRAgent:
         prompt = messages[0].content
         print(f"Timeoff agent node received {prompt}")
 
-        response = asyncio.run(execute_a2a_agent("http://localhost:9002",
-                                                 self.user, prompt))
+        response = self.registry.run(execute_a2a_agent(
+            TIMEOFF_AGENT_URL, self.user, prompt, self.registry))
         if self.debug:
             print(f"Timeoff agent node response : {response}")
 
         return {"messages": [AIMessage(content=response)]}
 
+    async def atimeoff_agent_node(self, state: RouterAgentState):
+        messages = state["messages"]
+
+        # Call the timeoff agent
+        prompt = messages[0].content
+        print(f"Timeoff agent node received {prompt}")
+
+        response = await self.astream_agent(TIMEOFF_AGENT_URL,
+                                            state.get("user", self.user),
+                                            prompt)
+        if self.debug:
+            print(f"Timeoff agent node response : {response}")
+
+        return {"messages": [AIMessage(content=response)]}
+
+    # Run the agents of a fanned out query concurrently. run_agent(route,
+    # prompt) returns the answer of one agent. A branch that fails or
+    # times out gets an error answer, without failing the others.
+    async def arun_branches(self, destinations, run_agent):
+
+        async def run_branch(route, prompt):
+            start = time.perf_counter()
+            with tracing.span("router.branch", route=route) as span:
+                try:
+                    response = await asyncio.wait_for(
+                        run_agent(route, prompt), self.branch_timeout)
+                    status = "ok"
+                except asyncio.TimeoutError:
+                    response = (f"The {BRANCH_TITLES[route]} agent did not "
+                                f"answer within {self.branch_timeout:g} "
+                                f"seconds.")
+                    status = "timeout"
+                except Exception as e:
+                    response = f"The {BRANCH_TITLES[route]} agent failed: {e}"
+                    status = "error"
+                span.set(status=status)
+            elapsed = time.perf_counter() - start
+            print(f"Branch {route} : {status} in {elapsed:.2f}s")
+            return {"route": route, "prompt": prompt, "response": response,
+                    "status": status, "elapsed": round(elapsed, 3)}
+
+        start = time.perf_counter()
+        branches = await asyncio.gather(
+            *(run_branch(route, prompt) for route, prompt in destinations))
+        print(f"Fan out to {len(branches)} agents in "
+              f"{time.perf_counter() - start:.2f}s")
+        return list(branches)
+
+    def fan_out_node(self, state: RouterAgentState):
+        messages = state["messages"]
+        destinations = parse_destinations(messages[-1].content,
+                                          messages[0].content)
+        user = state.get("user", self.user)
+
+        branches = self.registry.run(self.arun_branches(
+            destinations,
+            lambda route, prompt: execute_a2a_agent(AGENT_ROUTES[route],
+                                                    user, prompt,
+                                                    self.registry)))
+        return {"branches": branches}
+
+    async def afan_out_node(self, state: RouterAgentState):
+        messages = state["messages"]
+        destinations = parse_destinations(messages[-1].content,
+                                          messages[0].content)
+        user = state.get("user", self.user)
+        writer = get_stream_writer()
+
+        # Tokens are only streamed from a single agent, as the tokens of
+        # several agents would interleave. Steps are labelled by agent.
+        stream_tokens = len(destinations) == 1
+
+        async def stream_branch(route, prompt):
+            response = ""
+            async for event in stream_a2a_agent(AGENT_ROUTES[route], user,
+                                                prompt, self.registry):
+                if event["type"] == "final":
+                    response = event["text"]
+                elif event["type"] == "token" and stream_tokens:
+                    writer(event)
+                elif event["type"] == "step":
+                    writer({"type": "step",
+                            "text": f"[{route}] {event['text']}"})
+            return response
+
+        return {"branches": await self.arun_branches(destinations,
+                                                     stream_branch)}
+
+    # Merge the answers of the agents into one response
+    def join_node(self, state: RouterAgentState):
+        branches = state.get("branches", [])
+        if len(branches) == 1:
+            response = branches[0]["response"]
+        else:
+            response = "\n\n".join(
+                f"{BRANCH_TITLES[branch['route']]}:\n{branch['response']}"
+                for branch in branches)
+
+        if self.debug:
+            print(f"Join node response : {response}")
+
+        get_stream_writer()({"type": "final", "text": response})
+        return {"messages": [AIMessage(content=response)]}
+
     def unsupported_node(self, state: RouterAgentState):
         messages = state["messages"]
 
@@ -173,6 +552,9 @@ class RouterHRAgent:
         if self.debug:
             print(f"Unsupported node response : {response}")
 
+        # Also publish the response on the custom stream, when streaming
+        get_stream_writer()({"type": "final", "text": response})
+
         return {"messages": [AIMessage(content=response)]}
 
     def find_route(self, state: RouterAgentState):
@@ -186,6 +568,57 @@ class RouterHRAgent:
         print(f"Destination chosen : {destination}")
         return destination
 
+    def find_fan_out_route(self, state: RouterAgentState):
+        messages = state["messages"]
+        destinations = parse_destinations(messages[-1].content,
+                                          messages[0].content)
+        print(f"Destinations chosen : {[route for route, _ in destinations]}")
+        return "FAN_OUT" if destinations else "UNSUPPORTED"
+
+
+# ---------------------------------------------------------------
+# Run a conversation on the async graph. Several conversations can
+# be run concurrently on the same event loop with asyncio.gather
+# ---------------------------------------------------------------
+async def run_conversation(router_hr_agent, user, user_inputs):
+    # Create a new thread
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+
+    responses = []
+    for input in user_inputs:
+        print(f"----------------------------------------\nUSER : {input}")
+        # Stream the response from the agent, as it is generated
+        print("\nAGENT : ", end="", flush=True)
+        response = ""
+        streamed = False
+        # Each turn is the root span of a trace
+        with tracing.span("router.turn", user=user):
+            async for event in router_hr_agent.astream_response(
+                    input, user, config=config):
+                if event["type"] == "token":
+                    print(event["text"], end="", flush=True)
+                    streamed = True
+                elif event["type"] == "final":
+                    response = event["text"]
+        print("" if streamed else response)
+        responses.append(response)
+    return responses
+
+
+async def main(router_hr_agent, user, user_inputs, fast_path=True):
+    try:
+        if fast_path:
+            from router_fast_path import FastPathClassifier
+            try:
+                router_hr_agent.pre_router = \
+                    await FastPathClassifier.from_agent_cards(
+                        router_hr_agent.registry, AGENT_ROUTES)
+            except Exception as e:
+                print(f"Fast path disabled, routing with the LLM only: {e}")
+        return await run_conversation(router_hr_agent, user, user_inputs)
+    finally:
+        await router_hr_agent.aclose()
+
 
 if __name__ == "__main__":
 
@@ -193,20 +626,21 @@ if __name__ == "__main__":
         # Create the chatbot
         # Select user
         user = "Alice"
+        # Fan-out mode sends the parts of compound queries to several
+        # agents concurrently
+        fan_out = os.getenv("ROUTER_FAN_OUT", "false").lower() == "true"
+
         # Setup the system prompt
-        system_prompt = """ 
-        You are a Router, that analyzes the input query and chooses 3 options:
-        POLICY: If the query is about HR policies, like leave, remote work, etc.
-        TIMEOFF: If the query is about time off requests, both creating requests and checking balances
-        UNSUPPORTED: Any other query that is not related to HR policies or time off requests.
-    
-        The output should only be just one word out of the possible 3 : POLICY, TIMEOFF, UNSUPPORTED.
-        """
-
-        router_hr_agent = RouterHRAgent(model,
-                                        system_prompt,
-                                        user,
-                                        debug=False)
+        system_prompt = (FAN_OUT_SYSTEM_PROMPT if fan_out
+                         else ROUTER_SYSTEM_PROMPT)
+
+        router_hr_agent = RouterHRAgent(
+            get_model(),
+            system_prompt,
+            user,
+            debug=False,
+            fan_out=fan_out,
+            branch_timeout=float(os.getenv("ROUTER_BRANCH_TIMEOUT", "60")))
 
         # To print the graph
         # graph_image=router_hr_agent.router_graph.get_graph().draw_mermaid_png()
@@ -222,19 +656,12 @@ if __name__ == "__main__":
             "File a time off request for 5 days starting from 2025-05-05",
             "What is vacation balance now?",
         ]
+        if fan_out:
+            user_inputs.append("What is the policy for remote work, "
+                               "and how many vacation days do I have left?")
 
-        # Create a new thread
-        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
-
-        for input in user_inputs:
-            print(f"----------------------------------------\nUSER : {input}")
-            # Format the user message
-            user_message = {"messages": [HumanMessage(input)]}
-            # Get response from the agent
-            ai_response = router_hr_agent.router_graph.invoke(
-                user_message, config=config)
-            # Print the response
-            print(f"\nAGENT : {ai_response['messages'][-1].content}")
+        # Run the conversation on the async graph
+        asyncio.run(main(router_hr_agent, user, user_inputs))
 
     except Exception as e:
         print(f"An error occurred: {e}")
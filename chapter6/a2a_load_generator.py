@@ -0,0 +1,151 @@
+#-----------------------------------------------------------------------
+# Local load generator for the A2A wrapper servers.
+# Sends concurrent message/send requests to an agent, and reports the
+# throughput and latency percentiles. With --workers, the wrapper is
+# started with each number of worker processes in turn, to show how
+# the throughput scales with the cores.
+# Requests the agent rejects under overload (admission control) are
+# counted apart, and left out of the throughput and latencies.
+#
+#   python chapter6/a2a_load_generator.py --agent timeoff --workers 1 2 4
+#   python chapter6/a2a_load_generator.py --url http://localhost:9001/
+#-----------------------------------------------------------------------
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from a2a.client import A2AClient
+from a2a.types import MessageSendParams, SendMessageRequest, TaskState
+
+WRAPPERS = {
+    "policy": ("a2a_wrapper_hr_policy_agent.py",
+               "What is the policy on remote work?"),
+    "timeoff": ("a2a_wrapper_timeoff_agent.py",
+                "What is my timeoff balance?"),
+}
+
+
+def start_wrapper(agent, workers, port):
+    script = os.path.join(os.path.dirname(__file__), WRAPPERS[agent][0])
+    return subprocess.Popen(
+        [sys.executable, script, "--workers", str(workers),
+         "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL)
+
+
+async def wait_until_ready(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                response = await http.get(url + ".well-known/agent.json")
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"The agent at {url} did not start")
+
+
+async def send_request(client, user, prompt):
+    message = {
+        "role": "user",
+        "parts": [{"kind": "text",
+                   "text": json.dumps({"user": user, "prompt": prompt})}],
+        "messageId": uuid.uuid4().hex,
+    }
+    response = await client.send_message(SendMessageRequest(
+        id=str(uuid.uuid4()), params=MessageSendParams(message=message)))
+    if hasattr(response.root, "error"):
+        raise RuntimeError(response.root.error.message)
+    # A task, or a message for agents that answer directly
+    status = getattr(response.root.result, "status", None)
+    return status.state if status is not None else None
+
+
+async def run_load(url, args, prompt):
+    latencies, errors, rejected = [], 0, 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout,
+                                 limits=limits) as http:
+        client = A2AClient(http, url=url)
+
+        async def request():
+            nonlocal errors, rejected
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    state = await send_request(client, args.user, prompt)
+                    if state == TaskState.rejected:
+                        rejected += 1
+                    else:
+                        latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    errors += 1
+                    print("Request failed: ", e)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, rejected, elapsed
+
+
+def report(label, latencies, errors, rejected, elapsed):
+    if not latencies:
+        print(f"{label:>8} no request succeeded: {errors} failed, "
+              f"{rejected} rejected")
+        return
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    print(f"{label:>8} {len(latencies) / elapsed:>9.1f} "
+          f"{statistics.median(latencies) * 1000:>9.0f} "
+          f"{p99 * 1000:>9.0f} {errors:>7} {rejected:>9}")
+
+
+async def main(args):
+    prompt = args.prompt or WRAPPERS[args.agent][1]
+    print(f"{args.requests} requests, {args.concurrency} concurrent, "
+          f"{os.cpu_count()} cores")
+    print(f"{'workers':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'rejected':>9}")
+
+    if args.url:
+        report("-", *await run_load(args.url, args, prompt))
+        return
+
+    url = f"http://localhost:{args.port}/"
+    for workers in args.workers:
+        wrapper = start_wrapper(args.agent, workers, args.port)
+        try:
+            await wait_until_ready(url)
+            report(str(workers), *await run_load(url, args, prompt))
+        finally:
+            # Graceful shutdown of the launcher and its workers
+            wrapper.send_signal(signal.SIGTERM)
+            wrapper.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agent", choices=sorted(WRAPPERS),
+                        default="timeoff")
+    parser.add_argument("--url", help="Send the load to a running agent "
+                                      "instead of starting the wrapper")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=9102)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--user", default="Alice")
+    parser.add_argument("--prompt")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,183 @@
+#-----------------------------------------------------------------------
+# Launcher of the A2A wrapper servers, with several worker processes.
+# - preload() runs once in the parent, before the workers are forked,
+#   so read-only state (models, indexes) is loaded once and shared by
+#   the workers as copy-on-write memory.
+# - The parent binds the listening socket, and every worker serves the
+#   app returned by create_app() on it.
+# - SIGTERM / SIGINT are forwarded to the workers, which finish their
+#   in-flight requests (up to --graceful-timeout) and run the app
+#   shutdown. Workers that exit on their own are restarted, after a
+#   delay that doubles with each recent restart. After --max-restarts
+#   restarts within --restart-window seconds, the launcher stops all
+#   the workers and exits with status 1.
+# Platforms without fork() run a single process.
+# --profile-startup reports the import time breakdown of the server
+# instead of running it.
+#-----------------------------------------------------------------------
+
+import argparse
+import asyncio
+import collections
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+
+def parse_server_args(description, default_port):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("A2A_WORKERS", "1")),
+                        help="Worker processes")
+    parser.add_argument("--threads", type=int,
+                        default=int(os.getenv("A2A_THREADS", "0")),
+                        help="Threads of each worker for blocking calls "
+                             "(0 for the asyncio default)")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Seconds given to in-flight requests on shutdown")
+    parser.add_argument("--max-restarts", type=int,
+                        default=int(os.getenv("A2A_MAX_RESTARTS", "5")),
+                        help="Worker restarts allowed within "
+                             "--restart-window before giving up")
+    parser.add_argument("--restart-window", type=float,
+                        default=float(os.getenv("A2A_RESTART_WINDOW", "60")),
+                        help="Seconds over which restarts are counted")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report the import time breakdown of the "
+                             "server and exit")
+    return parser.parse_args()
+
+
+def bind_socket(host, port, backlog=2048):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def serve(server, sock, threads):
+    if threads > 0:
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=threads))
+    await server.serve(sockets=[sock])
+
+
+#Serve the app in this process, until SIGTERM / SIGINT
+def run_worker(create_app, sock, args):
+    config = uvicorn.Config(create_app(),
+                            log_level=args.log_level,
+                            timeout_graceful_shutdown=args.graceful_timeout)
+    asyncio.run(serve(uvicorn.Server(config), sock, args.threads))
+
+
+def spawn_worker(create_app, sock, args):
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # In the worker: uvicorn installs its own signal handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        run_worker(create_app, sock, args)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+def run_server(create_app, args, preload=None):
+    if args.profile_startup:
+        import startup_profile
+        startup_profile.profile_startup(sys.argv[0])
+        return
+
+    if preload:
+        print("Preloading shared state")
+        preload()
+
+    sock = bind_socket(args.host, args.port)
+    print(f"Listening on {args.host}:{args.port}")
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        run_worker(create_app, sock, args)
+        return
+
+    workers = set()
+    stopping = threading.Event()
+    restarts = collections.deque()
+    failed = False
+
+    def kill_remaining():
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def stop(signum, frame):
+        if stopping.is_set():
+            return
+        stopping.set()
+        print(f"Stopping {len(workers)} workers")
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        timer = threading.Timer(args.graceful_timeout + 5, kill_remaining)
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        workers.add(spawn_worker(create_app, sock, args))
+    print(f"Started {args.workers} workers: {sorted(workers)}")
+
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if stopping.is_set():
+            continue
+
+        now = time.monotonic()
+        while restarts and now - restarts[0] > args.restart_window:
+            restarts.popleft()
+        if len(restarts) >= args.max_restarts:
+            print(f"Worker {pid} exited with status {status}, "
+                  f"{len(restarts)} restarts in the last "
+                  f"{args.restart_window:.0f}s, giving up")
+            failed = True
+            stop(None, None)
+            continue
+
+        # 1s, 2s, 4s... up to 30s, cut short by a shutdown
+        delay = min(2 ** len(restarts), 30)
+        print(f"Worker {pid} exited with status {status}, "
+              f"restarting in {delay}s")
+        restarts.append(now)
+        if not stopping.wait(delay):
+            workers.add(spawn_worker(create_app, sock, args))
+    sock.close()
+    if failed:
+        sys.exit(1)
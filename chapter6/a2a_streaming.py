@@ -0,0 +1,123 @@
+#-----------------------------------------------------------------------
+# Helpers to stream agent events over A2A.
+#
+# Server side, an AgentExecutor publishes the events of an agent run
+# as a task:
+#   token events -> chunks appended to the "stream" artifact
+#   step events  -> "working" status updates
+#   final event  -> the "response" artifact, then the task completes
+#   error        -> the task fails
+#
+# Client side, the same events are rebuilt from the message/stream
+# responses, or the answer is read from the task returned by
+# message/send.
+#-----------------------------------------------------------------------
+
+import uuid
+
+from a2a.types import (
+    Artifact,
+    Part,
+    TaskArtifactUpdateEvent,
+    TaskState,
+    TextPart,
+)
+from a2a.server.tasks import TaskUpdater
+from a2a.utils import new_agent_text_message, new_task
+
+STREAM_ARTIFACT = "stream"
+RESPONSE_ARTIFACT = "response"
+
+
+#Publish the events of an agent run to the event queue of a request.
+#Returns the final answer.
+async def publish_agent_events(events, context, event_queue):
+
+    task = context.current_task
+    if not task:
+        task = new_task(context.message)
+        await event_queue.enqueue_event(task)
+    updater = TaskUpdater(event_queue, task.id, task.contextId)
+
+    stream_artifact_id = str(uuid.uuid4())
+    streamed = False
+    final_text = ""
+
+    # A failed run must not leave the task in the working state, as the
+    # error only reaches the client of this request
+    try:
+        async for event in events:
+            if event["type"] == "token":
+                await event_queue.enqueue_event(TaskArtifactUpdateEvent(
+                    taskId=task.id,
+                    contextId=task.contextId,
+                    append=streamed,
+                    artifact=Artifact(
+                        artifactId=stream_artifact_id,
+                        name=STREAM_ARTIFACT,
+                        parts=[Part(root=TextPart(text=event["text"]))],
+                    ),
+                ))
+                streamed = True
+            elif event["type"] == "step":
+                await updater.update_status(
+                    TaskState.working,
+                    message=new_agent_text_message(
+                        event["text"], task.contextId, task.id))
+            elif event["type"] == "final":
+                final_text = event["text"]
+    except Exception as e:
+        await updater.failed(message=new_agent_text_message(
+            f"The agent failed: {e}", task.contextId, task.id))
+        raise
+
+    await updater.add_artifact([Part(root=TextPart(text=final_text))],
+                               name=RESPONSE_ARTIFACT)
+    await updater.complete()
+    return final_text
+
+
+#Events for an answer that is already known, e.g. from a cache
+async def answer_events(text):
+    yield {"type": "token", "text": text}
+    yield {"type": "final", "text": text}
+
+
+def get_parts_text(parts):
+    return "".join(part.get("text", "") for part in parts or [])
+
+
+#Extract the answer from a message/send result: either a message, or
+#a task carrying the "response" artifact
+def get_result_text(result):
+    if result.get("kind") == "task":
+        for artifact in reversed(result.get("artifacts") or []):
+            if artifact.get("name") == RESPONSE_ARTIFACT:
+                return get_parts_text(artifact.get("parts"))
+        status_message = result.get("status", {}).get("message") or {}
+        return get_parts_text(status_message.get("parts"))
+    return get_parts_text(result.get("parts"))
+
+
+#Convert one message/stream result back into an agent event
+def to_agent_event(result):
+    kind = result.get("kind")
+    if kind == "artifact-update":
+        artifact = result.get("artifact", {})
+        text = get_parts_text(artifact.get("parts"))
+        if artifact.get("name") == STREAM_ARTIFACT:
+            return {"type": "token", "text": text}
+        if artifact.get("name") == RESPONSE_ARTIFACT:
+            return {"type": "final", "text": text}
+    elif kind == "status-update":
+        status = result.get("status", {})
+        message = status.get("message") or {}
+        if status.get("state") == TaskState.working.value:
+            return {"type": "step", "text": get_parts_text(message.get("parts"))}
+        # A request the agent was too busy to take, or that failed
+        if status.get("state") in (TaskState.rejected.value,
+                                   TaskState.failed.value):
+            return {"type": "final", "text": get_parts_text(message.get("parts"))}
+    elif kind == "message":
+        return {"type": "final", "text": get_parts_text(result.get("parts"))}
+    return None
@@ -2,26 +2,76 @@ from typing_extensions import override
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.utils import new_agent_text_message
 
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.types import AgentCapabilities, AgentCard, AgentSkill
 
 import sys
 import os
 import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
 
 #Import the HR policy Agent implementation in this wrapper
 sys.path.append(os.path.abspath(os.path.join(
             os.path.dirname(__file__), '../chapter3')))
 import hr_policy_agent
+import hr_policy_embeddings
+import hr_policy_index
+
+from admission_control import (AdmissionController, AdmissionRejected,
+                               publish_rejection)
+from a2a_server_launcher import parse_server_args, run_server
+from a2a_streaming import answer_events, publish_agent_events
+from sqlite_task_store import create_task_store
+from semantic_cache import SemanticCache
+import tracing
+
+policy_pdf_path = os.path.abspath(os.path.join(
+    os.path.dirname(hr_policy_agent.__file__), "hr_policy_document.pdf"))
+
+#-----------------------------------------------------------------------
+# Semantic cache of policy answers. Entries are cleared when the
+# content of the HR policy document changes.
+#-----------------------------------------------------------------------
+def create_policy_embeddings():
+    return hr_policy_embeddings.create_embeddings()
+
+def create_policy_cache(embeddings=None):
+    if os.getenv("POLICY_CACHE_ENABLED", "true").lower() != "true":
+        return None
+
+    embeddings = embeddings or create_policy_embeddings()
+
+    return SemanticCache(
+        embeddings,
+        threshold=float(os.getenv("POLICY_CACHE_THRESHOLD", "0.92")),
+        max_entries=int(os.getenv("POLICY_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("POLICY_CACHE_TTL", "3600")),
+        source_path=policy_pdf_path,
+        hash_source=hr_policy_index.hash_file,
+    )
+
+#Keep warm MCP sessions for the lifetime of the server, shared by
+#all requests handled by the executor
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        await hr_policy_agent.hr_policy_session_pool.warm_up()
+    except Exception as e:
+        print("Unable to warm up MCP sessions: ", e)
+    yield
+    await hr_policy_agent.hr_policy_session_pool.close()
 
 class HRPolicyAgentExecutor(AgentExecutor):
     "Executes functions of the HR policy agent."
 
-    def __init__(self):
+    def __init__(self, cache=None, admission=None):
+        self.cache = cache
+        self.admission = admission or AdmissionController.from_env(
+            "hr-policy", max_concurrent=2, max_queue=8)
         print("HRPolicyAgentExecutor initialized")
         
     @override
@@ -31,13 +81,47 @@ class HRPolicyAgentExecutor(AgentExecutor):
         event_queue: EventQueue,) -> None:
 
         user_input = json.loads(context.get_user_input())
-        print("prompt received: ", user_input.get("prompt"))
-        # Call the HR policy agent function
-        result = await hr_policy_agent.run_hr_policy_agent(
-                        prompt=user_input.get("prompt"))
+        prompt = user_input.get("prompt")
+        print("prompt received: ", prompt)
+
+        # The span continues the trace of the caller
+        with tracing.span("a2a.execute", agent="hr-policy",
+                          parent=tracing.extract(context.message.metadata)
+                          ) as span:
+
+            # Answer from the semantic cache when a similar prompt was seen
+            start = time.perf_counter()
+            cached, prompt_vector = None, None
+            if self.cache:
+                with tracing.span("semantic_cache.lookup") as lookup_span:
+                    cached, prompt_vector = await asyncio.to_thread(
+                        self.cache.lookup, prompt)
+                    lookup_span.set(hit=cached is not None)
+            if cached is not None:
+                await publish_agent_events(answer_events(cached),
+                                           context, event_queue)
+                print("Semantic cache stats: ", self.cache.report())
+                return
+
+            # Call the HR policy agent function, streaming its tokens
+            # and steps as task updates. Runs are admitted a few at a time,
+            # as each one holds an MCP server with its embedding model.
+            try:
+                async with self.admission.admit():
+                    result = await publish_agent_events(
+                                    hr_policy_agent.stream_hr_policy_agent(
+                                        prompt=prompt),
+                                    context, event_queue)
+            except AdmissionRejected as rejection:
+                print("Request rejected: ", rejection)
+                span.set(rejected=rejection.reason)
+                await publish_rejection(rejection, context, event_queue)
+                return
         
         print("Result received: ", result)
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        if self.cache and result:
+            self.cache.store(prompt, prompt_vector, result,
+                             time.perf_counter() - start)
 
     @override
     async def cancel(
@@ -47,44 +131,75 @@ class HRPolicyAgentExecutor(AgentExecutor):
         
         raise Exception("Not implemented")
 
-if __name__ == "__main__":
+#-----------------------------------------------------------------------
+# Agent card, published at /.well-known/agent.json
+#-----------------------------------------------------------------------
+policy_skill = AgentSkill(
+    id="HRPolicySkill",
+    name="HR Policy Agent Skills",
+    description="Answers queries about HR policies",
+    tags=["HR", "policies"],
+    examples=[
+        "What is the policy on remote work?",
+        "What is the policy on sick leave?",
+        "What is the policy on vacation days?",
+    ],
+)
 
-    policy_skill = AgentSkill(
-        id="HRPolicySkill",
-        name="HR Policy Agent Skills",
-        description="Answers queries about HR policies",
-        tags=["HR", "policies"],
-        examples=[
-            "What is the policy on remote work?",
-            "What is the policy on sick leave?",
-            "What is the policy on vacation days?",
-        ],
-    )
+policy_agent_card = AgentCard(
+    name="HR Policy Agent",
+    description="Answers queries about HR policies",
+    url=os.getenv("POLICY_AGENT_URL", "http://localhost:9001/"),
+    version="1.0.0",
+    defaultInputModes=["text"],
+    defaultOutputModes=["text"],
+    capabilities=AgentCapabilities(streaming=True),
+    skills=[policy_skill],
+)
+
+#-----------------------------------------------------------------------
+# Shared read-only state, loaded once in the launcher process before
+# the workers are forked: the embedding model of the semantic cache,
+# and the persisted policy index that the MCP servers of every worker
+# then load (memory mapped) instead of building it.
+#-----------------------------------------------------------------------
+policy_cache = None
+preloaded = False
+
+def preload():
+    global policy_cache, preloaded
+    embeddings = None
+    if os.getenv("POLICY_CACHE_ENABLED", "true").lower() == "true":
+        embeddings = create_policy_embeddings()
+        policy_cache = create_policy_cache(embeddings)
+    hr_policy_index.load_or_build_index(
+        policy_pdf_path, lambda: embeddings or create_policy_embeddings(),
+        model_name=hr_policy_embeddings.embedding_model_id())
+    preloaded = True
+
+#App factory, called in each worker process
+def create_app():
+    cache = policy_cache if preloaded else create_policy_cache()
+    admission = AdmissionController.from_env(
+        "hr-policy", max_concurrent=2, max_queue=8)
 
-    policy_agent_card = AgentCard(
-        name="HR Policy Agent",
-        description="Answers queries about HR policies",
-        url="http://localhost:9001/",
-        version="1.0.0",
-        defaultInputModes=["text"],
-        defaultOutputModes=["text"],
-        capabilities=AgentCapabilities(streaming=True),
-        skills=[policy_skill],
-    )
-    
     policy_request_handler = DefaultRequestHandler(
-        agent_executor=HRPolicyAgentExecutor(),
-        task_store=InMemoryTaskStore(),
+        agent_executor=HRPolicyAgentExecutor(cache=cache,
+                                             admission=admission),
+        task_store=create_task_store(
+            os.path.join(os.path.dirname(__file__), "hr_policy_tasks.db")),
     )
 
     policy_server = A2AStarletteApplication(
         agent_card=policy_agent_card,
         http_handler=policy_request_handler,
     )
+    app = policy_server.build(lifespan=lifespan)
+    app.add_route("/metrics/admission", admission.metrics_endpoint)
+    return app
+
+if __name__ == "__main__":
 
     # Start the Server
-    import uvicorn
-    uvicorn.run(policy_server.build(), 
-                host="0.0.0.0", 
-                port=9001, 
-                log_level="info")
+    args = parse_server_args("HR policy A2A agent", default_port=9001)
+    run_server(create_app, args, preload=preload)
@@ -2,26 +2,44 @@ from typing_extensions import override
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.utils import new_agent_text_message
 
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.types import AgentCapabilities, AgentCard, AgentSkill
 
 import sys
 import os
 import json
+from contextlib import asynccontextmanager
 
 #Import the HR timeoff Agent implementation in this wrapper
 sys.path.append(os.path.abspath(os.path.join(
             os.path.dirname(__file__), '../chapter4')))
 import timeoff_agent
 
+from admission_control import (AdmissionController, AdmissionRejected,
+                               publish_rejection)
+from a2a_server_launcher import parse_server_args, run_server
+from a2a_streaming import publish_agent_events
+from sqlite_task_store import create_task_store
+import tracing
+
+#Keep warm MCP sessions for the lifetime of the server, shared by
+#all requests handled by the executor
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        await timeoff_agent.timeoff_session_pool.warm_up()
+    except Exception as e:
+        print("Unable to warm up MCP sessions: ", e)
+    yield
+    await timeoff_agent.timeoff_session_pool.close()
+
 class TimeoffAgentExecutor(AgentExecutor):
     "Executes functions of the Timeoff agent."
 
-    def __init__(self):
+    def __init__(self, admission=None):
+        self.admission = admission or AdmissionController.from_env("timeoff")
         print("TimeoffAgentExecutor initialized")
         
     @override
@@ -33,12 +51,25 @@ class TimeoffAgentExecutor(AgentExecutor):
         user_input = json.loads(context.get_user_input())
         print("prompt received: ", user_input.get("prompt"))
         
-        # Call the HR timeoff agent function
-        result = await timeoff_agent.run_timeoff_agent(
-                        user=user_input.get("user"), prompt=user_input.get("prompt"))
+        # Call the HR timeoff agent function, streaming its tokens
+        # and steps as task updates, when a slot is free. The span
+        # continues the trace of the caller.
+        with tracing.span("a2a.execute", agent="timeoff",
+                          parent=tracing.extract(context.message.metadata)
+                          ) as span:
+            try:
+                async with self.admission.admit():
+                    result = await publish_agent_events(
+                                    timeoff_agent.stream_timeoff_agent(
+                                        user=user_input.get("user"), prompt=user_input.get("prompt")),
+                                    context, event_queue)
+            except AdmissionRejected as rejection:
+                print("Request rejected: ", rejection)
+                span.set(rejected=rejection.reason)
+                await publish_rejection(rejection, context, event_queue)
+                return
         
         print("Result received: ", result)
-        await event_queue.enqueue_event(new_agent_text_message(result))
 
     @override
     async def cancel(
@@ -48,43 +79,52 @@ class TimeoffAgentExecutor(AgentExecutor):
         
         raise Exception("Not implemented")
 
-if __name__ == "__main__":
+#-----------------------------------------------------------------------
+# Agent card, published at /.well-known/agent.json
+#-----------------------------------------------------------------------
+timeoff_skill = AgentSkill(
+    id="TimeoffSkill",
+    name="Timeoff Agent Skills",
+    description="Performs timeoff operations.",
+    tags=["HR", "timeoff"],
+    examples=[
+        "What is my timeoff balance?",
+        "Create a timeoff request for 5 days from 30-June-2025",
+    ],
+)
 
-    timeoff_skill = AgentSkill(
-        id="TimeoffSkill",
-        name="Timeoff Agent Skills",
-        description="Performs timeoff operations.",
-        tags=["HR", "timeoff"],
-        examples=[
-            "What is my timeoff balance?",
-            "Create a timeoff request for 5 days from 30-June-2025",
-        ],
-    )
+timeoff_agent_card = AgentCard(
+    name="HR timeoff Agent",
+    description="Performs timeoff operations.",
+    url=os.getenv("TIMEOFF_AGENT_URL", "http://localhost:9002/"),
+    version="1.0.0",
+    defaultInputModes=["text"],
+    defaultOutputModes=["text"],
+    capabilities=AgentCapabilities(streaming=True),
+    skills=[timeoff_skill],
+)
+
+#App factory, called in each worker process
+def create_app():
+    admission = AdmissionController.from_env("timeoff")
 
-    timeoff_agent_card = AgentCard(
-        name="HR timeoff Agent",
-        description="Performs timeoff operations.",
-        url="http://localhost:9002/",
-        version="1.0.0",
-        defaultInputModes=["text"],
-        defaultOutputModes=["text"],
-        capabilities=AgentCapabilities(streaming=True),
-        skills=[timeoff_skill],
-    )
-    
     timeoff_request_handler = DefaultRequestHandler(
-        agent_executor=TimeoffAgentExecutor(),
-        task_store=InMemoryTaskStore(),
+        agent_executor=TimeoffAgentExecutor(admission=admission),
+        task_store=create_task_store(
+            os.path.join(os.path.dirname(__file__), "timeoff_tasks.db")),
     )
 
     timeoff_server = A2AStarletteApplication(
         agent_card=timeoff_agent_card,
         http_handler=timeoff_request_handler,
     )
+    app = timeoff_server.build(lifespan=lifespan)
+    app.add_route("/metrics/admission", admission.metrics_endpoint)
+    return app
+
+if __name__ == "__main__":
 
-    # Start the Server
-    import uvicorn
-    uvicorn.run(timeoff_server.build(), 
-                host="0.0.0.0", 
-                port=9002, 
-                log_level="info")
+    # Start the Server. The agent keeps no large read-only state, so
+    # there is nothing to preload before forking the workers.
+    args = parse_server_args("HR timeoff A2A agent", default_port=9002)
+    run_server(create_app, args)
@@ -0,0 +1,147 @@
+#-----------------------------------------------------------------------
+# Admission control for the AgentExecutors.
+# - At most max_concurrent agent runs execute at a time.
+# - Up to max_queue more requests wait for a slot, each for at most
+#   queue_timeout seconds.
+# - Past that, requests are rejected at once, with a retry_after
+#   estimate, instead of piling up until the server runs out of memory.
+# Queue depth, wait times and rejections are kept as metrics.
+#-----------------------------------------------------------------------
+
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from a2a.server.tasks import TaskUpdater
+from a2a.utils import new_agent_text_message, new_task
+from starlette.responses import JSONResponse
+
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+import tracing
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Agent is busy ({reason}), "
+                         f"retry after {retry_after} seconds")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class AdmissionController:
+
+    def __init__(self, name, max_concurrent=4, max_queue=16,
+                 queue_timeout=30.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.queued = 0
+        self.wait_times = deque(maxlen=1000)
+        self.run_times = deque(maxlen=100)
+        self.stats = {"admitted": 0, "rejected_queue_full": 0,
+                      "rejected_timeout": 0, "max_queue_depth": 0}
+
+    #Settings from A2A_MAX_CONCURRENT, A2A_MAX_QUEUE and
+    #A2A_QUEUE_TIMEOUT, with defaults suited to each agent
+    @classmethod
+    def from_env(cls, name, max_concurrent=4, max_queue=16,
+                 queue_timeout=30.0):
+        return cls(name,
+                   max_concurrent=int(os.getenv("A2A_MAX_CONCURRENT",
+                                                str(max_concurrent))),
+                   max_queue=int(os.getenv("A2A_MAX_QUEUE", str(max_queue))),
+                   queue_timeout=float(os.getenv("A2A_QUEUE_TIMEOUT",
+                                                 str(queue_timeout))))
+
+    #Seconds before a slot is likely to be free, from the recent run
+    #times and the requests ahead in the queue
+    def retry_after(self):
+        average_run = (sum(self.run_times) / len(self.run_times)
+                       if self.run_times else 1.0)
+        waves = (self.queued + 1) / self.max_concurrent
+        return max(1, round(average_run * waves))
+
+    #Hold a slot for the block, waiting in the queue when all are busy.
+    #Raises AdmissionRejected when the queue is full or the wait
+    #exceeds queue_timeout.
+    @asynccontextmanager
+    async def admit(self):
+        start = time.monotonic()
+        if self._slots.locked():
+            if self.queued >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                raise AdmissionRejected("queue full", self.retry_after())
+
+            self.queued += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"],
+                                                self.queued)
+            try:
+                with tracing.span("admission.wait", controller=self.name,
+                                  queue_depth=self.queued):
+                    await asyncio.wait_for(self._slots.acquire(),
+                                           self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected_timeout"] += 1
+                raise AdmissionRejected("queue timeout", self.retry_after())
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+
+        admitted_at = time.monotonic()
+        self.wait_times.append(admitted_at - start)
+        self.stats["admitted"] += 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.run_times.append(time.monotonic() - admitted_at)
+            self._slots.release()
+
+    def metrics(self):
+        return {
+            "name": self.name,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queue_depth": self.queued,
+            **self.stats,
+            "wait_p50_ms": round(percentile(self.wait_times, 0.5) * 1000, 1),
+            "wait_p95_ms": round(percentile(self.wait_times, 0.95) * 1000, 1),
+            "wait_max_ms": round(max(self.wait_times, default=0) * 1000, 1),
+            "retry_after": self.retry_after(),
+        }
+
+    #Starlette endpoint serving the metrics
+    async def metrics_endpoint(self, request):
+        return JSONResponse(self.metrics())
+
+
+#Finish the task of a request that was not admitted as rejected. The
+#status message carries the retry_after delay in its metadata.
+async def publish_rejection(rejection, context, event_queue):
+    task = context.current_task
+    if not task:
+        task = new_task(context.message)
+        await event_queue.enqueue_event(task)
+    message = new_agent_text_message(str(rejection), task.contextId, task.id)
+    message.metadata = {"retry_after": rejection.retry_after,
+                        "reason": rejection.reason}
+    await TaskUpdater(event_queue, task.id, task.contextId).reject(message)
@@ -0,0 +1,392 @@
+#-----------------------------------------------------------------------
+# Offline benchmark of the HR assistant, end to end:
+#   router -> A2A wrappers -> agents -> MCP servers
+# - The LLMs of the router and of the agents are FakeChatModel
+#   scripts, with a configurable latency, so no credentials or
+#   network are needed.
+# - The timeoff MCP server and both A2A wrappers run in this process,
+#   each as a uvicorn server on an ephemeral port. The HR policy MCP
+#   server runs as the stdio subprocess of its agent, with the offline
+#   hashing embeddings, and its index in a temporary directory.
+# - Each scenario (policy, timeoff_read, timeoff_write, unsupported)
+#   sends --requests turns through the router, at each --concurrency,
+#   and reports the throughput, the latency percentiles and the memory
+#   of this process and of the MCP subprocesses.
+#
+#   python chapter6/router_benchmark.py
+#   python chapter6/router_benchmark.py --scenarios policy timeoff_write \
+#       --concurrency 1 8 --llm-latency 0.2 --trace /tmp/trace.jsonl
+#-----------------------------------------------------------------------
+
+import argparse
+import asyncio
+import contextlib
+import os
+import re
+import resource
+import socket
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import uvicorn
+from langchain_core.messages import AIMessage, ToolMessage
+
+sys.path.append(os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../common')))
+from fake_chat_model import FakeChatModel, tool_call
+import tracing
+
+#Employees used by the timeoff scenarios, with enough days for every
+#request of a run
+BENCHMARK_EMPLOYEES = 50
+BENCHMARK_ALLOWED_DAYS = 1_000_000
+
+POLICY_QUESTIONS = [
+    "What is the policy on remote work?",
+    "What is the policy on sick leave?",
+    "What is the dress code policy?",
+    "What are the standard work hours policy?",
+]
+
+FIRST_REQUEST_DAY = date(2030, 1, 1)
+
+
+#-----------------------------------------------------------------------
+# Scripts of the fake LLMs
+#-----------------------------------------------------------------------
+def last_tool_message(messages):
+    return messages[-1] if isinstance(messages[-1], ToolMessage) else None
+
+
+#Router: one word route, by keywords
+def router_script(messages):
+    query = messages[-1].content.lower()
+    if "polic" in query:
+        return "POLICY"
+    if re.search(r"balance|time off|timeoff|vacation", query):
+        return "TIMEOFF"
+    return "UNSUPPORTED"
+
+
+#HR policy agent: query the policies, then answer from the results
+def policy_agent_script(messages):
+    tool_message = last_tool_message(messages)
+    if tool_message is None:
+        query = re.search(r"Query: (.*)", messages[0].content)
+        return AIMessage(content="", tool_calls=[tool_call(
+            "query_policies",
+            query=query.group(1).strip() if query else "HR policy")])
+    return (f"According to the HR policy document: "
+            f"{str(tool_message.content)[:200]}")
+
+
+#Timeoff agent: file the request or get the balance, then report it
+def timeoff_agent_script(messages):
+    tool_message = last_tool_message(messages)
+    if tool_message is not None:
+        return f"Timeoff assistant: {tool_message.content}"
+
+    prompt = messages[0].content
+    user = re.search(r"in terms of the user (\S+)", prompt).group(1)
+    request = re.search(r"(\d+) days? starting from (\S+)", prompt)
+    if request:
+        return AIMessage(content="", tool_calls=[tool_call(
+            "request_timeoff", employee_name=user,
+            start_day=request.group(2), days=int(request.group(1)))])
+    return AIMessage(content="", tool_calls=[tool_call(
+        "get_timeoff_balance", employee_name=user)])
+
+
+#-----------------------------------------------------------------------
+# Scenarios: the user and prompt of the n-th turn, and the check of
+# the answer
+#-----------------------------------------------------------------------
+def employee(n):
+    return f"bench{n % BENCHMARK_EMPLOYEES}"
+
+
+SCENARIOS = {
+    "policy": (
+        lambda n: ("Alice", POLICY_QUESTIONS[n % len(POLICY_QUESTIONS)]),
+        lambda answer: answer.startswith("According to the HR policy")),
+    "timeoff_read": (
+        lambda n: (employee(n), "What is my vacation balance?"),
+        lambda answer: answer.startswith("Timeoff assistant")),
+    # Each request gets days of its own, so none of them overlap
+    "timeoff_write": (
+        lambda n: (employee(n),
+                   "File a time off request for 1 days starting from "
+                   f"{FIRST_REQUEST_DAY + timedelta(days=n)}"),
+        lambda answer: "Successfully added" in answer),
+    "unsupported": (
+        lambda n: ("Alice", "Tell me about payroll processing"),
+        lambda answer: "I only support" in answer),
+}
+
+
+#-----------------------------------------------------------------------
+# Memory of this process and of its child processes (Linux /proc;
+# elsewhere only the peak RSS of this process is known)
+#-----------------------------------------------------------------------
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_usage():
+    pid = os.getpid()
+    own = rss_mb(pid)
+    if not own:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        own = peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    children = sum(rss_mb(child) for child in child_pids(pid))
+    return own, children
+
+
+#-----------------------------------------------------------------------
+# In-process servers
+#-----------------------------------------------------------------------
+def bind_ephemeral_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(1024)
+    return sock
+
+
+def socket_url(sock, path="/"):
+    return f"http://127.0.0.1:{sock.getsockname()[1]}{path}"
+
+
+class InProcessServer:
+    def __init__(self, name, app, sock):
+        self.name = name
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+        self.sock = sock
+        self.task = None
+
+    async def start(self):
+        self.task = asyncio.create_task(self.server.serve(sockets=[self.sock]))
+        while not self.server.started:
+            if self.task.done():
+                self.task.result()
+                raise RuntimeError(f"The {self.name} server did not start")
+            await asyncio.sleep(0.05)
+
+    async def stop(self):
+        self.server.should_exit = True
+        if self.task is not None:
+            await self.task
+
+
+#The servers read their settings from the environment when imported,
+#so the sockets are bound and the environment set before the imports
+def configure_environment(args, directory, sockets):
+    os.environ.update({
+        "TIMEOFF_DB_PATH": os.path.join(directory, "timeoff.db"),
+        "TIMEOFF_MCP_URL": socket_url(sockets["timeoff_mcp"], "/mcp"),
+        "POLICY_AGENT_URL": socket_url(sockets["policy_agent"]),
+        "TIMEOFF_AGENT_URL": socket_url(sockets["timeoff_agent"]),
+        "HR_POLICY_EMBEDDING_BACKEND": args.embeddings,
+        "HR_POLICY_INDEX_DIR": os.path.join(directory, "hr_policy_index"),
+        "POLICY_CACHE_ENABLED": "true" if args.policy_cache else "false",
+        "A2A_TASK_STORE": args.task_store,
+        "A2A_TASK_STORE_PATH": os.path.join(directory, "tasks.db"),
+    })
+    # Queue rather than reject the requests of the benchmark
+    os.environ.setdefault("A2A_MAX_QUEUE", "10000")
+    os.environ.setdefault("A2A_QUEUE_TIMEOUT", "600")
+    if args.trace:
+        os.environ["TRACE_FILE"] = args.trace
+        tracing.enable(args.trace)
+
+
+async def start_servers(args, sockets):
+    sys.path.append(os.path.abspath(os.path.join(
+                os.path.dirname(__file__), '../chapter4')))
+    import timeoff_db_server
+    import a2a_wrapper_hr_policy_agent
+    import a2a_wrapper_timeoff_agent
+    import hr_policy_agent
+    import timeoff_agent
+
+    timeoff_db_server.timeoff_db.datastore.import_employees(
+        (employee(n), BENCHMARK_ALLOWED_DAYS, 0)
+        for n in range(BENCHMARK_EMPLOYEES))
+
+    hr_policy_agent.model = FakeChatModel(
+        script=policy_agent_script, latency=args.llm_latency,
+        token_latency=args.token_latency)
+    timeoff_agent.model = FakeChatModel(
+        script=timeoff_agent_script, latency=args.llm_latency,
+        token_latency=args.token_latency)
+
+    servers = [
+        InProcessServer("timeoff MCP",
+                        timeoff_db_server.timeoff_mcp.http_app(path="/mcp"),
+                        sockets["timeoff_mcp"]),
+        InProcessServer("timeoff agent",
+                        a2a_wrapper_timeoff_agent.create_app(),
+                        sockets["timeoff_agent"]),
+        InProcessServer("policy agent",
+                        a2a_wrapper_hr_policy_agent.create_app(),
+                        sockets["policy_agent"]),
+    ]
+    for server in servers:
+        await server.start()
+    return servers
+
+
+#The MCP sessions are closed first: stopping any of the servers ends
+#all the SSE streams of the process, those of the sessions included
+async def stop_servers(servers):
+    import hr_policy_agent
+    import timeoff_agent
+    await hr_policy_agent.hr_policy_session_pool.close()
+    await timeoff_agent.timeoff_session_pool.close()
+    for server in reversed(servers):
+        await server.stop()
+
+
+#-----------------------------------------------------------------------
+# Load
+#-----------------------------------------------------------------------
+class TurnCounter:
+    def __init__(self):
+        self.value = 0
+
+    def next(self):
+        self.value += 1
+        return self.value
+
+
+async def run_turn(router, user, prompt):
+    answer = ""
+    async for event in router.astream_response(prompt, user):
+        if event["type"] == "final":
+            answer = event["text"]
+    return answer
+
+
+async def run_scenario(router, scenario, requests, concurrency, counter):
+    make_turn, check = SCENARIOS[scenario]
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def turn():
+        nonlocal errors
+        async with semaphore:
+            user, prompt = make_turn(counter.next())
+            start = time.perf_counter()
+            try:
+                with tracing.span("router.turn", scenario=scenario):
+                    answer = await run_turn(router, user, prompt)
+                if check(answer):
+                    latencies.append(time.perf_counter() - start)
+                    return
+                print(f"Unexpected answer to {prompt!r}: {answer[:200]!r}",
+                      file=sys.stderr)
+            except Exception as e:
+                print(f"Turn failed: {e!r}", file=sys.stderr)
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(turn() for _ in range(requests)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(out, scenario, concurrency, latencies, errors, elapsed):
+    own, children = memory_usage()
+    print(f"{scenario:<14} {concurrency:>5} {len(latencies):>6} "
+          f"{len(latencies) / elapsed:>8.1f} "
+          f"{tracing.percentile(latencies, 0.5) * 1000:>8.1f} "
+          f"{tracing.percentile(latencies, 0.95) * 1000:>8.1f} "
+          f"{tracing.percentile(latencies, 0.99) * 1000:>8.1f} "
+          f"{errors:>6} {own:>8.0f} {children:>8.0f}", file=out, flush=True)
+
+
+async def main(args):
+    out = sys.stdout
+    # The servers and agents print every step; keep them out of the
+    # report unless --verbose
+    logs = (contextlib.nullcontext() if args.verbose
+            else contextlib.redirect_stdout(open(os.devnull, "w")))
+
+    with tempfile.TemporaryDirectory() as directory, logs:
+        sockets = {name: bind_ephemeral_socket()
+                   for name in ("timeoff_mcp", "policy_agent",
+                                "timeoff_agent")}
+        configure_environment(args, directory, sockets)
+
+        import a2a_client_router_agent
+        servers = await start_servers(args, sockets)
+        router = a2a_client_router_agent.RouterHRAgent(
+            FakeChatModel(script=router_script, latency=args.llm_latency),
+            a2a_client_router_agent.ROUTER_SYSTEM_PROMPT, "Alice")
+
+        print(f"LLM latency {args.llm_latency * 1000:.0f} ms, "
+              f"{args.requests} requests per run, "
+              f"{os.cpu_count()} cores\n", file=out)
+        print(f"{'scenario':<14} {'conc':>5} {'ok':>6} {'req/s':>8} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} "
+              f"{'rss MB':>8} {'mcp MB':>8}", file=out, flush=True)
+
+        counter = TurnCounter()
+        try:
+            for scenario in args.scenarios:
+                # Warm up the sessions, caches and connection pools
+                await run_scenario(router, scenario, args.warmup,
+                                   args.warmup, counter)
+                for concurrency in args.concurrency:
+                    report(out, scenario, concurrency,
+                           *await run_scenario(router, scenario,
+                                               args.requests, concurrency,
+                                               counter))
+        finally:
+            await router.aclose()
+            await stop_servers(servers)
+
+    if args.trace:
+        print(file=out)
+        tracing.summarize(tracing.load_spans(args.trace))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline end to end benchmark of the HR assistant")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS),
+                        default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.05,
+                        help="Seconds before each fake LLM response")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Seconds between the streamed words")
+    parser.add_argument("--embeddings", default="hashing",
+                        help="HR_POLICY_EMBEDDING_BACKEND of the policy "
+                             "server and cache")
+    parser.add_argument("--policy-cache", action="store_true",
+                        help="Enable the semantic cache of policy answers")
+    parser.add_argument("--task-store", choices=["memory", "sqlite"],
+                        default="memory")
+    parser.add_argument("--trace", help="Write the spans to this file, "
+                                        "and print their summary")
+    parser.add_argument("--verbose", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,241 @@
+#-----------------------------------------------------------------------
+# Fast-path classifier that runs in front of the LLM router.
+# Most queries are classified locally with keyword rules, and then by
+# nearest-centroid over MiniLM embeddings of the AgentSkill examples
+# published in each agent's card. Only queries classified below the
+# confidence threshold are sent to the LLM router.
+#
+# Run with --benchmark to compare it with the LLM router on a labeled
+# query set (the A2A agents must be running, to read their cards).
+#-----------------------------------------------------------------------
+
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Keyword rules. A rule only decides when it matches a single label.
+KEYWORD_RULES = {
+    "POLICY": [
+        r"\bpolic(y|ies)\b",
+        r"\b(dress code|code of conduct|benefits|work hours|remote work)\b",
+    ],
+    "TIMEOFF": [
+        r"\b(balance|days left|days remaining)\b",
+        r"\b(file|create|submit|book|cancel)\b.*\b(time ?off|leave|vacation)\b",
+        r"\b(time ?off|leave|vacation) request\b",
+    ],
+}
+
+# Examples for the UNSUPPORTED route, which has no agent card
+UNSUPPORTED_EXAMPLES = [
+    "Tell me about payroll processing",
+    "What is the weather today?",
+    "Reset my laptop password",
+    "Book a meeting room for tomorrow",
+    "What is the stock price of the company?",
+]
+
+
+class FastPathResult:
+    def __init__(self, label, confidence, method):
+        self.label = label
+        self.confidence = confidence
+        self.method = method
+
+    def __repr__(self):
+        return (f"FastPathResult({self.label}, "
+                f"{self.confidence:.2f}, {self.method})")
+
+
+@lru_cache(maxsize=1)
+def get_default_embeddings():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class FastPathClassifier:
+    """Classifies a query into one of the router labels, with a
+    confidence between 0 and 1.
+
+    examples      : dict of label -> list of example queries
+    threshold     : minimum confidence to skip the LLM router
+    rule_confidence : confidence given to a single-label keyword match
+    embeddings    : object with embed_documents / embed_query methods
+    """
+
+    def __init__(self, examples, threshold=0.7,
+                 rule_confidence=0.95, embeddings=None,
+                 keyword_rules=KEYWORD_RULES):
+        self.threshold = threshold
+        self.rule_confidence = rule_confidence
+        self.embeddings = embeddings or get_default_embeddings()
+        self.keyword_rules = {
+            label: [re.compile(p, re.IGNORECASE) for p in patterns]
+            for label, patterns in keyword_rules.items()}
+
+        # One normalized centroid per label
+        self.labels = [label for label in examples if examples[label]]
+        self.centroids = np.stack([
+            normalize(normalize(
+                self.embeddings.embed_documents(examples[label])).mean(axis=0))
+            for label in self.labels]) if self.labels else None
+
+    #Build the classifier from the skill examples of each agent card.
+    #agent_routes is a dict of label -> agent card URL.
+    @classmethod
+    async def from_agent_cards(cls, registry, agent_routes, **kwargs):
+        examples = {"UNSUPPORTED": list(UNSUPPORTED_EXAMPLES)}
+        for label, agent_card_url in agent_routes.items():
+            card = await registry.get_card(agent_card_url)
+            examples[label] = [example
+                               for skill in card.skills
+                               for example in (skill.examples or [])]
+        return cls(examples, **kwargs)
+
+    def classify_by_rules(self, query):
+        matched = [label for label, patterns in self.keyword_rules.items()
+                   if any(p.search(query) for p in patterns)]
+        if len(matched) == 1:
+            return FastPathResult(matched[0], self.rule_confidence, "rules")
+        return None
+
+    #Confidence is the softmax probability of the nearest centroid,
+    #with cosine similarities scaled by the temperature
+    def classify_by_embeddings(self, query, temperature=0.05):
+        if self.centroids is None:
+            return FastPathResult("UNSUPPORTED", 0.0, "embeddings")
+        query_vector = normalize(self.embeddings.embed_query(query))
+        scores = self.centroids @ query_vector / temperature
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        best = int(np.argmax(probabilities))
+        return FastPathResult(self.labels[best],
+                              float(probabilities[best]), "embeddings")
+
+    def classify(self, query):
+        return (self.classify_by_rules(query)
+                or self.classify_by_embeddings(query))
+
+    #Return the label when confident enough, else None (use the LLM)
+    def route(self, query):
+        result = self.classify(query)
+        print(f"Fast path result : {result}")
+        if result.confidence >= self.threshold:
+            return result.label
+        return None
+
+
+#-----------------------------------------------------------------------
+# Benchmark the fast path against the LLM router
+#-----------------------------------------------------------------------
+LABELED_QUERIES = [
+    ("What is the policy on remote work?", "POLICY"),
+    ("Can I work from home on Fridays?", "POLICY"),
+    ("How many sick days are allowed per year?", "POLICY"),
+    ("What are the standard work hours?", "POLICY"),
+    ("Is there a dress code?", "POLICY"),
+    ("What benefits does the company offer?", "POLICY"),
+    ("What happens if I am late to work?", "POLICY"),
+    ("Explain the parental leave rules", "POLICY"),
+    ("What is my vacation balance?", "TIMEOFF"),
+    ("How many days off do I have left?", "TIMEOFF"),
+    ("File a time off request for 5 days starting from 2025-05-05", "TIMEOFF"),
+    ("Book 2 days of leave from next Monday", "TIMEOFF"),
+    ("I need to take off July 1st to July 3rd", "TIMEOFF"),
+    ("What is my timeoff balance now?", "TIMEOFF"),
+    ("Create a timeoff request for 3 days from 10-Aug-2025", "TIMEOFF"),
+    ("Tell me about payroll processing", "UNSUPPORTED"),
+    ("What is the capital of France?", "UNSUPPORTED"),
+    ("My monitor is broken, who do I call?", "UNSUPPORTED"),
+    ("Write me a poem about spring", "UNSUPPORTED"),
+    ("When is the next all-hands meeting?", "UNSUPPORTED"),
+]
+
+
+def llm_route(model, system_prompt, query):
+    from langchain_core.messages import HumanMessage, SystemMessage
+    result = model.invoke([SystemMessage(content=system_prompt),
+                           HumanMessage(query)])
+    return result.content.strip()
+
+
+def run_benchmark(classifier, model, system_prompt,
+                  labeled_queries=LABELED_QUERIES):
+
+    rows = []
+    for query, expected in labeled_queries:
+        start = time.perf_counter()
+        fast = classifier.classify(query)
+        fast_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        llm_label = llm_route(model, system_prompt, query)
+        llm_ms = (time.perf_counter() - start) * 1000
+
+        confident = fast.confidence >= classifier.threshold
+        combined = fast.label if confident else llm_label
+        rows.append((query, expected, fast, confident,
+                     llm_label, combined, fast_ms, llm_ms))
+        print(f"{expected:12} fast={fast.label:12} ({fast.confidence:.2f}, "
+              f"{fast.method}) llm={llm_label:12} {query}")
+
+    total = len(rows)
+    fast_rows = [r for r in rows if r[3]]
+    llm_time = sum(r[7] for r in rows)
+    fast_time = sum(r[6] for r in rows)
+    # Latency of the combined router: fast path always runs, the LLM
+    # only for queries below the threshold
+    combined_time = fast_time + sum(r[7] for r in rows if not r[3])
+
+    def accuracy(matches):
+        return 100.0 * sum(matches) / max(len(matches), 1)
+
+    print("\n----------------------------------------")
+    print(f"Queries                       : {total}")
+    print(f"Fast path coverage            : "
+          f"{100.0 * len(fast_rows) / total:.1f}%")
+    print(f"Fast path accuracy (covered)  : "
+          f"{accuracy([r[2].label == r[1] for r in fast_rows]):.1f}%")
+    print(f"Fast path agreement with LLM  : "
+          f"{accuracy([r[2].label == r[4] for r in fast_rows]):.1f}%")
+    print(f"LLM router accuracy           : "
+          f"{accuracy([r[4] == r[1] for r in rows]):.1f}%")
+    print(f"Combined router accuracy      : "
+          f"{accuracy([r[5] == r[1] for r in rows]):.1f}%")
+    print(f"Avg fast path latency         : {fast_time / total:.1f} ms")
+    print(f"Avg LLM router latency        : {llm_time / total:.1f} ms")
+    print(f"Avg combined router latency   : {combined_time / total:.1f} ms")
+    print(f"Latency saved per turn        : "
+          f"{(llm_time - combined_time) / total:.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import a2a_client_router_agent as router
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare the fast path with the LLM router")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("queries", nargs="*")
+    args = parser.parse_args()
+
+    classifier = asyncio.run(FastPathClassifier.from_agent_cards(
+        router.a2a_client_registry, router.AGENT_ROUTES,
+        threshold=args.threshold))
+
+    if args.benchmark:
+        run_benchmark(classifier, router.get_model(), router.ROUTER_SYSTEM_PROMPT)
+    for query in args.queries:
+        print(query, " -> ", classifier.classify(query))
@@ -0,0 +1,141 @@
+#-----------------------------------------------------------------------
+# Semantic response cache.
+# Each prompt is embedded, and the stored answer of the most similar
+# cached prompt is returned when their cosine similarity is above the
+# threshold. The cache is bounded by size (LRU) and entry age (TTL),
+# and is cleared when the content hash of its source document changes.
+#-----------------------------------------------------------------------
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CacheEntry:
+    def __init__(self, prompt, vector, answer, latency):
+        self.prompt = prompt
+        self.vector = vector
+        self.answer = answer
+        self.latency = latency
+        self.created_at = time.monotonic()
+
+
+class SemanticCache:
+    """embeddings : object with an embed_query method
+    threshold     : minimum cosine similarity for a hit
+    max_entries   : LRU bound on the number of cached answers
+    ttl           : maximum age of an entry, in seconds
+    source_path   : document the answers are derived from
+    hash_source   : function returning the content hash of source_path
+    """
+
+    def __init__(self, embeddings, threshold=0.92, max_entries=512,
+                 ttl=3600.0, source_path=None, hash_source=None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.source_path = source_path
+        self.hash_source = hash_source
+
+        self.entries = OrderedDict()
+        self._matrix = None
+        self._keys = []
+        self._lock = threading.Lock()
+
+        self._source_stat = None
+        self._source_hash = None
+
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0,
+                      "invalidations": 0, "latency_saved": 0.0}
+
+    #Clear the cache when the source document content changes. The file
+    #is only re-hashed when its size or modification time changes.
+    def check_source(self):
+        if not self.source_path:
+            return
+        stat = os.stat(self.source_path)
+        source_stat = (stat.st_mtime_ns, stat.st_size)
+        if source_stat == self._source_stat:
+            return
+        self._source_stat = source_stat
+
+        source_hash = self.hash_source(self.source_path)
+        if self._source_hash is not None and source_hash != self._source_hash:
+            print("Source document changed, clearing semantic cache")
+            self.entries.clear()
+            self._matrix = None
+            self.stats["invalidations"] += 1
+        self._source_hash = source_hash
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self.entries.items()
+                   if now - entry.created_at > self.ttl]
+        for key in expired:
+            del self.entries[key]
+            self.stats["evictions"] += 1
+        if expired:
+            self._matrix = None
+
+    def _similarity_matrix(self):
+        if self._matrix is None:
+            self._keys = list(self.entries.keys())
+            self._matrix = (np.stack([self.entries[k].vector
+                                      for k in self._keys])
+                            if self._keys else None)
+        return self._matrix
+
+    def embed(self, prompt):
+        vector = np.asarray(self.embeddings.embed_query(prompt),
+                            dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    #Return (answer, vector). answer is None on a miss, and vector can
+    #be passed to store() to avoid embedding the prompt again.
+    def lookup(self, prompt):
+        vector = self.embed(prompt)
+        with self._lock:
+            self.check_source()
+            self._evict_expired()
+
+            matrix = self._similarity_matrix()
+            if matrix is not None:
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = self._keys[best]
+                    entry = self.entries[key]
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["latency_saved"] += entry.latency
+                    print(f"Semantic cache hit ({scores[best]:.3f}) "
+                          f"for '{prompt}' with '{entry.prompt}'")
+                    return entry.answer, vector
+
+            self.stats["misses"] += 1
+            return None, vector
+
+    def store(self, prompt, vector, answer, latency):
+        with self._lock:
+            self.entries[prompt] = CacheEntry(prompt, vector, answer, latency)
+            self.entries.move_to_end(prompt)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._matrix = None
+
+    @property
+    def hit_ratio(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def report(self):
+        return {**self.stats,
+                "entries": len(self.entries),
+                "hit_ratio": round(self.hit_ratio, 3),
+                "latency_saved": round(self.stats["latency_saved"], 3)}
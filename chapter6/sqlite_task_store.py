@@ -0,0 +1,183 @@
+#-----------------------------------------------------------------------
+# A2A task store kept in a SQLite database file, in place of the
+# InMemoryTaskStore.
+# - Tasks survive restarts, and several server processes (uvicorn
+#   workers, or replicas on the same host) can share the same file.
+#   WAL mode lets readers run while a task is written.
+# - Tasks are stored as zlib compressed JSON, without the unset fields.
+# - Tasks in a terminal state (completed, canceled, failed, rejected)
+#   are evicted once they have not been updated for ttl seconds. Tasks
+#   in another state are evicted after the much longer stale_ttl, as a
+#   task whose server died in the middle of it is never finished.
+# The sqlite3 calls run in a thread (asyncio.to_thread), so they do not
+# block the event loop.
+#-----------------------------------------------------------------------
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from a2a.server.tasks import InMemoryTaskStore, TaskStore
+from a2a.types import Task, TaskState
+
+TERMINAL_STATES = [TaskState.completed.value, TaskState.canceled.value,
+                   TaskState.failed.value, TaskState.rejected.value]
+
+UPSERT_TASK = '''
+    INSERT INTO a2a_task (id, context_id, state, updated_at, payload)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        context_id = excluded.context_id,
+        state = excluded.state,
+        updated_at = excluded.updated_at,
+        payload = excluded.payload
+'''
+
+SELECT_TASK = "SELECT payload FROM a2a_task WHERE id = ?"
+
+DELETE_TASK = "DELETE FROM a2a_task WHERE id = ?"
+
+DELETE_EXPIRED_TASKS = f'''
+    DELETE FROM a2a_task
+    WHERE state IN ({", ".join("?" for _ in TERMINAL_STATES)})
+      AND updated_at < ?
+'''
+
+DELETE_STALE_TASKS = f'''
+    DELETE FROM a2a_task
+    WHERE state NOT IN ({", ".join("?" for _ in TERMINAL_STATES)})
+      AND updated_at < ?
+'''
+
+
+class SQLiteTaskStore(TaskStore):
+    """db_path        : SQLite database file, shared by the processes
+    ttl               : seconds a finished task is kept after its last
+                        update, None to keep them forever
+    stale_ttl         : seconds an unfinished task is kept after its
+                        last update, None to keep them forever
+    evict_interval    : minimum seconds between two eviction passes
+    compression_level : zlib level of the stored payloads
+    """
+
+    def __init__(self, db_path, ttl=3600.0, stale_ttl=86400.0,
+                 evict_interval=60.0, compression_level=6,
+                 synchronous="NORMAL"):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.evict_interval = evict_interval
+        self.compression_level = compression_level
+        self.synchronous = synchronous
+
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._last_eviction = 0.0
+        self.stats = {"saves": 0, "gets": 0, "evicted": 0,
+                      "bytes_raw": 0, "bytes_stored": 0}
+
+        with self._connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS a2a_task (
+                    id TEXT PRIMARY KEY,
+                    context_id TEXT,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    payload BLOB NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_a2a_task_state_updated
+                ON a2a_task (state, updated_at)
+            ''')
+
+    #One connection per thread. Connections are not shared with forked
+    #worker processes, which open their own.
+    def _connection(self):
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+        return conn
+
+    def encode(self, task):
+        data = task.model_dump_json(exclude_none=True).encode("utf-8")
+        payload = zlib.compress(data, self.compression_level)
+        self.stats["bytes_raw"] += len(data)
+        self.stats["bytes_stored"] += len(payload)
+        return payload
+
+    @staticmethod
+    def decode(payload):
+        return Task.model_validate_json(zlib.decompress(payload))
+
+    def _save(self, task, payload):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(UPSERT_TASK, (task.id, task.contextId,
+                                       task.status.state.value, now, payload))
+        if ((self.ttl is not None or self.stale_ttl is not None)
+                and now - self._last_eviction >= self.evict_interval):
+            self._last_eviction = now
+            self.evict_expired(now)
+
+    def _get(self, task_id):
+        row = self._connection().execute(SELECT_TASK, (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def _delete(self, task_id):
+        with self._connection() as conn:
+            conn.execute(DELETE_TASK, (task_id,))
+
+    #Delete the finished tasks not updated for ttl seconds, and the
+    #unfinished ones not updated for stale_ttl seconds
+    def evict_expired(self, now=None):
+        now = time.time() if now is None else now
+        evicted = 0
+        with self._connection() as conn:
+            if self.ttl is not None:
+                evicted += conn.execute(
+                    DELETE_EXPIRED_TASKS,
+                    TERMINAL_STATES + [now - self.ttl]).rowcount
+            if self.stale_ttl is not None:
+                evicted += conn.execute(
+                    DELETE_STALE_TASKS,
+                    TERMINAL_STATES + [now - self.stale_ttl]).rowcount
+        self.stats["evicted"] += evicted
+        return evicted
+
+    async def save(self, task: Task) -> None:
+        self.stats["saves"] += 1
+        await asyncio.to_thread(self._save, task, self.encode(task))
+
+    async def get(self, task_id: str) -> Task | None:
+        self.stats["gets"] += 1
+        payload = await asyncio.to_thread(self._get, task_id)
+        return self.decode(payload) if payload is not None else None
+
+    async def delete(self, task_id: str) -> None:
+        await asyncio.to_thread(self._delete, task_id)
+
+
+#Create the task store of an agent, selected by A2A_TASK_STORE:
+#"sqlite" (default) stores the tasks in A2A_TASK_STORE_PATH, or in
+#default_path, "memory" keeps them in memory as before.
+def create_task_store(default_path):
+    store = os.getenv("A2A_TASK_STORE", "sqlite")
+    if store == "memory":
+        return InMemoryTaskStore()
+    if store == "sqlite":
+        ttl = float(os.getenv("A2A_TASK_TTL", "3600"))
+        stale_ttl = float(os.getenv("A2A_TASK_STALE_TTL", "86400"))
+        return SQLiteTaskStore(os.getenv("A2A_TASK_STORE_PATH", default_path),
+                               ttl=ttl if ttl > 0 else None,
+                               stale_ttl=stale_ttl if stale_ttl > 0 else None)
+    raise ValueError(f"Unknown task store: {store}")
@@ -0,0 +1,101 @@
+#-----------------------------------------------------------------------
+# Benchmark of the A2A task stores: task saves and gets per second,
+# from many concurrent coroutines, and the size of the stored tasks.
+#
+#   python chapter6/task_store_benchmark.py
+#   python chapter6/task_store_benchmark.py --tasks 5000 --concurrency 64
+#-----------------------------------------------------------------------
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from a2a.server.tasks import InMemoryTaskStore
+from a2a.types import (Artifact, Message, Part, Role, Task, TaskState,
+                       TaskStatus, TextPart)
+
+from sqlite_task_store import SQLiteTaskStore
+
+ANSWER = ("Employees accrue 1.5 days of paid time off per month. Unused "
+          "days carry over to the next year, up to 10 days. ") * 8
+
+
+#A completed task, as the wrappers produce it: the request, the
+#streamed tokens and the final response
+def make_task(state=TaskState.completed):
+    context_id = str(uuid.uuid4())
+    task_id = str(uuid.uuid4())
+    request = Message(role=Role.user, messageId=str(uuid.uuid4()),
+                      contextId=context_id, taskId=task_id,
+                      parts=[Part(root=TextPart(
+                          text='{"user": "Alice", "prompt": '
+                               '"How many days of leave carry over?"}'))])
+    return Task(id=task_id, contextId=context_id,
+                status=TaskStatus(state=state),
+                history=[request],
+                artifacts=[
+                    Artifact(artifactId=str(uuid.uuid4()), name="stream",
+                             parts=[Part(root=TextPart(text=ANSWER))]),
+                    Artifact(artifactId=str(uuid.uuid4()), name="response",
+                             parts=[Part(root=TextPart(text=ANSWER))]),
+                ])
+
+
+async def run_concurrently(items, concurrency, operation):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            await operation(item)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(item) for item in items))
+    return len(items) / (time.perf_counter() - start)
+
+
+async def benchmark(name, store, tasks, concurrency):
+    save_rate = await run_concurrently(tasks, concurrency, store.save)
+
+    async def get(task):
+        assert (await store.get(task.id)).id == task.id
+    get_rate = await run_concurrently(tasks, concurrency, get)
+    print(f"{name:>16} {save_rate:>10.0f} {get_rate:>10.0f}")
+
+
+async def main(args):
+    tasks = [make_task() for _ in range(args.tasks)]
+    print(f"{args.tasks} tasks, {args.concurrency} concurrent calls\n")
+    print(f"{'store':>16} {'saves/s':>10} {'gets/s':>10}")
+
+    await benchmark("memory", InMemoryTaskStore(), tasks, args.concurrency)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for synchronous in args.synchronous:
+            store = SQLiteTaskStore(
+                os.path.join(directory, f"tasks_{synchronous}.db"),
+                synchronous=synchronous)
+            await benchmark(f"sqlite {synchronous}", store, tasks,
+                            args.concurrency)
+
+        raw, stored = store.stats["bytes_raw"], store.stats["bytes_stored"]
+        print(f"\nTask payload: {raw // args.tasks} bytes as JSON, "
+              f"{stored // args.tasks} bytes compressed")
+
+        # Finished tasks older than the TTL are evicted, running ones kept
+        store.ttl = 0
+        running = make_task(TaskState.working)
+        await store.save(running)
+        evicted = store.evict_expired()
+        assert await store.get(running.id) is not None
+        print(f"Evicted {evicted} finished tasks, kept the running one")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--synchronous", nargs="+", default=["NORMAL", "FULL"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,57 @@
+#-----------------------------------------------------------------------
+# Convert the LangGraph event stream of a ReAct agent into simple
+# events that can be forwarded over A2A:
+#   {"type": "token", "text": ...}  text generated by the LLM
+#   {"type": "step",  "text": ...}  a tool call started or finished
+#   {"type": "final", "text": ...}  the final answer of the agent
+#-----------------------------------------------------------------------
+
+import time
+
+import tracing
+
+
+async def stream_agent_events(agent, inputs, flush_interval=0.05):
+    """Stream the events of an agent run. Tokens are coalesced so that
+    at most one token event is emitted per flush_interval seconds,
+    except the first token, which is emitted as soon as it arrives."""
+
+    pending = []
+    last_flush = 0.0
+    final_text = None
+
+    async for event in agent.astream_events(
+            inputs, config=tracing.callback_config(), version="v2"):
+        kind = event["event"]
+
+        if kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            if isinstance(content, str) and content:
+                pending.append(content)
+                if time.monotonic() - last_flush >= flush_interval:
+                    yield {"type": "token", "text": "".join(pending)}
+                    pending = []
+                    last_flush = time.monotonic()
+            continue
+
+        if pending:
+            yield {"type": "token", "text": "".join(pending)}
+            pending = []
+            last_flush = time.monotonic()
+
+        if kind == "on_tool_start":
+            yield {"type": "step",
+                   "text": f"Calling tool {event['name']}"}
+        elif kind == "on_tool_end":
+            yield {"type": "step",
+                   "text": f"Tool {event['name']} finished"}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            # End of the root run: its output is the final agent state
+            output = event["data"].get("output") or {}
+            if "messages" in output:
+                final_text = output["messages"][-1].content
+
+    if pending:
+        yield {"type": "token", "text": "".join(pending)}
+
+    yield {"type": "final", "text": final_text or ""}
@@ -0,0 +1,113 @@
+#-----------------------------------------------------------------------
+# Deterministic chat model, used in place of AzureChatOpenAI to run the
+# agents with no credentials and no network, e.g. in benchmarks.
+# - A script function returns the next AIMessage given the messages:
+#   text, or tool calls for the ReAct agents.
+# - latency seconds pass before the response (time to first token),
+#   then token_latency seconds between the streamed words.
+# - Token usage is estimated from the word counts.
+#-----------------------------------------------------------------------
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Callable
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import (ChatGeneration, ChatGenerationChunk,
+                                    ChatResult)
+
+
+def count_words(messages):
+    return sum(len(str(message.content).split()) for message in messages)
+
+
+#A tool call of a scripted response
+def tool_call(name, **args):
+    return {"name": name, "args": args, "id": "call_" + uuid.uuid4().hex[:12]}
+
+
+class FakeChatModel(BaseChatModel):
+    """script        : function of the list of messages, returning the
+                    AIMessage (or text) of the next turn
+    latency       : seconds before the first token
+    token_latency : seconds between two streamed words"""
+
+    script: Callable[[list], Any]
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    #The script decides on the tool calls, tools need no binding
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def respond(self, messages):
+        message = self.script(messages)
+        if isinstance(message, str):
+            message = AIMessage(content=message)
+        output_tokens = len(str(message.content).split())
+        message.usage_metadata = {
+            "input_tokens": count_words(messages),
+            "output_tokens": output_tokens,
+            "total_tokens": count_words(messages) + output_tokens,
+        }
+        return message
+
+    #Split a response into the chunks it is streamed as
+    @staticmethod
+    def chunks(message):
+        if message.tool_calls:
+            yield AIMessageChunk(
+                content=message.content,
+                tool_call_chunks=[{"name": call["name"],
+                                   "args": json.dumps(call["args"]),
+                                   "id": call["id"], "index": index}
+                                  for index, call
+                                  in enumerate(message.tool_calls)],
+                usage_metadata=message.usage_metadata)
+            return
+        words = str(message.content).split(" ")
+        for index, word in enumerate(words):
+            last = index == len(words) - 1
+            yield AIMessageChunk(
+                content=word if last else word + " ",
+                usage_metadata=message.usage_metadata if last else None)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(
+            generations=[ChatGeneration(message=self.respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None,
+                         **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(
+            generations=[ChatGeneration(message=self.respond(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for index, chunk in enumerate(self.chunks(self.respond(messages))):
+            if index and self.token_latency:
+                time.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+    async def _astream(self, messages, stop=None, run_manager=None,
+                       **kwargs):
+        await asyncio.sleep(self.latency)
+        for index, chunk in enumerate(self.chunks(self.respond(messages))):
+            if index and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content,
+                                                   chunk=generation)
+            yield generation
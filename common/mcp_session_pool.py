@@ -0,0 +1,217 @@
+#-----------------------------------------------------------------------
+# Pool of long-lived MCP client sessions.
+# Each pooled session keeps its transport and ClientSession open, along
+# with whatever the agent built from it (tool list, prompt template,
+# prebuilt agent), so a request only pays for the tool calls and the LLM.
+#-----------------------------------------------------------------------
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from mcp import ClientSession, types
+
+import tracing
+
+
+#-----------------------------------------------------------------------
+# Prompt templates are loaded once per session with placeholder
+# arguments, and rendered locally for each request.
+#-----------------------------------------------------------------------
+def prompt_placeholder(name):
+    return f"<<mcp-prompt-arg:{name}>>"
+
+
+def prompt_placeholders(*names):
+    return {name: prompt_placeholder(name) for name in names}
+
+
+def render_prompt(prompt_messages, arguments):
+    rendered = []
+    for message in prompt_messages:
+        content = message.content
+        for name, value in arguments.items():
+            content = content.replace(prompt_placeholder(name), str(value))
+        rendered.append(message.model_copy(update={"content": content}))
+    return rendered
+
+
+#-----------------------------------------------------------------------
+# Client session that records tool calls as spans, and sends the trace
+# context to the server in the _meta of the request. The server tools
+# read it with tracing.extract_mcp(ctx).
+#-----------------------------------------------------------------------
+class TracingClientSession(ClientSession):
+
+    async def call_tool(self, name, arguments=None, read_timeout_seconds=None,
+                        progress_callback=None):
+        if not tracing.enabled():
+            return await super().call_tool(name, arguments,
+                                           read_timeout_seconds,
+                                           progress_callback)
+
+        with tracing.span("mcp.call_tool", tool=name):
+            request = types.ClientRequest(types.CallToolRequest(
+                method="tools/call",
+                params=types.CallToolRequestParams(
+                    name=name, arguments=arguments,
+                    _meta=tracing.inject()),
+            ))
+            return await self.send_request(
+                request, types.CallToolResult,
+                request_read_timeout_seconds=read_timeout_seconds,
+                progress_callback=progress_callback)
+
+
+#-----------------------------------------------------------------------
+# A single warm session. The transport is opened and closed by a
+# dedicated background task, since the MCP transports must be exited
+# from the same task that entered them.
+#-----------------------------------------------------------------------
+class PooledMCPSession:
+
+    def __init__(self, connect, setup):
+        self.connect = connect
+        self.setup = setup
+        self.session = None
+        self.state = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self):
+        try:
+            async with self.connect() as streams:
+                read, write = streams[0], streams[1]
+                async with TracingClientSession(read, write) as session:
+                    await session.initialize()
+                    self.state = await self.setup(session)
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            print("MCP session closed with error: ", e)
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def closed(self):
+        return self._task is None or self._task.done() or self.session is None
+
+    #Health check used when the session is borrowed from the pool
+    async def is_healthy(self, timeout):
+        if self.closed:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception as e:
+            print("MCP session failed health check: ", e)
+            return False
+
+    #Close the session from another event loop, where it cannot be
+    #awaited. Its task is cancelled on its own loop, which exits the
+    #transport and terminates a stdio server subprocess.
+    def abandon(self):
+        if self._task is None or self._task.done():
+            return
+        loop = self._task.get_loop()
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._task.cancel)
+
+    async def close(self, timeout=5.0):
+        self._closing.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+
+
+#-----------------------------------------------------------------------
+# Pool of warm sessions for one MCP server.
+#   connect : returns the transport context manager, e.g.
+#             lambda: stdio_client(server_params)
+#   setup   : async function called once per new session, returning the
+#             state cached with it (tools, prompt template, agent...)
+#-----------------------------------------------------------------------
+class MCPSessionPool:
+
+    def __init__(self, name, connect, setup, max_size=4, ping_timeout=5.0):
+        self.name = name
+        self.connect = connect
+        self.setup = setup
+        self.max_size = max_size
+        self.ping_timeout = ping_timeout
+        self._idle = []
+        self._loop = None
+        self._semaphore = None
+        self.stats = {"created": 0, "reused": 0, "reconnected": 0}
+
+    #Sessions belong to the event loop that created them. If the pool
+    #is used from a new loop (e.g. successive asyncio.run calls), the
+    #sessions of the old loop are closed and dropped.
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            for pooled in self._idle:
+                pooled.abandon()
+            self._loop = loop
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.max_size)
+
+    async def _new_session(self):
+        print(f"Opening new MCP session for {self.name}")
+        pooled = PooledMCPSession(self.connect, self.setup)
+        await pooled.start()
+        self.stats["created"] += 1
+        return pooled
+
+    async def _borrow(self):
+        while self._idle:
+            pooled = self._idle.pop()
+            if await pooled.is_healthy(self.ping_timeout):
+                self.stats["reused"] += 1
+                return pooled
+            self.stats["reconnected"] += 1
+            await pooled.close()
+        return await self._new_session()
+
+    #Borrow a warm session for the duration of the block
+    @asynccontextmanager
+    async def session(self):
+        self._bind_loop()
+        # Time spent waiting for a session, and opening one if needed
+        acquire_span = tracing.start_span("mcp.acquire", server=self.name)
+        async with self._semaphore:
+            created = self.stats["created"]
+            try:
+                pooled = await self._borrow()
+            finally:
+                acquire_span.set(new_session=self.stats["created"] > created)
+                acquire_span.end()
+            try:
+                yield pooled
+            finally:
+                if not pooled.closed:
+                    self._idle.append(pooled)
+
+    #Open sessions ahead of the first request
+    async def warm_up(self, count=1):
+        self._bind_loop()
+        count = min(count, self.max_size)
+        while len(self._idle) < count:
+            self._idle.append(await self._new_session())
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await pooled.close()
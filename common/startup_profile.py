@@ -0,0 +1,112 @@
+#-----------------------------------------------------------------------
+# Startup profile of a server or agent module:
+# - the time to import it in a fresh interpreter, and the share of each
+#   top level package, from python -X importtime
+# - for stdio MCP servers, the time until the server answers the MCP
+#   initialize handshake, lists its tools and answers a first call
+#
+#   python common/startup_profile.py chapter4/timeoff_agent.py
+#   python chapter3/hr_policy_server.py --profile-startup
+#-----------------------------------------------------------------------
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+#Import the module of script_path in a new interpreter, and return the
+#wall time and the self import time (seconds) of each top level package
+def measure_imports(script_path):
+    directory, filename = os.path.split(os.path.abspath(script_path))
+    module = os.path.splitext(filename)[0]
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=directory, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            packages[match.group(4).split(".")[0]] += int(match.group(1)) / 1e6
+    return elapsed, packages
+
+
+def report_imports(script_path, top=15):
+    elapsed, packages = measure_imports(script_path)
+    total = sum(packages.values())
+    print(f"Import of {os.path.basename(script_path)}: {elapsed:.2f}s wall "
+          f"time, {total:.2f}s in imports\n")
+    print(f"{'package':<32} {'ms':>8} {'share':>7}")
+    for package, seconds in sorted(packages.items(),
+                                   key=lambda item: -item[1])[:top]:
+        print(f"{package:<32} {seconds * 1000:>8.0f} "
+              f"{seconds / total:>7.1%}")
+
+
+#Start the stdio MCP server of script_path, and time its handshake, its
+#tool list and a first call of tool
+async def measure_stdio_server(script_path, tool=None, arguments=None):
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    timings = {}
+    server_params = StdioServerParameters(
+        command=sys.executable, args=[os.path.abspath(script_path)],
+        env=dict(os.environ))
+    start = time.perf_counter()
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            timings["initialize"] = time.perf_counter() - start
+            await session.list_tools()
+            timings["list_tools"] = time.perf_counter() - start
+            if tool:
+                await session.call_tool(tool, arguments or {})
+                timings[f"first {tool}"] = time.perf_counter() - start
+    return timings
+
+
+def report_stdio_server(script_path, tool=None, arguments=None):
+    timings = asyncio.run(measure_stdio_server(script_path, tool, arguments))
+    print(f"\nMCP server startup, from process start:")
+    for step, seconds in timings.items():
+        print(f"{step:<32} {seconds * 1000:>8.0f} ms")
+
+
+#Full profile of a script, used by the --profile-startup options
+def profile_startup(script_path, stdio_tool=None, stdio_arguments=None,
+                    stdio_server=False):
+    report_imports(script_path)
+    if stdio_server:
+        report_stdio_server(script_path, stdio_tool, stdio_arguments)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import time breakdown of a server or agent module")
+    parser.add_argument("script")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--mcp-stdio", action="store_true",
+                        help="Also time the MCP handshake of the script, "
+                             "run as a stdio MCP server")
+    parser.add_argument("--tool", help="Tool called after the handshake")
+    parser.add_argument("--arguments", default="{}",
+                        help="JSON arguments of the tool")
+    args = parser.parse_args()
+
+    report_imports(args.script, args.top)
+    if args.mcp_stdio:
+        report_stdio_server(args.script, args.tool,
+                            json.loads(args.arguments))
@@ -0,0 +1,350 @@
+#-----------------------------------------------------------------------
+# Tracing of requests across the router, the A2A agents, the MCP
+# servers and the LLM calls, in the style of OpenTelemetry.
+# - span(name, **attributes) times a stage of a request. The current
+#   span is kept in a context variable, so nested spans, and the tasks
+#   started under a span, record it as their parent.
+# - The trace context crosses processes as a W3C traceparent
+#   ("00-<trace id>-<span id>-01"), carried in the metadata of the A2A
+#   messages and in the _meta of the MCP tool calls.
+# - Finished spans are appended as JSON lines to TRACE_FILE, which all
+#   the processes of a run can share, and kept in memory in
+#   collected_spans.
+# Tracing is off unless TRACE_FILE is set or enable() is called, and
+# then costs a function call per span.
+#
+# Per stage latency breakdown of a run:
+#   python common/tracing.py trace.jsonl
+#-----------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+trace_file = os.getenv("TRACE_FILE")
+service_name = (os.getenv("TRACE_SERVICE")
+                or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+                or "python")
+collected_spans = deque(maxlen=int(os.getenv("TRACE_BUFFER_SIZE", "10000")))
+
+_enabled = bool(trace_file)
+_current_span = ContextVar("current_span", default=None)
+_file_lock = threading.Lock()
+_file = None
+
+
+#Turn tracing on, exporting to path when given, else only to
+#collected_spans
+def enable(path=None, service=None):
+    global _enabled, trace_file, service_name, _file
+    with _file_lock:
+        if path != trace_file and _file is not None:
+            _file.close()
+            _file = None
+        trace_file = path
+    if service:
+        service_name = service
+    _enabled = True
+
+
+def enabled():
+    return _enabled
+
+
+#Identifiers of a span, possibly in another process
+class SpanContext:
+    def __init__(self, trace_id, span_id):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class Span(SpanContext):
+    def __init__(self, name, parent=None, attributes=None):
+        super().__init__(parent.trace_id if parent else secrets.token_hex(16),
+                         secrets.token_hex(8))
+        self.name = name
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    #Finish the span and export it. Only the first call counts.
+    def end(self, error=None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = repr(error)[:200]
+        export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": service_name,
+            "pid": os.getpid(),
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+#Returned when tracing is off
+class NoopSpan:
+    traceparent = None
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error=None):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def export(span):
+    global _file
+    record = span.to_dict()
+    collected_spans.append(record)
+    if not trace_file:
+        return
+    line = json.dumps(record, default=str) + "\n"
+    with _file_lock:
+        if _file is None:
+            _file = open(trace_file, "a", encoding="utf-8")
+        # One write per line, so the processes sharing the file do not
+        # interleave their spans
+        _file.write(line)
+        _file.flush()
+
+
+def current_span():
+    return _current_span.get()
+
+
+#Start a span without making it the current one, e.g. in an async
+#generator, where the current span cannot be reset across yields.
+#The caller ends it.
+def start_span(name, parent=None, **attributes):
+    if not _enabled:
+        return NOOP_SPAN
+    return Span(name, parent or _current_span.get(), attributes)
+
+
+#Time the block as a span, child of parent (a span, or a SpanContext
+#from extract()) or else of the current span
+@contextmanager
+def span(name, parent=None, **attributes):
+    if not _enabled:
+        yield NOOP_SPAN
+        return
+    current = Span(name, parent or _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+#-----------------------------------------------------------------------
+# Propagation of the trace context
+#-----------------------------------------------------------------------
+
+#Add the traceparent of span, or of the current span, to carrier
+def inject(carrier=None, span=None):
+    carrier = {} if carrier is None else carrier
+    span = span or _current_span.get()
+    if span is not None and span.traceparent:
+        carrier["traceparent"] = span.traceparent
+    return carrier
+
+
+#Read the parent SpanContext from a carrier dict, or from an object
+#with a traceparent attribute (e.g. the _meta of an MCP request)
+def extract(carrier):
+    if isinstance(carrier, dict):
+        traceparent = carrier.get("traceparent")
+    else:
+        traceparent = getattr(carrier, "traceparent", None)
+    if not isinstance(traceparent, str):
+        return None
+    parts = traceparent.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+#Parent of a span in an MCP tool, from the Context of the tool call
+def extract_mcp(ctx):
+    if not _enabled or ctx is None:
+        return None
+    try:
+        return extract(ctx.request_context.meta)
+    except (LookupError, ValueError, AttributeError):
+        return None
+
+
+#-----------------------------------------------------------------------
+# LLM calls made through LangChain are recorded as "llm" spans, with
+# their token usage, by passing callback_config() as the run config.
+# In a graph, it is passed to the graph run: the calls made in its
+# nodes inherit the callbacks of the run.
+#-----------------------------------------------------------------------
+class TracingCallbackHandler(BaseCallbackHandler):
+
+    # Called in the context of the run, to see its current span
+    run_inline = True
+
+    def __init__(self):
+        self.spans = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        metadata = kwargs.get("metadata") or {}
+        self.spans[run_id] = start_span(
+            "llm", model=metadata.get("ls_model_name", ""))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self.spans.pop(run_id, None)
+        if span is None:
+            return
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (IndexError, AttributeError):
+            usage = {}
+        if usage:
+            span.set(input_tokens=usage.get("input_tokens"),
+                     output_tokens=usage.get("output_tokens"))
+        span.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self.spans.pop(run_id, None)
+        if span is not None:
+            span.end(error=error)
+
+
+tracing_callback_handler = TracingCallbackHandler()
+
+
+#Run config with the tracing handler added to the callbacks of config
+def callback_config(config=None):
+    config = dict(config or {})
+    if not _enabled:
+        return config
+    callbacks = config.get("callbacks")
+    if callbacks is None:
+        config["callbacks"] = [tracing_callback_handler]
+    elif isinstance(callbacks, list):
+        config["callbacks"] = callbacks + [tracing_callback_handler]
+    else:
+        # A callback manager
+        callbacks = callbacks.copy()
+        callbacks.add_handler(tracing_callback_handler)
+        config["callbacks"] = callbacks
+    return config
+
+
+#-----------------------------------------------------------------------
+# Summary of a trace file: latency percentiles of each stage, and the
+# span tree of the slowest requests
+#-----------------------------------------------------------------------
+def load_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(spans):
+    stages = defaultdict(list)
+    errors = defaultdict(int)
+    for record in spans:
+        key = (record["service"], record["name"])
+        stages[key].append(record["duration_ms"])
+        errors[key] += record["status"] != "ok"
+
+    traces = {record["trace_id"] for record in spans}
+    print(f"{len(spans)} spans in {len(traces)} traces\n")
+    print(f"{'service':<28} {'span':<24} {'count':>6} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'total ms':>10} {'errors':>6}")
+    for (service, name), durations in sorted(
+            stages.items(), key=lambda item: -sum(item[1])):
+        print(f"{service[:28]:<28} {name[:24]:<24} {len(durations):>6} "
+              f"{percentile(durations, 0.5):>9.1f} "
+              f"{percentile(durations, 0.95):>9.1f} "
+              f"{percentile(durations, 0.99):>9.1f} "
+              f"{sum(durations):>10.0f} {errors[(service, name)]:>6}")
+
+
+def print_trace(spans, trace_id):
+    trace = [record for record in spans if record["trace_id"] == trace_id]
+    ids = {record["span_id"] for record in trace}
+    children = defaultdict(list)
+    for record in trace:
+        parent = record["parent_id"] if record["parent_id"] in ids else None
+        children[parent].append(record)
+    start = min(record["start"] for record in trace)
+
+    def walk(parent, depth):
+        for record in sorted(children[parent], key=lambda r: r["start"]):
+            offset = (record["start"] - start) * 1000
+            label = "  " * depth + record["name"]
+            print(f"{offset:>9.1f} {record['duration_ms']:>9.1f}  "
+                  f"{label:<40} {record['service']}"
+                  + ("  ERROR" if record["status"] != "ok" else ""))
+            walk(record["span_id"], depth + 1)
+
+    print(f"\nTrace {trace_id}\n{'start ms':>9} {'ms':>9}")
+    walk(None, 0)
+
+
+#Root spans of the traces, slowest first
+def slowest_traces(spans, count):
+    roots = [record for record in spans if record["parent_id"] is None]
+    roots.sort(key=lambda record: -record["duration_ms"])
+    return [record["trace_id"] for record in roots[:count]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Latency breakdown of a trace file")
+    parser.add_argument("trace_file")
+    parser.add_argument("--slowest", type=int, default=1,
+                        help="Print the span tree of the N slowest traces")
+    args = parser.parse_args()
+
+    spans = load_spans(args.trace_file)
+    summarize(spans)
+    for trace_id in slowest_traces(spans, args.slowest):
+        print_trace(spans, trace_id)